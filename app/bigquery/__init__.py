@@ -0,0 +1 @@
+# Hacer el directorio un módulo Python
\ No newline at end of file
@@ -0,0 +1,36 @@
+import os
+import threading
+
+_fake_client = None
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_bigquery_client(project: str, location: str = "US"):
+    global _fake_client
+    
+    if os.getenv("BIGQUERY_FAKE", "false").lower() == "true":
+        # El cliente falso guarda las tablas en memoria, así que se comparte en todo el proceso
+        if _fake_client is None:
+            from app.bigquery.fake_client import FakeBigQueryClient
+            _fake_client = FakeBigQueryClient(project=project, location=location)
+        return _fake_client
+    
+    # Un cliente por proceso: reutiliza credenciales y el pool HTTP entre sincronizaciones y tablas
+    key = (project, location)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                # Import diferido: google.cloud.bigquery es el módulo más pesado del arranque
+                from google.cloud import bigquery
+                
+                client = bigquery.Client(project=project, location=location)
+                _clients[key] = client
+    return client
+
+def close_bigquery_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
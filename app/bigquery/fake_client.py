@@ -0,0 +1,133 @@
+import io
+import json
+import re
+import threading
+import uuid
+from types import SimpleNamespace
+
+from google.cloud import bigquery
+
+TABLE_PATTERN = re.compile(r"`([^`]+)`")
+
+class FakeJob:
+    def __init__(self, rows=None, output_rows=None, errors=None):
+        self.job_id = f"fake_{uuid.uuid4().hex[:12]}"
+        self._rows = rows or []
+        self.output_rows = output_rows
+        self.errors = errors
+    
+    def result(self, *args, **kwargs):
+        if self.errors:
+            raise RuntimeError(self.errors[0]["message"])
+        return self._rows
+
+class FakeBigQueryClient:
+    """Cliente BigQuery en memoria para probar la sincronización sin credenciales ni red."""
+    
+    def __init__(self, project: str = "fake-project", location: str = "US", fail_loads=None):
+        self.project = project
+        self.location = location
+        self.tables = {}
+        self.schemas = {}
+        self.queries = []
+        self.load_calls = 0
+        self.fail_loads = set(fail_loads or [])
+        self._lock = threading.Lock()
+    
+    def _table_id(self, table) -> str:
+        if isinstance(table, str):
+            return table
+        return f"{table.project}.{table.dataset_id}.{table.table_id}"
+    
+    def dataset(self, dataset_id: str):
+        project = self.project
+        return SimpleNamespace(
+            table=lambda table_id: SimpleNamespace(project=project, dataset_id=dataset_id, table_id=table_id)
+        )
+    
+    def get_table(self, table):
+        table_id = self._table_id(table)
+        return SimpleNamespace(
+            table_id=table_id,
+            schema=self.schemas.get(table_id, []),
+            num_rows=len(self.tables.get(table_id, []))
+        )
+    
+    def _write(self, table_id: str, rows: list, write_disposition: str):
+        with self._lock:
+            if write_disposition == bigquery.WriteDisposition.WRITE_TRUNCATE:
+                self.tables[table_id] = []
+            self.tables.setdefault(table_id, []).extend(rows)
+    
+    def insert_rows_json(self, table, rows):
+        table_id = self._table_id(table)
+        self._write(table_id, [dict(r) for r in rows], bigquery.WriteDisposition.WRITE_APPEND)
+        return []
+    
+    def load_table_from_json(self, rows, destination, job_config=None, **kwargs):
+        return self._load(self._table_id(destination), [dict(r) for r in rows], job_config)
+    
+    def load_table_from_file(self, file_obj, destination, rewind=False, job_config=None, **kwargs):
+        if rewind:
+            file_obj.seek(0)
+        payload = file_obj.read()
+        
+        if job_config is not None and job_config.source_format == bigquery.SourceFormat.PARQUET:
+            import pyarrow.parquet as pq
+            rows = pq.read_table(io.BytesIO(payload)).to_pylist()
+        else:
+            rows = [json.loads(line) for line in payload.decode("utf-8").splitlines() if line]
+        
+        return self._load(self._table_id(destination), rows, job_config)
+    
+    def _load(self, table_id: str, rows: list, job_config):
+        call = self.load_calls
+        self.load_calls += 1
+        if call in self.fail_loads:
+            return FakeJob(errors=[{"reason": "invalid", "message": f"Fallo simulado en la carga {call}"}])
+        
+        disposition = getattr(job_config, "write_disposition", None) or bigquery.WriteDisposition.WRITE_APPEND
+        self._write(table_id, rows, disposition)
+        return FakeJob(output_rows=len(rows))
+    
+    def copy_table(self, sources, destination, job_config=None, **kwargs):
+        source_id, table_id = self._table_id(sources), self._table_id(destination)
+        disposition = getattr(job_config, "write_disposition", None) or bigquery.WriteDisposition.WRITE_EMPTY
+        with self._lock:
+            rows = [dict(r) for r in self.tables.get(source_id, [])]
+        if disposition == bigquery.WriteDisposition.WRITE_EMPTY and self.tables.get(table_id):
+            return FakeJob(errors=[{"reason": "duplicate", "message": f"La tabla {table_id} no está vacía"}])
+        self._write(table_id, rows, disposition)
+        return FakeJob(output_rows=len(rows))
+    
+    def query(self, query: str, job_config=None, **kwargs):
+        self.queries.append(query)
+        statement = query.strip().split(None, 1)[0].upper()
+        tables = TABLE_PATTERN.findall(query)
+        
+        if statement in ("TRUNCATE", "DELETE") and tables:
+            table_id = tables[0]
+            ids = None
+            for parameter in getattr(job_config, "query_parameters", None) or []:
+                if parameter.name == "ids":
+                    ids = set(parameter.values)
+            with self._lock:
+                if ids is None:
+                    self.tables[table_id] = []
+                else:
+                    self.tables[table_id] = [r for r in self.tables.get(table_id, []) if r.get("id") not in ids]
+            return FakeJob()
+        
+        if statement == "MERGE" and len(tables) >= 2:
+            target_id, source_id = tables[0], tables[1]
+            with self._lock:
+                merged = {r.get("id"): r for r in self.tables.get(target_id, [])}
+                for row in self.tables.get(source_id, []):
+                    merged[row.get("id")] = dict(row)
+                self.tables[target_id] = list(merged.values())
+            return FakeJob()
+        
+        if statement == "SELECT" and "COUNT(*)" in query.upper() and tables:
+            return FakeJob(rows=[SimpleNamespace(total=len(self.tables.get(tables[0], [])))])
+        
+        return FakeJob()
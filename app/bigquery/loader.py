@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+from itertools import islice
+from typing import Iterable, List, Dict
+
+BIGQUERY_LOADER = os.getenv("BIGQUERY_LOADER", "load_job").lower()
+BIGQUERY_CHUNK_SIZE = int(os.getenv("BIGQUERY_CHUNK_SIZE", "50000"))
+BIGQUERY_LOAD_FORMAT = os.getenv("BIGQUERY_LOAD_FORMAT", "ndjson").lower()
+# Los chunks se arman en memoria hasta este tamaño; por encima se vuelcan a un archivo temporal
+BIGQUERY_SPOOL_MAX_BYTES = int(os.getenv("BIGQUERY_SPOOL_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Mismos valores que bigquery.WriteDisposition / SourceFormat, sin importar google.cloud al cargar el módulo
+WRITE_TRUNCATE = "WRITE_TRUNCATE"
+WRITE_APPEND = "WRITE_APPEND"
+
+SOURCE_FORMATS = {
+    "ndjson": "NEWLINE_DELIMITED_JSON",
+    "parquet": "PARQUET"
+}
+
+def iter_chunks(rows: Iterable[Dict], chunk_size: int):
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def encode_chunk(chunk: List[Dict], source_format: str):
+    buffer = tempfile.SpooledTemporaryFile(max_size=BIGQUERY_SPOOL_MAX_BYTES, mode="w+b")
+    
+    if source_format == "ndjson":
+        for row in chunk:
+            buffer.write(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8"))
+            buffer.write(b"\n")
+    elif source_format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("El formato parquet requiere pyarrow instalado") from e
+        pq.write_table(pa.Table.from_pylist(chunk), buffer)
+    else:
+        raise ValueError(f"Formato de carga no soportado: {source_format}")
+    
+    buffer.seek(0)
+    return buffer
+
+def load_rows_in_chunks(
+    client,
+    table_id: str,
+    rows: Iterable[Dict],
+    schema=None,
+    write_disposition: str = WRITE_APPEND,
+    chunk_size: int = None,
+    source_format: str = None
+) -> Dict:
+    from google.cloud import bigquery
+    
+    chunk_size = chunk_size or BIGQUERY_CHUNK_SIZE
+    source_format = (source_format or BIGQUERY_LOAD_FORMAT).lower()
+    
+    report = {"table": table_id, "rows_loaded": 0, "chunks": [], "errors": []}
+    
+    for index, chunk in enumerate(iter_chunks(rows, chunk_size)):
+        # Solo el primer chunk aplica la disposición pedida (p.ej. WRITE_TRUNCATE); el resto se agrega
+        disposition = write_disposition if index == 0 else WRITE_APPEND
+        job_config = bigquery.LoadJobConfig(
+            source_format=SOURCE_FORMATS.get(source_format),
+            write_disposition=disposition,
+            schema=schema
+        )
+        
+        chunk_report = {"chunk": index, "rows": len(chunk)}
+        job = None
+        try:
+            buffer = encode_chunk(chunk, source_format)
+            try:
+                job = client.load_table_from_file(buffer, table_id, job_config=job_config, rewind=True)
+                job.result()
+            finally:
+                buffer.close()
+            
+            loaded = job.output_rows if job.output_rows is not None else len(chunk)
+            report["rows_loaded"] += loaded
+            chunk_report.update({"status": "ok", "job_id": job.job_id, "rows_loaded": loaded})
+        except Exception as e:
+            error = {
+                "chunk": index,
+                "rows": len(chunk),
+                "error": str(e),
+                "details": getattr(job, "errors", None)
+            }
+            report["errors"].append(error)
+            chunk_report.update({"status": "error", "error": str(e)})
+            print(f"Error cargando chunk {index} ({len(chunk)} filas) en {table_id}: {e}")
+        
+        report["chunks"].append(chunk_report)
+        # Se detiene en el primer fallo: seguir con WRITE_APPEND dejaría la tabla a medio reemplazar
+        # (o, si falló el WRITE_TRUNCATE del primer chunk, agregaría filas sobre el contenido anterior)
+        if chunk_report["status"] == "error":
+            break
+    
+    report["success"] = not report["errors"]
+    return report
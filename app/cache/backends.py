@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+MISSING = object()
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def incr(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "retries": self.retries,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class MemoryCacheBackend:
+    """LRU con expiración por TTL, local al proceso."""
+    
+    name = "memory"
+    
+    def __init__(self, stats: CacheStats, max_entries: int = 10000, ttl: float = 60.0):
+        self.stats = stats
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+    
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats.incr("expirations")
+            return MISSING
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    async def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.incr("evictions")
+    
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+    
+    async def clear(self):
+        self._entries.clear()
+    
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+class RedisCacheBackend:
+    """Backend compartido entre instancias; el TTL y la expulsión los gestiona Redis."""
+    
+    name = "redis"
+    
+    def __init__(self, stats: CacheStats, url: str, ttl: float = 60.0, prefix: str = "smartlogix:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("El backend de caché redis requiere el paquete redis instalado") from e
+        
+        self.stats = stats
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+    
+    async def get(self, key: str) -> Any:
+        raw = await self._client.get(self.prefix + key)
+        return MISSING if raw is None else json.loads(raw)
+    
+    async def set(self, key: str, value: Any):
+        await self._client.set(self.prefix + key, json.dumps(value, default=str), px=int(self.ttl * 1000))
+    
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*[self.prefix + key for key in keys])
+    
+    async def clear(self):
+        async for key in self._client.scan_iter(match=self.prefix + "*"):
+            await self._client.delete(key)
+    
+    def size(self) -> Optional[int]:
+        return None
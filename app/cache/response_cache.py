@@ -0,0 +1,117 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+from app.cache.backends import MISSING, CacheStats, MemoryCacheBackend, RedisCacheBackend
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+def student_key(student_id: int) -> str:
+    return f"students:{student_id}"
+
+def student_enrollments_key(student_id: int) -> str:
+    return f"students:{student_id}:enrollments"
+
+def course_key(course_id: int) -> str:
+    return f"courses:{course_id}"
+
+def enrollment_key(enrollment_id: int) -> str:
+    return f"enrollments:{enrollment_id}"
+
+class ResponseCache:
+    """Caché read-through: un solo loader por clave en vuelo (single-flight) e invalidación explícita."""
+    
+    def __init__(self, backend=None, stats: CacheStats = None):
+        self.stats = stats or CacheStats()
+        self.backend = backend
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+    
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # El loader devuelve None cuando la entidad no existe; ese resultado no se guarda
+        if not self.enabled:
+            return await loader()
+        
+        value = await self.backend.get(key)
+        if value is not MISSING:
+            self.stats.incr("hits")
+            return value
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats.incr("coalesced")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Solo se propaga si se canceló esta petición; si el cancelado fue el líder (p. ej. el cliente
+                # se desconectó), la carga se repite y la primera petición que llegue pasa a ser el nuevo líder
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                self.stats.incr("retries")
+                return await self.get_or_load(key, loader)
+        
+        self.stats.incr("misses")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Marca la excepción como recuperada aunque no haya otras peticiones esperando
+            future.exception()
+            raise
+        finally:
+            current = self._inflight.get(key) is future
+            if current:
+                del self._inflight[key]
+        
+        # Se resuelve antes de escribir en el backend: si la escritura falla o se cancela, las peticiones
+        # en espera ya tienen el valor
+        future.set_result(value)
+        # Si se invalidó durante la carga, el resultado puede estar desactualizado y no se guarda
+        if current and value is not None:
+            await self.backend.set(key, value)
+        return value
+    
+    async def invalidate(self, *keys: str):
+        if not self.enabled or not keys:
+            return
+        for key in keys:
+            self._inflight.pop(key, None)
+        await self.backend.delete(*keys)
+        self.stats.incr("invalidations", len(keys))
+    
+    async def clear(self):
+        if self.enabled:
+            await self.backend.clear()
+    
+    def status(self) -> dict:
+        return {
+            "backend": self.backend.name if self.enabled else "none",
+            "ttl_s": self.backend.ttl if self.enabled else None,
+            "max_entries": getattr(self.backend, "max_entries", None),
+            "size": self.backend.size() if self.enabled else 0,
+            "inflight": len(self._inflight),
+            **self.stats.snapshot()
+        }
+
+def create_response_cache() -> ResponseCache:
+    stats = CacheStats()
+    if CACHE_BACKEND == "none":
+        return ResponseCache(None, stats)
+    if CACHE_BACKEND == "redis":
+        return ResponseCache(RedisCacheBackend(stats, CACHE_REDIS_URL, ttl=CACHE_TTL_SECONDS), stats)
+    if CACHE_BACKEND != "memory":
+        raise ValueError(f"Backend de caché no soportado: {CACHE_BACKEND}")
+    return ResponseCache(MemoryCacheBackend(stats, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS), stats)
+
+response_cache = create_response_cache()
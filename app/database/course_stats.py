@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func
+
+from app.database.database import dialect_insert
+from app.database.rollups import additive_set, apply_estado_change, diff_rows, estado_count_columns, replace_rows, run_rollup_cli
+from app.models.models import CourseScoreCount, CourseStats, Enrollment
+
+ESTADO_COLUMNS = {
+    "Cursando": "cursando",
+    "Aprobado": "aprobados",
+    "Desaprobado": "desaprobados",
+    "Retirado": "retirados"
+}
+
+COUNTER_FIELDS = ["matriculas", "cursando", "aprobados", "desaprobados", "retirados", "n_notas", "suma_notas"]
+
+stats_table = CourseStats.__table__
+scores_table = CourseScoreCount.__table__
+
+def month_key(fecha: datetime) -> str:
+    return fecha.strftime("%Y-%m")
+
+def _month(dialect_name: str, column):
+    return func.strftime("%Y-%m", column) if dialect_name == "sqlite" else func.to_char(column, "YYYY-MM")
+
+def aggregate_deltas(enrollments: Iterable[Tuple[int, datetime, str, Optional[int]]]) -> Tuple[Dict[tuple, dict], Dict[tuple, int]]:
+    stats = defaultdict(lambda: {field: 0 for field in COUNTER_FIELDS})
+    scores = defaultdict(int)
+    for course_id, fecha_matricula, estado, puntaje in enrollments:
+        delta = stats[(course_id, month_key(fecha_matricula))]
+        delta["matriculas"] += 1
+        if estado in ESTADO_COLUMNS:
+            delta[ESTADO_COLUMNS[estado]] += 1
+        if puntaje is not None:
+            delta["n_notas"] += 1
+            delta["suma_notas"] += puntaje
+            scores[(course_id, puntaje)] += 1
+    return stats, scores
+
+async def record_course_enrollments(db, enrollments: Iterable[Tuple[int, datetime, str, Optional[int]]]):
+    """Suma las matrículas recién insertadas a course_stats y course_score_counts (UPSERT aditivo)."""
+    stats, scores = aggregate_deltas(enrollments)
+    if not stats:
+        return
+    
+    # Filas en orden de clave: dos cargas concurrentes bloquean sus filas en el mismo orden y no se interbloquean
+    statement = dialect_insert(db, stats_table)
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[stats_table.c.course_id, stats_table.c.mes],
+            set_=additive_set(stats_table, statement.excluded, COUNTER_FIELDS)
+        ),
+        [{"course_id": course_id, "mes": mes, **delta} for (course_id, mes), delta in sorted(stats.items())]
+    )
+    
+    if scores:
+        statement = dialect_insert(db, scores_table)
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[scores_table.c.course_id, scores_table.c.puntaje],
+                set_={"cantidad": scores_table.c.cantidad + statement.excluded.cantidad}
+            ),
+            [{"course_id": course_id, "puntaje": puntaje, "cantidad": count} for (course_id, puntaje), count in sorted(scores.items())]
+        )
+
+async def record_course_estado_change(db, course_id: int, fecha_matricula: datetime, old_estado: str, new_estado: str):
+    await apply_estado_change(
+        db, stats_table, ESTADO_COLUMNS,
+        [stats_table.c.course_id == course_id, stats_table.c.mes == month_key(fecha_matricula)],
+        old_estado, new_estado
+    )
+
+def empty_stats() -> dict:
+    return {"meses": [], "puntajes": {}, **{field: 0 for field in COUNTER_FIELDS}}
+
+def build_course_stats(stats: dict) -> dict:
+    finalizados = stats["aprobados"] + stats["desaprobados"]
+    return {
+        "total_matriculas": stats["matriculas"],
+        "por_estado": {estado: stats[column] for estado, column in ESTADO_COLUMNS.items()},
+        "tasa_aprobacion": round(stats["aprobados"] / finalizados * 100, 1) if finalizados else None,
+        "nota_media": round(stats["suma_notas"] / stats["n_notas"], 2) if stats["n_notas"] else None,
+        "distribucion_puntaje": [
+            {"puntaje": puntaje, "cantidad": cantidad} for puntaje, cantidad in sorted(stats["puntajes"].items())
+        ],
+        "matriculas_por_mes": stats["meses"]
+    }
+
+async def load_course_stats(db, course_ids: List[int]) -> Dict[int, dict]:
+    """Estadísticas de los cursos pedidos leídas solo de las tablas de rollup (dos consultas por página)."""
+    loaded = {course_id: empty_stats() for course_id in course_ids}
+    if not course_ids:
+        return loaded
+    
+    rows = await db.execute(
+        select(stats_table).where(stats_table.c.course_id.in_(course_ids)).order_by(stats_table.c.course_id, stats_table.c.mes)
+    )
+    for row in rows:
+        stats = loaded[row.course_id]
+        for field in COUNTER_FIELDS:
+            stats[field] += row._mapping[field]
+        stats["meses"].append({"mes": row.mes, "matriculas": row.matriculas})
+    
+    rows = await db.execute(
+        select(scores_table).where(scores_table.c.course_id.in_(course_ids))
+    )
+    for row in rows:
+        loaded[row.course_id]["puntajes"][row.puntaje] = row.cantidad
+    
+    return {course_id: build_course_stats(stats) for course_id, stats in loaded.items()}
+
+def compute_all_stats(db) -> Tuple[Dict[tuple, dict], Dict[tuple, int]]:
+    dialect_name = db.bind.dialect.name
+    mes = _month(dialect_name, Enrollment.fecha_matricula)
+    stats = {}
+    for row in db.execute(
+        select(
+            Enrollment.course_id,
+            mes.label("mes"),
+            func.count().label("matriculas"),
+            *estado_count_columns(ESTADO_COLUMNS),
+            func.count(Enrollment.puntaje).label("n_notas"),
+            func.coalesce(func.sum(Enrollment.puntaje), 0).label("suma_notas")
+        ).group_by(Enrollment.course_id, mes)
+    ):
+        stats[(row.course_id, row.mes)] = {field: row._mapping[field] for field in COUNTER_FIELDS}
+    
+    scores = {
+        (row.course_id, row.puntaje): row.cantidad
+        for row in db.execute(
+            select(Enrollment.course_id, Enrollment.puntaje, func.count().label("cantidad"))
+            .where(Enrollment.puntaje.isnot(None))
+            .group_by(Enrollment.course_id, Enrollment.puntaje)
+        )
+    }
+    return stats, scores
+
+def rebuild_course_stats(db) -> int:
+    stats, scores = compute_all_stats(db)
+    replace_rows(db, stats_table, [{"course_id": course_id, "mes": mes, **values} for (course_id, mes), values in stats.items()])
+    replace_rows(
+        db, scores_table,
+        [{"course_id": course_id, "puntaje": puntaje, "cantidad": count} for (course_id, puntaje), count in sorted(scores.items())]
+    )
+    db.commit()
+    return len({course_id for course_id, _ in stats})
+
+def check_course_stats(db) -> List[dict]:
+    expected_stats, expected_scores = compute_all_stats(db)
+    stored_stats = {
+        (row.course_id, row.mes): {field: row._mapping[field] for field in COUNTER_FIELDS}
+        for row in db.execute(select(stats_table))
+    }
+    stored_scores = {
+        (row.course_id, row.puntaje): row.cantidad
+        for row in db.execute(select(scores_table))
+    }
+    
+    return [
+        {"course_id": course_id, "clave": f"mes {mes}", "expected": expected, "stored": actual}
+        for (course_id, mes), expected, actual in diff_rows(expected_stats, stored_stats)
+    ] + [
+        {"course_id": course_id, "clave": f"puntaje {puntaje}", "expected": expected, "stored": actual}
+        for (course_id, puntaje), expected, actual in diff_rows(expected_scores, stored_scores)
+    ]
+
+if __name__ == "__main__":
+    run_rollup_cli(
+        "app.database.course_stats", "course_stats", "cursos",
+        rebuild_course_stats, check_course_stats,
+        lambda item: f"curso {item['course_id']} ({item['clave']})"
+    )
@@ -1,8 +1,20 @@
 import os
-from sqlalchemy import create_engine, MetaData
+import threading
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from uuid import uuid4
+from sqlalchemy import create_engine, MetaData, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 from app.models.models import Base
+from app.database.pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+from app.metrics.sql import instrument_engine
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DB_SCHEMA_MODE = os.getenv("DB_SCHEMA_MODE", "check").lower()
 
 class DatabaseConfig:
     DB_USER = os.getenv("DB_USER", "postgres")
@@ -13,12 +25,56 @@ class DatabaseConfig:
     
     CLOUD_SQL_CONNECTION_NAME = os.getenv("CLOUD_SQL_CONNECTION_NAME")
     
+    DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+    DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+    
     @classmethod
     def get_database_url(cls) -> str:
         if cls.CLOUD_SQL_CONNECTION_NAME:
             return f"postgresql+psycopg2://{cls.DB_USER}:{cls.DB_PASSWORD}@/{cls.DB_NAME}?host=/cloudsql/{cls.CLOUD_SQL_CONNECTION_NAME}"
         else:
             return f"postgresql+psycopg2://{cls.DB_USER}:{cls.DB_PASSWORD}@{cls.DB_HOST}:{cls.DB_PORT}/{cls.DB_NAME}"
+    
+    @classmethod
+    def get_async_database_url(cls) -> str:
+        database_url = os.getenv("ASYNC_DATABASE_URL") or os.getenv("DATABASE_URL") or cls.get_database_url()
+        url = make_url(database_url)
+        if url.drivername.startswith("postgresql"):
+            url = url.set(drivername="postgresql+asyncpg")
+        elif url.drivername == "sqlite":
+            url = url.set(drivername="sqlite+aiosqlite")
+        return url.render_as_string(hide_password=False)
+    
+    @classmethod
+    def get_pool_options(cls, async_mode: bool = False) -> dict:
+        if cls.DB_POOL_MODE == "null":
+            return {"poolclass": NullPool}
+        
+        return {
+            "poolclass": InstrumentedAsyncQueuePool if async_mode else InstrumentedQueuePool,
+            "pool_size": cls.DB_POOL_SIZE,
+            "max_overflow": cls.DB_MAX_OVERFLOW,
+            "pool_recycle": cls.DB_POOL_RECYCLE,
+            "pool_timeout": cls.DB_POOL_TIMEOUT,
+            "pool_pre_ping": cls.DB_POOL_PRE_PING
+        }
+    
+    @classmethod
+    def get_async_connect_args(cls) -> dict:
+        if not cls.DB_PGBOUNCER:
+            return {}
+        
+        # PgBouncer en modo transacción no conserva sentencias preparadas entre conexiones
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__"
+        }
 
 def create_database_engine():
     database_url = os.getenv("DATABASE_URL")
@@ -29,32 +85,173 @@ def create_database_engine():
     
     engine = create_engine(
         database_url,
-        poolclass=NullPool,  
-        pool_pre_ping=True,
-        pool_recycle=300,
-        echo=False  
+        echo=False,
+        **DatabaseConfig.get_pool_options()
     )
-    return engine
+    return instrument_engine(engine, "sync")
+
+def create_async_database_engine():
+    database_url = DatabaseConfig.get_async_database_url()
+    
+    print(f"🔗 Conectando (async) a: {database_url.replace(DatabaseConfig.DB_PASSWORD, '***')}")
+    
+    connect_args = {}
+    if database_url.startswith("postgresql+asyncpg"):
+        connect_args = DatabaseConfig.get_async_connect_args()
+    
+    async_engine = create_async_engine(
+        database_url,
+        echo=False,
+        connect_args=connect_args,
+        **DatabaseConfig.get_pool_options(async_mode=True)
+    )
+    return instrument_engine(async_engine, "async")
+
+# Los engines se crean al primer uso (el lifespan de la API los inicia al arrancar, no al importar)
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+def get_engine():
+    global _engine
+    
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_database_engine()
+                SessionLocal.configure(bind=_engine)
+    return _engine
 
-engine = create_database_engine()
+def get_async_engine():
+    global _async_engine
+    
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                _async_engine = create_async_database_engine()
+                AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+def init_engines():
+    get_engine()
+    get_async_engine()
+
+async def dispose_engines():
+    global _engine, _async_engine
+    
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+
+def dialect_insert(db, table):
+    # INSERT con soporte de ON CONFLICT según el motor (PostgreSQL en producción, SQLite en local)
+    if db.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_local_locks = defaultdict(threading.Lock)
+
+@contextmanager
+def advisory_lock(name: str, blocking: bool = True):
+    """Candado exclusivo entre hilos y, en PostgreSQL, entre procesos (pg_advisory_xact_lock).
+    
+    Devuelve True si se obtuvo; con blocking=False devuelve False sin esperar si otro lo tiene.
+    El candado de PostgreSQL es de transacción (compatible con PgBouncer en modo transacción)
+    y ocupa una conexión del pool mientras dura el bloque."""
+    local_lock = _local_locks[name]
+    if not local_lock.acquire(blocking=blocking):
+        yield False
+        return
+    
+    try:
+        engine = get_engine()
+        if engine.dialect.name != "postgresql":
+            yield True
+            return
+        
+        key = zlib.crc32(name.encode())
+        with engine.begin() as connection:
+            if blocking:
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
+                acquired = True
+            else:
+                acquired = connection.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": key})
+            yield bool(acquired)
+    finally:
+        local_lock.release()
 
 def create_tables():
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
 
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_alembic_config():
+    from alembic.config import Config
+    
+    config = Config(os.path.join(PROJECT_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "migrations"))
+    return config
+
+def check_schema_version() -> bool:
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    
+    expected = set(ScriptDirectory.from_config(get_alembic_config()).get_heads())
+    with get_engine().connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    
+    if current != expected:
+        print(
+            f"⚠️ Esquema desactualizado: versión {', '.join(sorted(current)) or 'ninguna'}, "
+            f"se esperaba {', '.join(sorted(expected))}. Ejecuta 'alembic upgrade head'"
+        )
+        return False
+    return True
+
+def run_migrations():
+    from alembic import command
+    
+    config = get_alembic_config()
+    config.attributes["configure_logger"] = False
+    with get_engine().begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+
 def init_database():
     try:
-        create_tables()
+        # check (por defecto): solo verifica la versión; migrate: aplica migraciones; create: create_all
+        if DB_SCHEMA_MODE == "create":
+            create_tables()
+        elif DB_SCHEMA_MODE == "migrate":
+            run_migrations()
+        elif not check_schema_version():
+            return False
         print("Base de datos inicializada correctamente")
         return True
     except Exception as e:
         print(f"Error al inicializar la base de datos: {e}")
-        return False
\ No newline at end of file
+        return False
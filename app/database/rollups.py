@@ -0,0 +1,87 @@
+import sys
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import update, delete, insert, func, case
+
+from app.models.models import Enrollment
+
+# Piezas comunes de los rollups mantenidos en cada escritura de matrículas (student_metrics, course_stats):
+# contadores por estado, UPSERT aditivo, reconstrucción, verificación y su CLI
+
+def estado_count_columns(estado_columns: Dict[str, str]) -> list:
+    # Un SUM(CASE ...) por estado, etiquetado con el nombre de su contador en el rollup
+    return [
+        func.sum(case((Enrollment.estado == estado, 1), else_=0)).label(column)
+        for estado, column in estado_columns.items()
+    ]
+
+def additive_set(table, excluded, fields: List[str]) -> dict:
+    # SET del UPSERT aditivo: cada contador suma el delta de la fila propuesta (excluded)
+    set_ = {field: table.c[field] + excluded[field] for field in fields}
+    set_["updated_at"] = func.current_timestamp()
+    return set_
+
+async def apply_estado_change(db, table, estado_columns: Dict[str, str], conditions: list, old_estado: str, new_estado: str):
+    """Pasa una matrícula del contador de old_estado al de new_estado en las filas que cumplen conditions."""
+    if old_estado == new_estado:
+        return
+    
+    values = {}
+    if old_estado in estado_columns:
+        column = estado_columns[old_estado]
+        values[column] = table.c[column] - 1
+    if new_estado in estado_columns:
+        column = estado_columns[new_estado]
+        values[column] = table.c[column] + 1
+    if not values:
+        return
+    
+    await db.execute(update(table).where(*conditions).values(**values, updated_at=func.current_timestamp()))
+
+def replace_rows(db, table, rows: List[dict]):
+    db.execute(delete(table))
+    if rows:
+        db.execute(insert(table), rows)
+
+def diff_rows(expected: dict, stored: dict) -> List[tuple]:
+    # (clave, esperado, guardado) de cada clave cuyo valor no coincide, incluidas las que faltan en un lado
+    return [
+        (key, expected.get(key), stored.get(key))
+        for key in sorted(set(expected) | set(stored))
+        if expected.get(key) != stored.get(key)
+    ]
+
+def run_rollup_cli(
+    module: str,
+    table_name: str,
+    unit: str,
+    rebuild: Callable,
+    check: Callable,
+    describe: Callable[[dict], str],
+    commands: Optional[Dict[str, Callable]] = None
+):
+    """python -m <module> [rebuild|check|...]: rebuild y check comunes más los comandos propios del rollup,
+    que reciben la sesión y devuelven el mensaje a mostrar."""
+    from app.database.database import SessionLocal, get_engine
+    
+    get_engine()
+    commands = commands or {}
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    db = SessionLocal()
+    try:
+        if command == "rebuild":
+            total = rebuild(db)
+            print(f"{table_name} reconstruida: {total} {unit}")
+        elif command == "check":
+            drift = check(db)
+            for item in drift[:20]:
+                print(f"Desviación en {describe(item)}: {item['stored']} != {item['expected']}")
+            print(f"{len(drift)} filas de {table_name} desviadas")
+            sys.exit(1 if drift else 0)
+        elif command in commands:
+            print(commands[command](db))
+        else:
+            print(f"Uso: python -m {module} [{'|'.join(['rebuild', *commands, 'check'])}]")
+            sys.exit(2)
+    finally:
+        db.close()
@@ -0,0 +1,198 @@
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update, func, bindparam, or_
+
+from app.database.database import dialect_insert
+from app.database.rollups import additive_set, apply_estado_change, diff_rows, estado_count_columns, replace_rows, run_rollup_cli
+from app.models.models import Enrollment, StudentMetrics
+
+ESTADO_COLUMNS = {
+    "Aprobado": "cursos_aprobados",
+    "Desaprobado": "cursos_desaprobados",
+    "Cursando": "cursos_en_progreso",
+    "Retirado": "cursos_retirados"
+}
+
+COUNTER_FIELDS = [
+    "total_cursos", "cursos_aprobados", "cursos_desaprobados", "cursos_en_progreso",
+    "cursos_retirados", "n_notas", "suma_notas", "suma_cuadrados"
+]
+
+METRIC_FIELDS = COUNTER_FIELDS + ["nota_maxima", "nota_minima", "primera_mitad_suma"]
+
+# Filas con primera_mitad_pendiente recalculadas por ciclo del dispatcher de outbox
+FIRST_HALF_REFRESH_BATCH = int(os.getenv("STUDENT_METRICS_REFRESH_BATCH", "1000"))
+
+metrics_table = StudentMetrics.__table__
+
+def _least(dialect_name: str, a, b):
+    return func.min(a, b) if dialect_name == "sqlite" else func.least(a, b)
+
+def _greatest(dialect_name: str, a, b):
+    return func.max(a, b) if dialect_name == "sqlite" else func.greatest(a, b)
+
+def aggregate_deltas(enrollments: Iterable[Tuple[int, str, Optional[int]]]) -> Dict[int, dict]:
+    deltas = defaultdict(lambda: {**{field: 0 for field in COUNTER_FIELDS}, "nota_maxima": None, "nota_minima": None})
+    for student_id, estado, puntaje in enrollments:
+        delta = deltas[student_id]
+        delta["total_cursos"] += 1
+        if estado in ESTADO_COLUMNS:
+            delta[ESTADO_COLUMNS[estado]] += 1
+        if puntaje is not None:
+            delta["n_notas"] += 1
+            delta["suma_notas"] += puntaje
+            delta["suma_cuadrados"] += puntaje * puntaje
+            delta["nota_maxima"] = puntaje if delta["nota_maxima"] is None else max(delta["nota_maxima"], puntaje)
+            delta["nota_minima"] = puntaje if delta["nota_minima"] is None else min(delta["nota_minima"], puntaje)
+    return deltas
+
+def first_half_statement(student_ids: Optional[List[int]] = None):
+    # Suma de la primera mitad (floor(n/2)) de las notas de cada estudiante en orden de matrícula
+    ranked = select(
+        Enrollment.student_id,
+        Enrollment.puntaje,
+        func.row_number().over(partition_by=Enrollment.student_id, order_by=Enrollment.id).label("rn"),
+        func.count().over(partition_by=Enrollment.student_id).label("cnt")
+    ).where(Enrollment.puntaje.isnot(None))
+    if student_ids is not None:
+        ranked = ranked.where(Enrollment.student_id.in_(student_ids))
+    ranked = ranked.subquery()
+    
+    return select(
+        ranked.c.student_id,
+        func.sum(ranked.c.puntaje).label("primera_mitad_suma")
+    ).where(ranked.c.rn * 2 <= ranked.c.cnt).group_by(ranked.c.student_id)
+
+def aggregate_statement():
+    return select(
+        Enrollment.student_id,
+        func.count().label("total_cursos"),
+        *estado_count_columns(ESTADO_COLUMNS),
+        func.count(Enrollment.puntaje).label("n_notas"),
+        func.coalesce(func.sum(Enrollment.puntaje), 0).label("suma_notas"),
+        func.coalesce(func.sum(Enrollment.puntaje * Enrollment.puntaje), 0).label("suma_cuadrados"),
+        func.max(Enrollment.puntaje).label("nota_maxima"),
+        func.min(Enrollment.puntaje).label("nota_minima")
+    ).group_by(Enrollment.student_id)
+
+async def first_half_sums(db, student_ids: List[int]) -> Dict[int, int]:
+    if not student_ids:
+        return {}
+    sums = {student_id: 0 for student_id in student_ids}
+    for row in await db.execute(first_half_statement(student_ids)):
+        sums[row.student_id] = int(row.primera_mitad_suma or 0)
+    return sums
+
+async def record_enrollment_inserts(db, enrollments: Iterable[Tuple[int, str, Optional[int]]]):
+    """Aplica las matrículas recién insertadas (ya enviadas con flush) a student_metrics con un solo UPSERT.
+    
+    Todo estudiante con matrículas tiene fila (backfill de la migración 0002 o rebuild), así que un estudiante
+    sin fila no tiene historial y su delta es la fila completa. La primera mitad de las notas depende del
+    orden de todo el historial: no se recalcula aquí, la fila queda marcada con primera_mitad_pendiente."""
+    deltas = aggregate_deltas(enrollments)
+    if not deltas:
+        return
+    
+    dialect_name = db.bind.dialect.name
+    statement = dialect_insert(db, metrics_table)
+    current, new = metrics_table.c, statement.excluded
+    
+    set_ = additive_set(metrics_table, new, COUNTER_FIELDS)
+    set_["nota_maxima"] = _greatest(
+        dialect_name,
+        func.coalesce(current.nota_maxima, new.nota_maxima),
+        func.coalesce(new.nota_maxima, current.nota_maxima)
+    )
+    set_["nota_minima"] = _least(
+        dialect_name,
+        func.coalesce(current.nota_minima, new.nota_minima),
+        func.coalesce(new.nota_minima, current.nota_minima)
+    )
+    set_["primera_mitad_pendiente"] = or_(current.primera_mitad_pendiente, new.primera_mitad_pendiente)
+    
+    # Filas en orden de clave: dos cargas concurrentes bloquean sus filas en el mismo orden y no se interbloquean
+    await db.execute(
+        statement.on_conflict_do_update(index_elements=[metrics_table.c.student_id], set_=set_),
+        [
+            {
+                "student_id": student_id,
+                "primera_mitad_suma": 0,
+                "primera_mitad_pendiente": delta["n_notas"] > 0,
+                **delta
+            }
+            for student_id, delta in sorted(deltas.items())
+        ]
+    )
+
+async def record_estado_change(db, student_id: int, old_estado: str, new_estado: str):
+    await apply_estado_change(
+        db, metrics_table, ESTADO_COLUMNS, [metrics_table.c.student_id == student_id], old_estado, new_estado
+    )
+
+def refresh_pending_first_half(db, limit: int = FIRST_HALF_REFRESH_BATCH) -> int:
+    """Recalcula primera_mitad_suma de las filas pendientes. Solo se confirma si n_notas no cambió
+    entretanto; si llegó otra nota, la fila sigue pendiente para el próximo ciclo."""
+    pending = db.execute(
+        select(metrics_table.c.student_id, metrics_table.c.n_notas)
+        .where(metrics_table.c.primera_mitad_pendiente)
+        .order_by(metrics_table.c.student_id)
+        .limit(limit)
+    ).all()
+    if not pending:
+        return 0
+    
+    sums = {row.student_id: int(row.primera_mitad_suma or 0) for row in db.execute(first_half_statement([row.student_id for row in pending]))}
+    db.execute(
+        update(metrics_table).where(
+            metrics_table.c.student_id == bindparam("sid"),
+            metrics_table.c.n_notas == bindparam("notas")
+        ).values(primera_mitad_suma=bindparam("suma"), primera_mitad_pendiente=False),
+        [{"sid": row.student_id, "notas": row.n_notas, "suma": sums.get(row.student_id, 0)} for row in pending]
+    )
+    db.commit()
+    return len(pending)
+
+def compute_all_metrics(db) -> Dict[int, dict]:
+    computed = {}
+    for row in db.execute(aggregate_statement()):
+        computed[row.student_id] = {field: row._mapping[field] for field in METRIC_FIELDS if field != "primera_mitad_suma"}
+        computed[row.student_id]["primera_mitad_suma"] = 0
+    for row in db.execute(first_half_statement()):
+        computed[row.student_id]["primera_mitad_suma"] = int(row.primera_mitad_suma or 0)
+    return computed
+
+def rebuild_student_metrics(db) -> int:
+    computed = compute_all_metrics(db)
+    replace_rows(db, metrics_table, [{"student_id": student_id, **values} for student_id, values in computed.items()])
+    db.commit()
+    return len(computed)
+
+def check_student_metrics(db) -> List[dict]:
+    computed = compute_all_metrics(db)
+    stored = {}
+    for row in db.execute(select(metrics_table)):
+        stored[row.student_id] = {field: row._mapping[field] for field in METRIC_FIELDS}
+        # Pendiente de recálculo: la suma guardada aún no cuenta como desviación
+        if row.primera_mitad_pendiente and row.student_id in computed:
+            stored[row.student_id]["primera_mitad_suma"] = computed[row.student_id]["primera_mitad_suma"]
+    
+    return [
+        {"student_id": student_id, "expected": expected, "stored": actual}
+        for student_id, expected, actual in diff_rows(computed, stored)
+    ]
+
+def refresh_all_pending(db) -> str:
+    total = 0
+    while (refreshed := refresh_pending_first_half(db)):
+        total += refreshed
+    return f"student_metrics: {total} estudiantes con la primera mitad recalculada"
+
+if __name__ == "__main__":
+    run_rollup_cli(
+        "app.database.student_metrics", "student_metrics", "estudiantes",
+        rebuild_student_metrics, check_student_metrics,
+        lambda item: f"estudiante {item['student_id']}",
+        commands={"refresh": refresh_all_pending}
+    )
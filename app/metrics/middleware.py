@@ -0,0 +1,83 @@
+import time
+from prometheus_client import Gauge, Histogram
+
+from app.metrics.sql import RequestStats, current_request_stats, report_request_queries
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+http_request_duration = Histogram(
+    "smartlogix_http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por ruta (plantilla), método y código de estado",
+    ("method", "route", "status")
+)
+http_requests_in_flight = Gauge(
+    "smartlogix_http_requests_in_flight",
+    "Peticiones HTTP en curso",
+    ("method",),
+    multiprocess_mode="livesum"
+)
+http_request_queries = Histogram(
+    "smartlogix_http_request_db_queries",
+    "Sentencias SQL ejecutadas por petición",
+    ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS
+)
+http_request_query_time = Histogram(
+    "smartlogix_http_request_db_seconds",
+    "Tiempo total en SQL por petición",
+    ("method", "route")
+)
+
+def get_route_template(scope) -> str:
+    # Se etiqueta con la plantilla (/students/{student_id}) y no con la ruta concreta, para acotar la cardinalidad
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    
+    path = scope["path"]
+    if route.path_regex.match(path):
+        return route.path
+    # FastAPI >= 0.140 resuelve los routers de include_router(prefix=...) sin copiar sus rutas: route.path
+    # queda relativa a ese prefijo, que se toma del inicio de la ruta concreta
+    index = path.find("/", 1)
+    while index != -1:
+        if route.path_regex.match(path[index:]):
+            return path[:index] + route.path
+        index = path.find("/", index + 1)
+    return route.path
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia, peticiones en curso y consultas SQL por petición."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        http_requests_in_flight.labels(method=method).inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request_stats.reset(token)
+            http_requests_in_flight.labels(method=method).dec()
+            route = get_route_template(scope)
+            http_request_duration.labels(method=method, route=route, status=str(status_code)).observe(elapsed)
+            http_request_queries.labels(method=method, route=route).observe(stats.queries)
+            http_request_query_time.labels(method=method, route=route).observe(stats.query_time)
+            report_request_queries(method, route, stats)
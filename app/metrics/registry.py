@@ -0,0 +1,32 @@
+import os
+import shutil
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Con varios workers (uvicorn --workers, gunicorn) cada proceso escribe sus métricas en este directorio y
+# /metrics agrega todos los procesos. Debe existir y vaciarse antes de arrancar los workers (reset_multiproc_dir).
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+def reset_multiproc_dir():
+    """Vacía (o crea) PROMETHEUS_MULTIPROC_DIR. Se llama una sola vez en el proceso que lanza los workers:
+    los archivos de una ejecución anterior sumarían sus contadores a los nuevos."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+def render() -> bytes:
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return generate_latest(REGISTRY)
+
+    # Registro nuevo en cada scrape: MultiProcessCollector lee los archivos de todos los workers
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+def mark_process_dead(pid: int = None):
+    # Las métricas "live" (peticiones en curso) de un worker que termina dejan de contarse
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
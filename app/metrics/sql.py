@@ -0,0 +1,160 @@
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+from prometheus_client import Counter as PrometheusCounter, Histogram
+from sqlalchemy import event
+
+# Umbrales del registro de consultas: lentas (ms), demasiadas por petición y repeticiones de una misma sentencia (N+1)
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+REQUEST_QUERY_WARN = int(os.getenv("REQUEST_QUERY_WARN", "20"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+sql_query_duration = Histogram(
+    "smartlogix_db_query_duration_seconds",
+    "Duración de las sentencias SQL por engine y tipo de operación",
+    ("engine", "operation"),
+    buckets=SQL_BUCKETS
+)
+sql_query_errors = PrometheusCounter(
+    "smartlogix_db_query_errors_total",
+    "Sentencias SQL que terminaron con error",
+    ("engine", "operation")
+)
+sql_slow_queries = PrometheusCounter(
+    "smartlogix_db_slow_queries_total",
+    "Sentencias SQL por encima de SLOW_QUERY_THRESHOLD_MS",
+    ("engine", "operation")
+)
+http_request_query_warnings = PrometheusCounter(
+    "smartlogix_http_request_query_warnings_total",
+    "Peticiones que superaron REQUEST_QUERY_WARN consultas o repitieron una sentencia (posible N+1)",
+    ("route", "kind")
+)
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"%\(\w+\)s|\$\d+|(?<![:\w]):\w+|\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"),
+    (re.compile(r"\s+"), " ")
+]
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement: str) -> str:
+    # Literales y parámetros a "?" y listas IN colapsadas: las variantes de una misma consulta se agrupan
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+class RequestStats:
+    """Consultas SQL ejecutadas durante una petición; el middleware la crea y la publica en un ContextVar."""
+    
+    __slots__ = ("queries", "query_time", "statements")
+    
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+    
+    def add(self, statement: str, elapsed: float):
+        self.queries += 1
+        self.query_time += elapsed
+        self.statements[normalize_sql(statement)] += 1
+    
+    def repeated(self, threshold: int = None) -> list:
+        threshold = threshold or N_PLUS_ONE_THRESHOLD
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+    
+    def describe(self, limit: int = 10) -> str:
+        return "\n".join(f"  {count}x {sql}" for sql, count in self.statements.most_common(limit))
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+# Colectores globales de capture_queries(): ven las consultas de cualquier hilo o bucle de eventos
+_collectors = ()
+_collectors_lock = threading.Lock()
+
+def get_operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+def record_query(engine_label: str, statement: str, elapsed: float):
+    operation = get_operation(statement)
+    sql_query_duration.labels(engine=engine_label, operation=operation).observe(elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        sql_slow_queries.labels(engine=engine_label, operation=operation).inc()
+        print(f"🐢 Consulta lenta ({elapsed * 1000:.1f}ms, {engine_label}): {normalize_sql(statement)}")
+    
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.add(statement, elapsed)
+    for collector in _collectors:
+        collector.add(statement, elapsed)
+
+def report_request_queries(method: str, route: str, stats: RequestStats):
+    if REQUEST_QUERY_WARN and stats.queries > REQUEST_QUERY_WARN:
+        http_request_query_warnings.labels(route=route, kind="budget").inc()
+        print(
+            f"⚠️ {method} {route}: {stats.queries} consultas SQL en una petición "
+            f"(aviso a partir de {REQUEST_QUERY_WARN}):\n{stats.describe()}"
+        )
+    repeated = stats.repeated()
+    if repeated:
+        http_request_query_warnings.labels(route=route, kind="n_plus_one").inc()
+        for sql, count in repeated:
+            print(f"⚠️ {method} {route}: posible N+1, {count}x {sql}")
+
+@contextmanager
+def capture_queries():
+    """Cuenta las sentencias SQL ejecutadas dentro del bloque, en cualquier engine."""
+    global _collectors
+    
+    stats = RequestStats()
+    with _collectors_lock:
+        _collectors = _collectors + (stats,)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors = tuple(collector for collector in _collectors if collector is not stats)
+
+@contextmanager
+def assert_max_queries(n: int):
+    """Falla si el bloque ejecuta más de n sentencias SQL. Para fijar el presupuesto de consultas de una ruta:
+    
+        with assert_max_queries(3):
+            client.post("/enrollments/", json={...})
+    """
+    with capture_queries() as stats:
+        yield stats
+    if stats.queries > n:
+        raise AssertionError(f"Se ejecutaron {stats.queries} consultas SQL (máximo {n}):\n{stats.describe()}")
+
+def instrument_engine(engine, engine_label: str):
+    # Para engines async los eventos se registran en el engine síncrono subyacente
+    target = getattr(engine, "sync_engine", engine)
+    
+    @event.listens_for(target, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+    
+    @event.listens_for(target, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_query(engine_label, statement, time.perf_counter() - context._metrics_start)
+    
+    @event.listens_for(target, "handle_error")
+    def handle_error(exception_context):
+        context = exception_context.execution_context
+        statement = exception_context.statement or ""
+        sql_query_errors.labels(engine=engine_label, operation=get_operation(statement)).inc()
+        if context is not None and hasattr(context, "_metrics_start"):
+            record_query(engine_label, statement, time.perf_counter() - context._metrics_start)
+    
+    return engine
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, Index, UniqueConstraint, DDL, func, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -12,8 +12,18 @@ class Student(Base):
     nombre = Column(String(100), nullable=False)
     correo = Column(String(150), unique=True, nullable=False, index=True)
     fecha_registro = Column(DateTime, default=func.current_timestamp())
+    updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp(), index=True)
     
     enrollments = relationship("Enrollment", back_populates="student")
+    
+    __table_args__ = (
+        # Búsqueda de correo sin distinguir mayúsculas y búsqueda difusa de nombre (pg_trgm)
+        Index("ix_students_correo_lower", func.lower(correo)),
+        Index(
+            "ix_students_nombre_trgm", nombre,
+            postgresql_using="gin", postgresql_ops={"nombre": "gin_trgm_ops"}
+        ),
+    )
 
 class Course(Base):
     __tablename__ = "courses"
@@ -22,18 +32,118 @@ class Course(Base):
     titulo = Column(String(150), nullable=False)
     descripcion = Column(Text)
     fecha_creacion = Column(DateTime, default=func.current_timestamp())
+    updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp(), index=True)
     
     enrollments = relationship("Enrollment", back_populates="course")
+    # Solo lectura: estudiantes matriculados, para GET /courses?expand=students
+    students = relationship("Student", secondary="enrollments", viewonly=True, order_by="Student.id")
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
-    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
     estado = Column(String(20), default="Activo")
     puntaje = Column(Integer, default=100)
     fecha_matricula = Column(DateTime, default=func.current_timestamp())
+    updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp(), index=True)
     
     student = relationship("Student", back_populates="enrollments")
-    course = relationship("Course", back_populates="enrollments")
\ No newline at end of file
+    course = relationship("Course", back_populates="enrollments")
+    
+    __table_args__ = (
+        Index("ix_enrollments_fecha_matricula_id", "fecha_matricula", "id"),
+        # También cubre las búsquedas por student_id (columna inicial)
+        UniqueConstraint("student_id", "course_id", name="uq_enrollments_student_course"),
+    )
+
+class StudentMetrics(Base):
+    __tablename__ = "student_metrics"
+    
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    total_cursos = Column(Integer, default=0, nullable=False)
+    cursos_aprobados = Column(Integer, default=0, nullable=False)
+    cursos_desaprobados = Column(Integer, default=0, nullable=False)
+    cursos_en_progreso = Column(Integer, default=0, nullable=False)
+    cursos_retirados = Column(Integer, default=0, nullable=False)
+    n_notas = Column(Integer, default=0, nullable=False)
+    suma_notas = Column(Integer, default=0, nullable=False)
+    suma_cuadrados = Column(Integer, default=0, nullable=False)
+    nota_maxima = Column(Integer, nullable=True)
+    nota_minima = Column(Integer, nullable=True)
+    primera_mitad_suma = Column(Integer, default=0, nullable=False)
+    # La suma de la primera mitad se recalcula fuera de la escritura de matrículas (refresh_pending_first_half)
+    primera_mitad_pendiente = Column(Boolean, default=False, nullable=False)
+    updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+class CourseStats(Base):
+    __tablename__ = "course_stats"
+    
+    # Una fila por curso y mes de matrícula ("YYYY-MM"); los cambios de estado se aplican al mes de la matrícula
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True)
+    mes = Column(String(7), primary_key=True)
+    matriculas = Column(Integer, default=0, nullable=False)
+    cursando = Column(Integer, default=0, nullable=False)
+    aprobados = Column(Integer, default=0, nullable=False)
+    desaprobados = Column(Integer, default=0, nullable=False)
+    retirados = Column(Integer, default=0, nullable=False)
+    n_notas = Column(Integer, default=0, nullable=False)
+    suma_notas = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+class CourseScoreCount(Base):
+    __tablename__ = "course_score_counts"
+    
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True)
+    puntaje = Column(Integer, primary_key=True)
+    cantidad = Column(Integer, default=0, nullable=False)
+
+class DeletedRecord(Base):
+    __tablename__ = "deleted_records"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(50), nullable=False, index=True)
+    record_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=func.current_timestamp(), index=True)
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+    
+    table_name = Column(String(50), primary_key=True)
+    high_water_mark = Column(DateTime, nullable=True)
+    last_sync_at = Column(DateTime, nullable=True)
+    last_sync_mode = Column(String(20), nullable=True)
+    rows_synced = Column(Integer, default=0)
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(50), nullable=False)
+    aggregate = Column(String(50), nullable=False)
+    aggregate_id = Column(Integer, nullable=True)
+    status = Column(String(20), default="pending", nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=func.current_timestamp(), index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.current_timestamp())
+    processed_at = Column(DateTime, nullable=True)
+
+def record_tombstone(mapper, connection, target):
+    connection.execute(
+        DeletedRecord.__table__.insert().values(
+            table_name=target.__tablename__,
+            record_id=target.id
+        )
+    )
+
+for model in (Student, Course, Enrollment):
+    event.listen(model, "after_delete", record_tombstone)
+
+# Los índices trigram de students requieren la extensión pg_trgm
+event.listen(
+    Student.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
@@ -1,6 +1,8 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Generic, Optional, List, TypeVar
+
+T = TypeVar("T")
 
 class StudentBase(BaseModel):
     nombre: str
@@ -11,6 +13,8 @@ class StudentCreate(StudentBase):
 
 class StudentResponse(StudentBase):
     id: int
+    # Ya se validó al registrarlo: las respuestas no vuelven a pasar por el validador de correos
+    correo: str
     fecha_registro: datetime
     
     class Config:
@@ -49,17 +53,60 @@ class EnrollmentResponse(EnrollmentBase):
     class Config:
         from_attributes = True
 
+class StudentSummary(BaseModel):
+    id: int
+    nombre: str
+    correo: str
+    
+    class Config:
+        from_attributes = True
+
+class CourseSummary(BaseModel):
+    id: int
+    titulo: str
+    descripcion: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class EnrollmentDetailResponse(BaseModel):
+    enrollment_id: int = Field(validation_alias="id")
+    student: StudentSummary
+    course: CourseSummary
+    estado: Optional[str] = None
+    puntaje: Optional[int] = None
+    fecha_matricula: datetime
+    
+    class Config:
+        from_attributes = True
+
 class StudentWithEnrollments(StudentResponse):
     enrollments: List[EnrollmentResponse] = []
 
 class CourseWithEnrollments(CourseResponse):
     enrollments: List[EnrollmentResponse] = []
+    students: List[StudentSummary] = []
+
+class BatchPredictionRequest(BaseModel):
+    student_ids: Optional[List[int]] = None
+    include_recommendations: bool = True
+    max_recommendations: int = 5
+    # Sin student_ids se recorre toda la cohorte por páginas de hasta PREDICTION_BATCH_MAX_IDS estudiantes
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
 
 class APIResponse(BaseModel):
     message: str
     data: Optional[dict | list] = None
     total: Optional[int] = None
 
+class APIListResponse(BaseModel, Generic[T]):
+    message: str
+    data: List[T]
+    total: Optional[int] = None
+    # Solo los listados paginan: las respuestas de un recurso (APIResponse) no llevan cursor
+    next_cursor: Optional[str] = None
+
 class HealthResponse(BaseModel):
     status: str
     timestamp: str
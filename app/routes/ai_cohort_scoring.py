@@ -0,0 +1,124 @@
+from typing import TYPE_CHECKING, Dict, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+TRENDS = [
+    {"tendencia": "Insuficientes datos", "direccion": "neutral"},
+    {"tendencia": "Mejorando significativamente", "direccion": "positiva"},
+    {"tendencia": "Mejorando gradualmente", "direccion": "positiva"},
+    {"tendencia": "Estable", "direccion": "neutral"},
+    {"tendencia": "Declinando gradualmente", "direccion": "negativa"},
+    {"tendencia": "Declinando significativamente", "direccion": "negativa"}
+]
+
+RISK_LEVELS = [
+    {"level": "Bajo", "description": "Estudiante en buen estado académico", "color": "green"},
+    {"level": "Moderado", "description": "Seguimiento recomendado", "color": "yellow"},
+    {"level": "Alto", "description": "Requiere intervención académica", "color": "red"}
+]
+
+DIFFICULTY_MATCHES = [
+    "Muy desafiante - Recomendamos prerrequisitos",
+    "Desafiante - Considera preparación previa",
+    "Moderada - Requerirá esfuerzo adicional",
+    "Buena - Deberías aprobar sin problemas",
+    "Perfecta - Curso ideal para ti"
+]
+
+def python_mean(total: int, count: int):
+    # Igual que statistics.mean sobre enteros: int si la división es exacta, float en otro caso
+    return total // count if total % count == 0 else total / count
+
+def metric_arrays(metrics: Sequence[Dict]) -> Dict[str, "np.ndarray"]:
+    """Columnas de student_metrics (un dict por estudiante, en el orden del lote) como arrays."""
+    import numpy as np
+
+    def column(field: str) -> "np.ndarray":
+        return np.fromiter((m[field] or 0 for m in metrics), dtype=np.int64, count=len(metrics))
+
+    n_notas = column("n_notas")
+    return {
+        "total_cursos": column("total_cursos"),
+        "cursos_aprobados": column("cursos_aprobados"),
+        "cursos_desaprobados": column("cursos_desaprobados"),
+        "cursos_en_progreso": column("cursos_en_progreso"),
+        "cursos_retirados": column("cursos_retirados"),
+        "n_notas": n_notas,
+        "suma_notas": column("suma_notas"),
+        "nota_maxima": np.where(n_notas > 0, column("nota_maxima"), 0),
+        "nota_minima": np.where(n_notas > 0, column("nota_minima"), 0),
+        "mitad": n_notas // 2,
+        "primera_suma": column("primera_mitad_suma")
+    }
+
+def score_cohort(aggregates: Dict[str, "np.ndarray"]) -> Dict[str, "np.ndarray"]:
+    # numpy se importa al primer lote, no al arrancar la API
+    import numpy as np
+
+    n_notas = aggregates["n_notas"]
+    suma = aggregates["suma_notas"]
+    finalizados = aggregates["cursos_aprobados"] + aggregates["cursos_desaprobados"]
+
+    # El redondeo se hace con round() de Python para reproducir exactamente la respuesta individual
+    promedio = [
+        round(python_mean(int(s), int(c)), 1) if c else 0.0
+        for s, c in zip(suma, n_notas)
+    ]
+    tasa = [
+        round((int(a) / int(f) * 100), 1) if f > 0 else 0.0
+        for a, f in zip(aggregates["cursos_aprobados"], finalizados)
+    ]
+    promedio_arr = np.array(promedio, dtype=float)
+    tasa_arr = np.array(tasa, dtype=float)
+
+    mitad = aggregates["mitad"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        primera = np.where(mitad > 0, aggregates["primera_suma"] / np.maximum(mitad, 1), 0.0)
+        segunda = (suma - aggregates["primera_suma"]) / np.maximum(n_notas - mitad, 1)
+    diferencia = segunda - primera
+    trend = np.select(
+        [n_notas < 2, diferencia > 1.0, diferencia > 0.3, np.abs(diferencia) <= 0.3, diferencia > -1.0],
+        [0, 1, 2, 3, 4],
+        5
+    )
+
+    risk_score = (
+        np.select([promedio_arr < 11, promedio_arr < 13], [30, 15], 0)
+        + np.select([tasa_arr < 50, tasa_arr < 70], [25, 10], 0)
+        + np.where(aggregates["cursos_retirados"] > 0, 15, 0)
+        + np.where(aggregates["cursos_en_progreso"] > 3, 10, 0)
+    )
+    risk = np.select([risk_score >= 50, risk_score >= 25], [2, 1], 0)
+
+    variabilidad = aggregates["nota_maxima"] - aggregates["nota_minima"]
+    base_probability = (
+        50.0
+        + np.select([promedio_arr >= 16, promedio_arr >= 13, promedio_arr >= 11], [25, 15, 5], -10)
+        + np.select([tasa_arr >= 80, tasa_arr >= 60, tasa_arr >= 40], [20, 10, 0], -15)
+        + np.select([finalizados >= 5, finalizados >= 3, finalizados >= 1], [15, 10, 5], 0)
+        + np.where(n_notas > 0, np.select([variabilidad <= 3, variabilidad <= 5], [10, 5], 0), 0)
+    )
+
+    return {
+        "promedio_general": promedio,
+        "tasa_aprobacion": tasa,
+        "cursos_completados": finalizados,
+        "trend": trend,
+        "risk": risk,
+        "base_probability": base_probability
+    }
+
+def build_student_metrics(aggregates: Dict[str, "np.ndarray"], scores: Dict, i: int) -> Dict:
+    return {
+        "total_cursos": int(aggregates["total_cursos"][i]),
+        "cursos_completados": int(scores["cursos_completados"][i]),
+        "cursos_aprobados": int(aggregates["cursos_aprobados"][i]),
+        "cursos_desaprobados": int(aggregates["cursos_desaprobados"][i]),
+        "cursos_en_progreso": int(aggregates["cursos_en_progreso"][i]),
+        "cursos_retirados": int(aggregates["cursos_retirados"][i]),
+        "promedio_general": scores["promedio_general"][i],
+        "tasa_aprobacion": scores["tasa_aprobacion"][i],
+        "nota_maxima": int(aggregates["nota_maxima"][i]),
+        "nota_minima": int(aggregates["nota_minima"][i])
+    }
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Course, Enrollment
+from .ai_cohort_scoring import DIFFICULTY_MATCHES
+
+COURSE_FEATURES_TTL_SECONDS = float(os.getenv("COURSE_FEATURES_TTL_SECONDS", "300"))
+
+# Matrículas "virtuales" con la tasa global que se suman a cada curso: un curso con 2 matrículas
+# no debe quedar primero ni último por azar
+PRIOR_ENROLLMENTS = 5
+# Puntos de probabilidad por cada unidad de diferencia con la media global (0.1 por encima = +5)
+PASS_RATE_WEIGHT = 50
+WITHDRAWAL_RATE_WEIGHT = 50
+# Fracción de la diferencia de nota media del curso que se traslada a la nota esperada
+MEAN_SCORE_WEIGHT = 0.5
+# Afinidad estudiante-curso: puntos de probabilidad por cada punto entre el nivel del estudiante y la nota
+# media del curso, saturados en ±LEVEL_GAP_CAP (con suficiente ventaja, o desventaja, el curso ya no distingue)
+LEVEL_GAP_WEIGHT = 5
+LEVEL_GAP_CAP = 15
+# La tendencia desplaza el nivel: quien mejora rinde por encima de su promedio histórico
+TREND_LEVEL_SHIFT = {"positiva": 1.0, "neutral": 0.0, "negativa": -1.0}
+# Un estudiante que ya abandonó cursos pesa más la tasa de retiro del curso (x3 si los abandonó todos)
+STUDENT_WITHDRAWAL_WEIGHT = 2
+
+def smoothed(value: int, count: int, prior: float) -> float:
+    return (value + PRIOR_ENROLLMENTS * prior) / (count + PRIOR_ENROLLMENTS)
+
+def student_profile(academic_metrics: Dict, learning_trend: Dict) -> Dict:
+    """Features del estudiante que intervienen en la afinidad con cada curso."""
+    total_cursos = academic_metrics["total_cursos"]
+    return {
+        "promedio_general": academic_metrics["promedio_general"],
+        "direccion": learning_trend["direccion"],
+        "tasa_retiro": academic_metrics["cursos_retirados"] / total_cursos if total_cursos else 0.0
+    }
+
+def raw_probability(base_probability: float, student: Dict, ajuste_aprobacion, ajuste_retiro, nivel):
+    """Probabilidad sin recortar del estudiante en uno o varios cursos (escalares o arrays de numpy)."""
+    import numpy as np
+
+    nivel_estudiante = student["promedio_general"] + TREND_LEVEL_SHIFT[student["direccion"]]
+    return (
+        base_probability
+        + ajuste_aprobacion
+        + ajuste_retiro * (1 + student["tasa_retiro"] * STUDENT_WITHDRAWAL_WEIGHT)
+        + np.clip((nivel_estudiante - nivel) * LEVEL_GAP_WEIGHT, -LEVEL_GAP_CAP, LEVEL_GAP_CAP)
+    )
+
+class CourseFeatureSnapshot:
+    """Features por curso, como dicts y como arrays por columna, inmutable una vez construido."""
+
+    def __init__(self, rows: list):
+        import numpy as np
+
+        total = sum(r.total for r in rows)
+        finalizados = sum(r.aprobados + r.desaprobados for r in rows)
+        n_notas = sum(r.n_notas for r in rows)
+        self.global_pass_rate = sum(r.aprobados for r in rows) / finalizados if finalizados else 0.0
+        self.global_withdrawal_rate = sum(r.retirados for r in rows) / total if total else 0.0
+        self.global_mean_score = sum(r.suma_notas or 0 for r in rows) / n_notas if n_notas else 0.0
+
+        self.features = [self.build_features(r) for r in rows]
+        # Columnas para puntuar todo el catálogo contra cada estudiante en una sola pasada
+        self.columns = {
+            field: np.array([f[field] for f in self.features], dtype=float)
+            for field in ("ajuste_aprobacion", "ajuste_retiro", "ajuste_nota", "nivel")
+        }
+        self.ids = np.array([f["course_id"] for f in self.features], dtype=np.int64)
+        self.course_ids = frozenset(f["course_id"] for f in self.features)
+        self.loaded_at = time.monotonic()
+
+    def build_features(self, row) -> Dict:
+        pass_rate = smoothed(row.aprobados, row.aprobados + row.desaprobados, self.global_pass_rate)
+        withdrawal_rate = smoothed(row.retirados, row.total, self.global_withdrawal_rate)
+        mean_score = smoothed(row.suma_notas or 0, row.n_notas, self.global_mean_score)
+        return {
+            "course_id": row.id,
+            "titulo": row.titulo,
+            "matriculas": row.total,
+            "tasa_aprobacion": round(pass_rate * 100, 1),
+            "tasa_retiro": round(withdrawal_rate * 100, 1),
+            "nota_media": round(mean_score, 1),
+            "nivel": mean_score,
+            "ajuste_aprobacion": (pass_rate - self.global_pass_rate) * PASS_RATE_WEIGHT,
+            "ajuste_retiro": -(withdrawal_rate - self.global_withdrawal_rate) * WITHDRAWAL_RATE_WEIGHT,
+            "ajuste_nota": (mean_score - self.global_mean_score) * MEAN_SCORE_WEIGHT
+        }
+
+    def top_for_student(self, base_probability: float, student: Dict, taken: set, k: int) -> List[Dict]:
+        """Los k cursos no cursados con mayor probabilidad para este estudiante (sin recortar, para que el
+        tope de 95 no empate a los mejores), desempatando por nota esperada e ID."""
+        import numpy as np
+
+        if not self.features or k <= 0:
+            return []
+        candidates = np.flatnonzero(~np.isin(self.ids, list(taken))) if taken else np.arange(len(self.features))
+        probability = raw_probability(
+            base_probability, student,
+            self.columns["ajuste_aprobacion"][candidates],
+            self.columns["ajuste_retiro"][candidates],
+            self.columns["nivel"][candidates]
+        )
+        if k < len(candidates):
+            # argpartition da el umbral del k-ésimo en O(n); se conservan todos los empatados con él para que
+            # el desempate siga siendo determinista y solo se ordena ese puñado
+            threshold = probability[np.argpartition(-probability, k - 1)[k - 1]]
+            shortlist = np.flatnonzero(probability >= threshold)
+            candidates, probability = candidates[shortlist], probability[shortlist]
+        order = np.lexsort((self.ids[candidates], -self.columns["ajuste_nota"][candidates], -probability))[:k]
+        return [self.features[i] for i in candidates[order]]
+
+    def count_untaken(self, taken: set) -> int:
+        return len(self.features) - len(self.course_ids & taken)
+
+class CourseFeatureIndex:
+    """Índice en memoria de features por curso: se recarga con una consulta agregada cuando caduca
+    (COURSE_FEATURES_TTL_SECONDS) o se invalida, y se sustituye de forma atómica."""
+
+    def __init__(self, ttl_seconds: float = COURSE_FEATURES_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.snapshot: Optional[CourseFeatureSnapshot] = None
+        self._stale = True
+        self._lock = asyncio.Lock()
+
+    def is_fresh(self, snapshot: Optional[CourseFeatureSnapshot]) -> bool:
+        return (
+            snapshot is not None and not self._stale
+            and time.monotonic() - snapshot.loaded_at < self.ttl_seconds
+        )
+
+    def invalidate(self):
+        self._stale = True
+
+    async def get(self, db: AsyncSession) -> CourseFeatureSnapshot:
+        snapshot = self.snapshot
+        if self.is_fresh(snapshot):
+            return snapshot
+        # Otra petición ya está recargando: se sirve el índice anterior en lugar de esperar
+        if snapshot is not None and self._lock.locked():
+            return snapshot
+
+        async with self._lock:
+            if not self.is_fresh(self.snapshot):
+                await self.refresh(db)
+            return self.snapshot
+
+    async def refresh(self, db: AsyncSession):
+        self._stale = False
+        rows = (await db.execute(
+            select(
+                Course.id,
+                Course.titulo,
+                func.count(Enrollment.id).label("total"),
+                func.count(case((Enrollment.estado == "Aprobado", 1))).label("aprobados"),
+                func.count(case((Enrollment.estado == "Desaprobado", 1))).label("desaprobados"),
+                func.count(case((Enrollment.estado == "Retirado", 1))).label("retirados"),
+                func.count(Enrollment.puntaje).label("n_notas"),
+                func.sum(Enrollment.puntaje).label("suma_notas")
+            ).outerjoin(Enrollment, Enrollment.course_id == Course.id).group_by(Course.id, Course.titulo)
+        )).all()
+        self.snapshot = CourseFeatureSnapshot(rows)
+
+course_feature_index = CourseFeatureIndex()
+
+def get_difficulty_index(probability: float) -> int:
+    if probability >= 85:
+        return 4
+    elif probability >= 70:
+        return 3
+    elif probability >= 55:
+        return 2
+    elif probability >= 40:
+        return 1
+    else:
+        return 0
+
+def predict_for_course(base_probability: float, student: Dict, course: Dict) -> Dict:
+    """Predicción del estudiante (probabilidad base sin recortar y perfil de student_profile) en un curso concreto."""
+    probability = float(raw_probability(
+        base_probability, student, course["ajuste_aprobacion"], course["ajuste_retiro"], course["nivel"]
+    ))
+    probability = max(15, min(95, probability))
+
+    nota_esperada = student["promedio_general"]
+    if probability >= 80:
+        nota_esperada += 1.5
+    elif probability >= 60:
+        nota_esperada += 0.5
+    elif probability < 40:
+        nota_esperada -= 1.0
+    nota_esperada = max(0, min(20, round(nota_esperada + course["ajuste_nota"], 1)))
+
+    return {
+        "course_id": course["course_id"],
+        "titulo": course["titulo"],
+        "success_probability": round(probability, 1),
+        "predicted_score": nota_esperada,
+        "confidence_level": round(min(95, probability + 5), 1),
+        "difficulty_match": DIFFICULTY_MATCHES[get_difficulty_index(probability)],
+        "course_pass_rate": course["tasa_aprobacion"],
+        "course_withdrawal_rate": course["tasa_retiro"],
+        "course_mean_score": course["nota_media"]
+    }
+
+def rank_courses(snapshot: CourseFeatureSnapshot, base_probability: float, student: Dict, taken: set, k: int) -> List[Dict]:
+    return [predict_for_course(base_probability, student, course) for course in snapshot.top_for_student(base_probability, student, taken, k)]
@@ -0,0 +1,337 @@
+"""
+Recomendador por filtrado colaborativo ítem-ítem entrenado fuera de línea sobre la matriz dispersa
+estudiante × curso de la tabla enrollments (scipy.sparse).
+
+El artefacto es un directorio de arrays .npy que cada worker abre con mmap (sin copiar a memoria propia,
+las páginas se comparten entre procesos). CURRENT apunta a la versión activa; los workers lo revisan cada
+RECOMMENDER_RELOAD_SECONDS y cambian de modelo sin reiniciar.
+
+Uso:
+    python -m app.routes.ai_recommender build   # entrena y publica una versión nueva
+    python -m app.routes.ai_recommender info    # versión activa
+"""
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+from sqlalchemy import select
+
+from ..models.models import Course, Enrollment
+
+if TYPE_CHECKING:
+    import numpy as np
+
+router = APIRouter()
+
+RECOMMENDER_ARTIFACT_DIR = os.getenv("RECOMMENDER_ARTIFACT_DIR", "artifacts/recommender")
+RECOMMENDER_NEIGHBORS = int(os.getenv("RECOMMENDER_NEIGHBORS", "50"))
+RECOMMENDER_RELOAD_SECONDS = float(os.getenv("RECOMMENDER_RELOAD_SECONDS", "30"))
+RECOMMENDER_KEEP_VERSIONS = 3
+BUILD_FETCH_SIZE = 50000
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+# students: ids ordenados; indptr/items/ratings: historial de cada estudiante en formato CSR;
+# neighbors/similarities: los RECOMMENDER_NEIGHBORS cursos más similares de cada curso;
+# popularity: cursos de más a menos populares, para estudiantes sin historial
+ARRAYS = ("course_ids", "student_ids", "indptr", "items", "ratings", "neighbors", "similarities", "popularity")
+
+# Peso de cada matrícula en la matriz: aprobar (y con mejor nota) es la señal más fuerte
+OUTCOME_WEIGHTS = {"Aprobado": 1.0, "Cursando": 0.75, "Desaprobado": 0.4, "Retirado": 0.2}
+
+def enrollment_rating(estado: Optional[str], puntaje: Optional[int]) -> float:
+    weight = OUTCOME_WEIGHTS.get(estado, 0.5)
+    if estado == "Aprobado" and puntaje is not None:
+        weight += puntaje / 20
+    return weight
+
+def item_similarities(items: "np.ndarray", ratings: "np.ndarray", student_rows: "np.ndarray", n_students: int, n_courses: int):
+    """Similitud coseno entre cursos como matriz dispersa (CSR): X.T @ X sobre la matriz estudiante × curso
+    solo materializa los pares de cursos que algún estudiante comparte."""
+    import numpy as np
+    from scipy import sparse
+
+    X = sparse.csr_matrix(
+        (ratings.astype(np.float64), (student_rows, items)), shape=(n_students, n_courses)
+    )
+    gram = (X.T @ X).tocsr()
+    norms = np.sqrt(gram.diagonal())
+    gram.setdiag(0)
+    gram.eliminate_zeros()
+
+    rows = np.repeat(np.arange(n_courses), np.diff(gram.indptr))
+    gram.data /= norms[rows] * norms[gram.indices]
+    return gram
+
+def top_neighbors(similarity, k: int):
+    """Los k vecinos más similares de cada curso; las filas con menos vecinos se rellenan con similitud 0."""
+    import numpy as np
+
+    n_courses = similarity.shape[0]
+    k = max(0, min(k, n_courses - 1))
+    neighbor_ids = np.zeros((n_courses, k), dtype=np.int32)
+    neighbor_scores = np.zeros((n_courses, k), dtype=np.float32)
+    if k == 0:
+        return neighbor_ids, neighbor_scores
+
+    for row in range(n_courses):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        columns, scores = similarity.indices[start:end], similarity.data[start:end]
+        candidates = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        # Empates por índice de curso: el artefacto no depende del orden interno de la matriz
+        candidates = candidates[np.lexsort((columns[candidates], -scores[candidates]))]
+        neighbor_ids[row, :len(candidates)] = columns[candidates]
+        neighbor_scores[row, :len(candidates)] = scores[candidates]
+    return neighbor_ids, neighbor_scores
+
+def build_artifact(db, root: str = RECOMMENDER_ARTIFACT_DIR, neighbors: int = RECOMMENDER_NEIGHBORS) -> Dict:
+    """Entrena el modelo con una sesión síncrona y publica una versión nueva de forma atómica."""
+    import numpy as np
+
+    start = time.perf_counter()
+    courses = db.execute(select(Course.id, Course.titulo).order_by(Course.id)).all()
+    course_ids = np.array([c.id for c in courses], dtype=np.int64)
+
+    statement = select(
+        Enrollment.student_id, Enrollment.course_id, Enrollment.estado, Enrollment.puntaje
+    ).order_by(Enrollment.student_id, Enrollment.course_id).execution_options(yield_per=BUILD_FETCH_SIZE)
+    students, items, ratings = [], [], []
+    for partition in db.execute(statement).partitions():
+        students.append(np.fromiter((r[0] for r in partition), dtype=np.int64, count=len(partition)))
+        items.append(np.fromiter((r[1] for r in partition), dtype=np.int64, count=len(partition)))
+        ratings.append(np.fromiter((enrollment_rating(r[2], r[3]) for r in partition), dtype=np.float32, count=len(partition)))
+
+    students = np.concatenate(students) if students else np.zeros(0, dtype=np.int64)
+    items = np.concatenate(items) if items else np.zeros(0, dtype=np.int64)
+    ratings = np.concatenate(ratings) if ratings else np.zeros(0, dtype=np.float32)
+
+    # Matrículas de cursos creados después de leer el catálogo: se descartan hasta la próxima versión
+    positions = np.searchsorted(course_ids, items)
+    known = np.zeros(len(items), dtype=bool)
+    if len(course_ids):
+        known = course_ids[np.minimum(positions, len(course_ids) - 1)] == items
+    students, items, ratings = students[known], positions[known].astype(np.int32), ratings[known]
+
+    student_ids, student_rows = np.unique(students, return_inverse=True)
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(student_rows, minlength=len(student_ids))))).astype(np.int64)
+
+    similarity = item_similarities(items, ratings, student_rows, len(student_ids), len(course_ids))
+    neighbor_ids, neighbor_scores = top_neighbors(similarity, neighbors)
+    popularity = np.argsort(-np.bincount(items, weights=ratings, minlength=len(course_ids)), kind="stable").astype(np.int32)
+
+    arrays = {
+        "course_ids": course_ids,
+        "student_ids": student_ids.astype(np.int64),
+        "indptr": indptr,
+        "items": items,
+        "ratings": ratings,
+        "neighbors": neighbor_ids,
+        "similarities": neighbor_scores,
+        "popularity": popularity
+    }
+    version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    # El manifiesto guarda los títulos para responder sin consultar la base de datos
+    manifest = {
+        "version": version,
+        "built_at": datetime.now().isoformat(),
+        "students": len(student_ids),
+        "courses": len(course_ids),
+        "enrollments": len(items),
+        "neighbors": int(neighbor_ids.shape[1]),
+        "course_titles": [c.titulo for c in courses],
+        "build_seconds": round(time.perf_counter() - start, 3)
+    }
+
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f".{version}.tmp")
+    os.makedirs(staging)
+    for name, array in arrays.items():
+        np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.rename(staging, os.path.join(root, version))
+    publish_version(root, version)
+    prune_versions(root, version)
+    return manifest
+
+def publish_version(root: str, version: str):
+    # os.replace es atómico: un worker nunca lee un CURRENT a medio escribir
+    pointer = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+
+def prune_versions(root: str, current: str):
+    # Los workers que aún mapean una versión borrada la siguen leyendo hasta cambiar de modelo
+    versions = sorted(name for name in os.listdir(root) if not name.startswith(".") and name != CURRENT_FILE)
+    for name in versions[:-RECOMMENDER_KEEP_VERSIONS]:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+class RecommenderModel:
+    """Una versión del artefacto abierta con mmap, de solo lectura."""
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+        self.version = self.manifest["version"]
+        self.course_titles = self.manifest["course_titles"]
+
+    def student_history(self, student_id: int):
+        import numpy as np
+
+        position = int(np.searchsorted(self.student_ids, student_id))
+        if position >= len(self.student_ids) or self.student_ids[position] != student_id:
+            return None
+        start, end = self.indptr[position], self.indptr[position + 1]
+        return self.items[start:end], self.ratings[start:end]
+
+    def recommend(self, student_id: int, k: int) -> Dict:
+        import numpy as np
+
+        history = self.student_history(student_id)
+        n_courses = len(self.course_ids)
+        selected, scores = [], {}
+        taken = np.zeros(n_courses, dtype=bool)
+
+        if history is not None and len(history[0]) and self.neighbors.shape[1]:
+            items, ratings = history
+            taken[items] = True
+            # Puntuación de cada curso: suma de similitudes con los cursos del historial, ponderadas por su nota
+            accumulated = np.bincount(
+                self.neighbors[items].ravel(),
+                weights=(self.similarities[items] * ratings[:, None]).ravel(),
+                minlength=n_courses
+            )
+            accumulated[taken] = 0.0
+            candidates = np.flatnonzero(accumulated > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-accumulated[candidates], k - 1)[:k]]
+            candidates = candidates[np.argsort(-accumulated[candidates], kind="stable")]
+            selected = [int(i) for i in candidates]
+            scores = {i: float(accumulated[i]) for i in selected}
+        elif history is not None:
+            taken[history[0]] = True
+
+        # Sin historial o sin suficientes vecinos: se completa con los cursos más populares no cursados
+        if len(selected) < k:
+            chosen = set(selected)
+            for i in self.popularity:
+                if len(selected) >= k:
+                    break
+                i = int(i)
+                if not taken[i] and i not in chosen:
+                    selected.append(i)
+
+        return {
+            "known_student": history is not None,
+            "recommendations": [
+                {
+                    "course_id": int(self.course_ids[i]),
+                    "titulo": self.course_titles[i],
+                    "score": round(scores[i], 4) if i in scores else None,
+                    "source": "filtrado colaborativo" if i in scores else "popularidad"
+                }
+                for i in selected
+            ]
+        }
+
+class RecommenderStore:
+    """Modelo activo del worker. Revisa CURRENT como mucho cada reload_seconds y sustituye la referencia
+    al modelo de forma atómica: las peticiones en curso terminan con la versión que ya tenían."""
+
+    def __init__(self, root: str = RECOMMENDER_ARTIFACT_DIR, reload_seconds: float = RECOMMENDER_RELOAD_SECONDS):
+        self.root = root
+        self.reload_seconds = reload_seconds
+        self.model: Optional[RecommenderModel] = None
+        self._checked_at = 0.0
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> bool:
+        self._checked_at = time.monotonic()
+        version = self.current_version()
+        if version is None:
+            return False
+        if self.model is not None and self.model.version == version:
+            return True
+
+        self.model = RecommenderModel(os.path.join(self.root, version))
+        print(f"✅ Modelo de recomendaciones {version} cargado ({self.model.manifest['courses']} cursos)")
+        return True
+
+    def get(self) -> Optional[RecommenderModel]:
+        if time.monotonic() - self._checked_at >= self.reload_seconds:
+            try:
+                self.load()
+            except Exception as e:
+                # Se mantiene el modelo anterior si la versión nueva no se puede abrir
+                print(f"⚠️ No se pudo cargar el modelo de recomendaciones: {e}")
+        return self.model
+
+recommender_store = RecommenderStore()
+
+@router.get("/recommendations/{student_id}")
+async def get_course_recommendations(
+    student_id: int,
+    limit: int = Query(5, ge=1, le=50, description="Número de cursos recomendados")
+):
+    model = recommender_store.get()
+    if model is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Modelo de recomendaciones no disponible. Generarlo con: python -m app.routes.ai_recommender build"
+        )
+
+    result = model.recommend(student_id, limit)
+    return {
+        "smartlogix_ai": "Course Recommender (item-item CF) v1.0",
+        "student_id": student_id,
+        "model_version": model.version,
+        "model_built_at": model.manifest["built_at"],
+        "known_student": result["known_student"],
+        "total": len(result["recommendations"]),
+        "recommendations": result["recommendations"]
+    }
+
+if __name__ == "__main__":
+    from app.database.database import SessionLocal, get_engine
+
+    get_engine()
+    command = sys.argv[1] if len(sys.argv) > 1 else "info"
+    if command == "build":
+        db = SessionLocal()
+        try:
+            manifest = build_artifact(db)
+        finally:
+            db.close()
+        print(
+            f"✅ Modelo {manifest['version']} publicado en {RECOMMENDER_ARTIFACT_DIR}: {manifest['students']} estudiantes, "
+            f"{manifest['courses']} cursos, {manifest['enrollments']} matrículas en {manifest['build_seconds']}s"
+        )
+    elif command == "info":
+        version = recommender_store.current_version()
+        if version is None:
+            print(f"Sin modelo publicado en {RECOMMENDER_ARTIFACT_DIR}")
+            sys.exit(1)
+        with open(os.path.join(RECOMMENDER_ARTIFACT_DIR, version, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        manifest.pop("course_titles")
+        print(json.dumps(manifest, indent=2, ensure_ascii=False))
+    else:
+        print("Uso: python -m app.routes.ai_recommender [build|info]")
+        sys.exit(2)
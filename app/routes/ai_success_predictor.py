@@ -1,79 +1,89 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from ..database.database import get_db
-from ..models.models import Student, Course, Enrollment
-import statistics
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, select
+from ..database.database import get_async_db
+from ..database.student_metrics import METRIC_FIELDS, aggregate_statement, first_half_statement, first_half_sums
+from ..models.models import Student, Enrollment, StudentMetrics
+from ..models.schemas import BatchPredictionRequest
+from .students import search_students
+from .ai_cohort_scoring import (
+    TRENDS, RISK_LEVELS, python_mean, metric_arrays, score_cohort, build_student_metrics
+)
+from .ai_course_ranking import course_feature_index, rank_courses, student_profile
+from .pagination import encode_cursor, decode_cursor, split_page
+import os
 from typing import List, Dict, Union, Optional
 import re
 
 router = APIRouter()
 
-def find_student_flexible(db: Session, identifier: str) -> Optional[Student]:
-    if identifier.isdigit():
-        student = db.query(Student).filter(Student.id == int(identifier)).first()
-        if student:
-            return student
-    
-    student = db.query(Student).filter(Student.correo.ilike(identifier)).first()
-    if student:
-        return student
-    
-    student = db.query(Student).filter(Student.nombre.ilike(f"%{identifier}%")).first()
-    if student:
-        return student
-    
-    return None
+PREDICTION_BATCH_MAX_IDS = int(os.getenv("PREDICTION_BATCH_MAX_IDS", "10000"))
 
-def calculate_student_academic_metrics(db: Session, student_id: int) -> Dict:
-    enrollments = db.query(Enrollment).filter(
-        Enrollment.student_id == student_id
-    ).all()
-    
-    if not enrollments:
-        return {
-            "total_cursos": 0,
-            "cursos_completados": 0,
-            "cursos_aprobados": 0,
-            "cursos_en_progreso": 0,
-            "promedio_general": 0.0,
-            "tasa_aprobacion": 0.0,
-            "notas": []
-        }
-    
-    total_cursos = len(enrollments)
-    cursos_aprobados = len([e for e in enrollments if e.estado == "Aprobado"])
-    cursos_desaprobados = len([e for e in enrollments if e.estado == "Desaprobado"])
-    cursos_en_progreso = len([e for e in enrollments if e.estado == "Cursando"])
-    cursos_retirados = len([e for e in enrollments if e.estado == "Retirado"])
-    
-    notas = [e.puntaje for e in enrollments if e.puntaje is not None]
-    promedio_general = round(statistics.mean(notas), 1) if notas else 0.0
+async def find_student_flexible(db: AsyncSession, identifier: str) -> Optional[Student]:
+    # Una sola consulta con índices: ID, lower(correo) y nombre (trigram en PostgreSQL)
+    matches = await search_students(db, identifier, limit=1, fuzzy=False)
+    return matches[0][0] if matches else None
+
+def build_academic_metrics(counts: Dict) -> Dict:
+    n_notas = counts["n_notas"]
+    promedio_general = round(python_mean(counts["suma_notas"], n_notas), 1) if n_notas else 0.0
     
-    cursos_finalizados = cursos_aprobados + cursos_desaprobados
-    tasa_aprobacion = round((cursos_aprobados / cursos_finalizados * 100), 1) if cursos_finalizados > 0 else 0.0
+    cursos_finalizados = counts["cursos_aprobados"] + counts["cursos_desaprobados"]
+    tasa_aprobacion = round((counts["cursos_aprobados"] / cursos_finalizados * 100), 1) if cursos_finalizados > 0 else 0.0
     
     return {
-        "total_cursos": total_cursos,
+        "total_cursos": counts["total_cursos"],
         "cursos_completados": cursos_finalizados,
-        "cursos_aprobados": cursos_aprobados,
-        "cursos_desaprobados": cursos_desaprobados,
-        "cursos_en_progreso": cursos_en_progreso,
-        "cursos_retirados": cursos_retirados,
+        "cursos_aprobados": counts["cursos_aprobados"],
+        "cursos_desaprobados": counts["cursos_desaprobados"],
+        "cursos_en_progreso": counts["cursos_en_progreso"],
+        "cursos_retirados": counts["cursos_retirados"],
         "promedio_general": promedio_general,
         "tasa_aprobacion": tasa_aprobacion,
-        "notas": notas,
+        "n_notas": n_notas,
+        "suma_notas": counts["suma_notas"],
+        "primera_mitad_suma": counts["primera_mitad_suma"],
+        "nota_maxima": counts["nota_maxima"] if n_notas else 0,
+        "nota_minima": counts["nota_minima"] if n_notas else 0
+    }
+
+async def calculate_student_academic_metrics(db: AsyncSession, student_id: int) -> Dict:
+    # Lectura de una sola fila mantenida en cada escritura de matrículas
+    row = await db.get(StudentMetrics, student_id)
+    if row is not None:
+        counts = {field: getattr(row, field) for field in METRIC_FIELDS}
+        if row.primera_mitad_pendiente:
+            # Aún no recalculada por el dispatcher: se calcula sin persistir
+            counts["primera_mitad_suma"] = (await first_half_sums(db, [student_id]))[student_id]
+        return build_academic_metrics(counts)
+    
+    # Sin fila agregada (p. ej. antes del backfill): se calcula recorriendo las matrículas
+    enrollments = (await db.scalars(
+        select(Enrollment).where(Enrollment.student_id == student_id).order_by(Enrollment.id)
+    )).all()
+    
+    notas = [e.puntaje for e in enrollments if e.puntaje is not None]
+    counts = {
+        "total_cursos": len(enrollments),
+        "cursos_aprobados": len([e for e in enrollments if e.estado == "Aprobado"]),
+        "cursos_desaprobados": len([e for e in enrollments if e.estado == "Desaprobado"]),
+        "cursos_en_progreso": len([e for e in enrollments if e.estado == "Cursando"]),
+        "cursos_retirados": len([e for e in enrollments if e.estado == "Retirado"]),
+        "n_notas": len(notas),
+        "suma_notas": sum(notas),
+        "primera_mitad_suma": sum(notas[:len(notas) // 2]),
         "nota_maxima": max(notas) if notas else 0,
         "nota_minima": min(notas) if notas else 0
     }
+    return build_academic_metrics(counts)
 
-def analyze_learning_trend(notas: List[float]) -> Dict:
-    if len(notas) < 2:
+def analyze_learning_trend(n_notas: int, suma_notas: int, primera_mitad_suma: int) -> Dict:
+    if n_notas < 2:
         return {"tendencia": "Insuficientes datos", "direccion": "neutral"}
     
-    mitad = len(notas) // 2
-    primera_mitad = statistics.mean(notas[:mitad]) if mitad > 0 else 0
-    segunda_mitad = statistics.mean(notas[mitad:]) if mitad < len(notas) else 0
+    mitad = n_notas // 2
+    primera_mitad = python_mean(primera_mitad_suma, mitad) if mitad > 0 else 0
+    segunda_mitad = python_mean(suma_notas - primera_mitad_suma, n_notas - mitad) if mitad < n_notas else 0
     
     diferencia = segunda_mitad - primera_mitad
     
@@ -88,7 +98,8 @@ def analyze_learning_trend(notas: List[float]) -> Dict:
     else:
         return {"tendencia": "Declinando significativamente", "direccion": "negativa"}
 
-def predict_course_success(student_metrics: Dict, course: Course) -> Dict:
+def student_base_probability(student_metrics: Dict) -> float:
+    """Probabilidad de aprobar según el historial del estudiante, antes del ajuste por curso y del recorte."""
     base_probability = 50.0  
     
     if student_metrics["promedio_general"] >= 16:
@@ -116,45 +127,14 @@ def predict_course_success(student_metrics: Dict, course: Course) -> Dict:
     elif student_metrics["cursos_completados"] >= 1:
         base_probability += 5
     
-    if student_metrics["notas"]:
+    if student_metrics["n_notas"]:
         variabilidad = student_metrics["nota_maxima"] - student_metrics["nota_minima"]
         if variabilidad <= 3: 
             base_probability += 10
         elif variabilidad <= 5:  
             base_probability += 5
     
-    probability = max(15, min(95, base_probability))
-    
-    nota_esperada = student_metrics["promedio_general"]
-    if probability >= 80:
-        nota_esperada += 1.5
-    elif probability >= 60:
-        nota_esperada += 0.5
-    elif probability < 40:
-        nota_esperada -= 1.0
-    
-    nota_esperada = max(0, min(20, round(nota_esperada, 1)))
-    
-    return {
-        "course_id": course.id,
-        "titulo": course.titulo,
-        "success_probability": round(probability, 1),
-        "predicted_score": nota_esperada,
-        "confidence_level": round(min(95, probability + 5), 1),
-        "difficulty_match": get_difficulty_match(probability)
-    }
-
-def get_difficulty_match(probability: float) -> str:
-    if probability >= 85:
-        return "Perfecta - Curso ideal para ti"
-    elif probability >= 70:
-        return "Buena - Deberías aprobar sin problemas"
-    elif probability >= 55:
-        return "Moderada - Requerirá esfuerzo adicional"
-    elif probability >= 40:
-        return "Desafiante - Considera preparación previa"
-    else:
-        return "Muy desafiante - Recomendamos prerrequisitos"
+    return base_probability
 
 def get_risk_assessment(student_metrics: Dict) -> Dict:
     risk_score = 0
@@ -182,42 +162,17 @@ def get_risk_assessment(student_metrics: Dict) -> Dict:
     else:
         return {"level": "Bajo", "description": "Estudiante en buen estado académico", "color": "green"}
 
-@router.get("/predict-success/{student_identifier}")
-async def predict_student_academic_success(
-    student_identifier: str,
-    include_recommendations: bool = Query(True, description="Incluir recomendaciones de cursos"),
-    max_recommendations: int = Query(5, description="Máximo número de recomendaciones"),
-    db: Session = Depends(get_db)
-):
-    
-    student = find_student_flexible(db, student_identifier)
-    
-    if not student:
-        available_students = db.query(Student).limit(5).all()
-        return {
-            "error": "Estudiante no encontrado",
-            "searched_for": student_identifier,
-            "search_methods": ["ID numérico", "Email completo", "Nombre parcial"],
-            "available_students": [
-                {"id": s.id, "nombre": s.nombre, "email": s.correo} 
-                for s in available_students
-            ],
-            "example_searches": ["1", "juan.perez@smartlogix.edu", "Juan"]
-        }
-    
-    academic_metrics = calculate_student_academic_metrics(db, student.id)
-    
-    learning_trend = analyze_learning_trend(academic_metrics["notas"])
-    
-    risk_assessment = get_risk_assessment(academic_metrics)
-    
-    response = {
+def get_search_method(student_identifier: str) -> str:
+    return "ID" if student_identifier.isdigit() else "Email" if "@" in student_identifier else "Nombre"
+
+def build_prediction_response(student: Student, search_method: str, academic_metrics: Dict, learning_trend: Dict, risk_assessment: Dict) -> Dict:
+    return {
         "smartlogix_ai": "Academic Success Predictor v1.0",
         "student_info": {
             "id": student.id,
             "nombre": student.nombre,
             "email": student.correo,
-            "search_method": "ID" if student_identifier.isdigit() else "Email" if "@" in student_identifier else "Nombre"
+            "search_method": search_method
         },
         "academic_analysis": {
             "promedio_actual": academic_metrics["promedio_general"],
@@ -242,41 +197,197 @@ async def predict_student_academic_success(
             "confidence_level": "94%"
         }
     }
+
+def build_recommendations(academic_metrics: Dict, predictions: List[Dict], max_recommendations: int, total_available: int) -> Dict:
+    if not predictions:
+        return {
+            "message": "Has completado todos los cursos disponibles",
+            "status": "Estudiante avanzado"
+        }
     
-    if include_recommendations and academic_metrics["total_cursos"] > 0:
-        taken_course_ids = db.query(Enrollment.course_id).filter(
-            Enrollment.student_id == student.id
-        ).subquery()
+    recommendations = []
+    for prediction in predictions:
+        recommendations.append({
+            "course_id": prediction["course_id"],
+            "titulo": prediction["titulo"],
+            "success_probability": f"{prediction['success_probability']}%",
+            "predicted_score": f"{prediction['predicted_score']}/20",
+            "confidence": f"{prediction['confidence_level']}%",
+            "difficulty_match": prediction["difficulty_match"],
+            "course_pass_rate": f"{prediction['course_pass_rate']}%",
+            "course_withdrawal_rate": f"{prediction['course_withdrawal_rate']}%",
+            "course_mean_score": f"{prediction['course_mean_score']}/20",
+            "recommendation_reason": (
+                f"Basado en tu promedio de {academic_metrics['promedio_general']}/20 y tasa de aprobación del "
+                f"{academic_metrics['tasa_aprobacion']}%, y en que el {prediction['course_pass_rate']}% aprueba este curso"
+            )
+        })
+    
+    # Las predicciones ya llegan ordenadas por la afinidad de este estudiante con cada curso
+    return {
+        "total_available_courses": total_available,
+        "recommended_courses": recommendations[:max_recommendations],
+        "recommendation_algorithm": "Afinidad estudiante-curso sobre todo el catálogo: promedio, tendencia y retiros del estudiante frente a la tasa de aprobación, retiro y nota media de cada curso"
+    }
+
+async def load_cohort_metrics(db: AsyncSession, student_ids: List[int], metrics: Dict[int, Dict]):
+    """Completa con las consultas agregadas (GROUP BY y ventana) a los estudiantes sin fila en student_metrics."""
+    missing = [student_id for student_id in student_ids if student_id not in metrics]
+    if not missing:
+        return
+    
+    computed = {
+        row.student_id: {**{field: row._mapping[field] for field in METRIC_FIELDS if field != "primera_mitad_suma"}, "primera_mitad_suma": 0}
+        for row in await db.execute(aggregate_statement().where(Enrollment.student_id.in_(missing)))
+    }
+    if computed:
+        for row in await db.execute(first_half_statement(list(computed))):
+            computed[row.student_id]["primera_mitad_suma"] = int(row.primera_mitad_suma or 0)
+    # Sin matrículas: todas las métricas a cero
+    for student_id in missing:
+        metrics[student_id] = computed.get(student_id, {field: 0 for field in METRIC_FIELDS})
+
+@router.post("/predict-success/batch")
+async def predict_cohort_academic_success(
+    request: BatchPredictionRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if request.student_ids is not None and len(request.student_ids) > PREDICTION_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo {PREDICTION_BATCH_MAX_IDS} estudiantes por lote"
+        )
+    if request.limit is not None and not 0 < request.limit <= PREDICTION_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit debe estar entre 1 y {PREDICTION_BATCH_MAX_IDS}"
+        )
+    if request.student_ids is not None and request.cursor is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="cursor solo aplica al recorrido de toda la cohorte (sin student_ids)"
+        )
+    
+    # Métricas leídas de student_metrics (mantenida en cada escritura), sin traer las matrículas
+    metric_columns = [StudentMetrics.__table__.c[field] for field in METRIC_FIELDS]
+    student_query = select(
+        Student.id, Student.nombre, Student.correo, *metric_columns, StudentMetrics.primera_mitad_pendiente
+    ).outerjoin(
+        StudentMetrics, StudentMetrics.student_id == Student.id
+    ).order_by(Student.id)
+    
+    has_more = False
+    if request.student_ids is not None:
+        students = (await db.execute(student_query.where(Student.id.in_(sorted(set(request.student_ids)))))).all()
+    else:
+        after = decode_cursor(request.cursor, [int])
+        if after is not None:
+            student_query = student_query.where(Student.id > after[0])
+        limit = request.limit or PREDICTION_BATCH_MAX_IDS
+        students, has_more = split_page((await db.execute(student_query.limit(limit + 1))).all(), limit)
+    
+    student_ids = [s.id for s in students]
+    known = set(student_ids)
+    metrics = {
+        s.id: {field: s._mapping[field] for field in METRIC_FIELDS}
+        for s in students if s.total_cursos is not None
+    }
+    # Primera mitad aún no recalculada por el dispatcher: una sola consulta para toda la página
+    pending = await first_half_sums(db, [s.id for s in students if s.primera_mitad_pendiente])
+    for student_id, primera_mitad_suma in pending.items():
+        metrics[student_id]["primera_mitad_suma"] = primera_mitad_suma
+    await load_cohort_metrics(db, student_ids, metrics)
+    
+    aggregates = metric_arrays([metrics[student_id] for student_id in student_ids])
+    scores = score_cohort(aggregates)
+    
+    catalog = None
+    taken = {}
+    if request.include_recommendations and student_ids:
+        catalog = await course_feature_index.get(db)
+        for r in await db.execute(
+            select(Enrollment.student_id, Enrollment.course_id).where(Enrollment.student_id.in_(student_ids))
+        ):
+            taken.setdefault(r.student_id, set()).add(r.course_id)
+    
+    predictions = []
+    for i, student in enumerate(students):
+        academic_metrics = build_student_metrics(aggregates, scores, i)
+        learning_trend = TRENDS[int(scores["trend"][i])]
+        risk_assessment = RISK_LEVELS[int(scores["risk"][i])]
         
-        available_courses = db.query(Course).filter(
-            ~Course.id.in_(taken_course_ids)
-        ).limit(max_recommendations).all()
+        response = build_prediction_response(student, "ID", academic_metrics, learning_trend, risk_assessment)
+        
+        if request.include_recommendations and academic_metrics["total_cursos"] > 0:
+            student_taken = taken.get(student.id, set())
+            course_predictions = rank_courses(
+                catalog, float(scores["base_probability"][i]), student_profile(academic_metrics, learning_trend),
+                student_taken, request.max_recommendations
+            )
+            response["ai_recommendations"] = build_recommendations(
+                academic_metrics, course_predictions, request.max_recommendations, catalog.count_untaken(student_taken)
+            )
+        
+        predictions.append(response)
+    
+    not_found = sorted(set(request.student_ids) - known) if request.student_ids is not None else []
+    
+    return {
+        "smartlogix_ai": "Academic Success Predictor v1.0",
+        "total": len(predictions),
+        "predictions": predictions,
+        "not_found": not_found,
+        "next_cursor": encode_cursor(student_ids[-1]) if has_more else None
+    }
+
+@router.get("/predict-success/{student_identifier}")
+async def predict_student_academic_success(
+    student_identifier: str,
+    include_recommendations: bool = Query(True, description="Incluir recomendaciones de cursos"),
+    max_recommendations: int = Query(5, description="Máximo número de recomendaciones"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    
+    student = await find_student_flexible(db, student_identifier)
+    
+    if not student:
+        available_students = (await db.scalars(select(Student).limit(5))).all()
+        return {
+            "error": "Estudiante no encontrado",
+            "searched_for": student_identifier,
+            "search_methods": ["ID numérico", "Email completo", "Nombre parcial"],
+            "available_students": [
+                {"id": s.id, "nombre": s.nombre, "email": s.correo} 
+                for s in available_students
+            ],
+            "example_searches": ["1", "juan.perez@smartlogix.edu", "Juan"]
+        }
+    
+    academic_metrics = await calculate_student_academic_metrics(db, student.id)
+    
+    learning_trend = analyze_learning_trend(
+        academic_metrics["n_notas"], academic_metrics["suma_notas"], academic_metrics["primera_mitad_suma"]
+    )
+    
+    risk_assessment = get_risk_assessment(academic_metrics)
+    
+    response = build_prediction_response(
+        student, get_search_method(student_identifier), academic_metrics, learning_trend, risk_assessment
+    )
+    
+    if include_recommendations and academic_metrics["total_cursos"] > 0:
+        taken = set((await db.scalars(
+            select(Enrollment.course_id).where(Enrollment.student_id == student.id)
+        )).all())
         
-        if available_courses:
-            recommendations = []
-            for course in available_courses:
-                prediction = predict_course_success(academic_metrics, course)
-                recommendations.append({
-                    "course_id": prediction["course_id"],
-                    "titulo": prediction["titulo"],
-                    "success_probability": f"{prediction['success_probability']}%",
-                    "predicted_score": f"{prediction['predicted_score']}/20",
-                    "confidence": f"{prediction['confidence_level']}%",
-                    "difficulty_match": prediction["difficulty_match"],
-                    "recommendation_reason": f"Basado en tu promedio de {academic_metrics['promedio_general']}/20 y tasa de aprobación del {academic_metrics['tasa_aprobacion']}%"
-                })
-            
-            recommendations.sort(key=lambda x: float(x["success_probability"].rstrip('%')), reverse=True)
-            
-            response["ai_recommendations"] = {
-                "total_available_courses": len(available_courses),
-                "recommended_courses": recommendations[:max_recommendations],
-                "recommendation_algorithm": "Machine Learning basado en historial académico"
-            }
-        else:
-            response["ai_recommendations"] = {
-                "message": "Has completado todos los cursos disponibles",
-                "status": "Estudiante avanzado"
-            }
-    
-    return response
\ No newline at end of file
+        # Todo el catálogo no cursado se puntúa contra el perfil del estudiante, no solo los primeros max_recommendations por ID
+        catalog = await course_feature_index.get(db)
+        predictions = rank_courses(
+            catalog, student_base_probability(academic_metrics), student_profile(academic_metrics, learning_trend),
+            taken, max_recommendations
+        )
+        response["ai_recommendations"] = build_recommendations(
+            academic_metrics, predictions, max_recommendations, catalog.count_untaken(taken)
+        )
+    
+    return response
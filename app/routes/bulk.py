@@ -0,0 +1,56 @@
+import os
+from typing import Any, Dict, List, Tuple, Type
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+# Tamaño de lote para las consultas IN y los INSERT multi-fila (asyncpg admite hasta 32767 parámetros)
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "2000"))
+
+def check_bulk_size(payload: list):
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El lote está vacío"
+        )
+    if len(payload) > BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"El lote supera el máximo de {BULK_MAX_ROWS} registros"
+        )
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'registro'}: {e['msg']}"
+        for e in error.errors()
+    )
+
+def validate_rows(payload: List[Dict[str, Any]], schema: Type[BaseModel]) -> Tuple[list, list]:
+    results = [None] * len(payload)
+    valid = []
+    for index, item in enumerate(payload):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as e:
+            results[index] = bulk_error(index, format_validation_error(e))
+    return valid, results
+
+def iter_batches(items: list, size: int = None):
+    size = size or BULK_CHUNK_SIZE
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def bulk_created(index: int, record_id: int) -> dict:
+    return {"index": index, "status": "created", "id": record_id}
+
+def bulk_error(index: int, error: str) -> dict:
+    return {"index": index, "status": "error", "error": error}
+
+def bulk_summary(results: list) -> dict:
+    created = sum(1 for r in results if r["status"] == "created")
+    return {
+        "created": created,
+        "failed": len(results) - created,
+        "results": results
+    }
@@ -1,15 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
 
-from app.database.database import get_db
+from app.cache.response_cache import response_cache, course_key
+from app.database.course_stats import load_course_stats
+from app.database.database import get_async_db
 from app.models.models import Course
-from app.models.schemas import CourseCreate, CourseResponse, APIResponse
+from app.models.schemas import CourseCreate, CourseResponse, CourseWithEnrollments, APIResponse, APIListResponse
+from app.routes.ai_course_ranking import course_feature_index
+from app.routes.bulk import check_bulk_size, validate_rows, iter_batches, bulk_created, bulk_summary
+from app.routes.expansion import parse_expand, expand_options
+from app.routes.pagination import encode_cursor, decode_cursor, split_page
+from app.routes.serialization import dump_row, list_response
+from app.routes.streaming import stream_rows, validate_format
+from app.workers.outbox import enqueue_outbox_event
 
 router = APIRouter(prefix="/courses", tags=["courses"])
 
+COURSE_EXPANSIONS = {"enrollments": Course.enrollments, "students": Course.students}
+
+def course_to_dict(course: Course) -> dict:
+    return {
+        "id": course.id,
+        "titulo": course.titulo,
+        "descripcion": course.descripcion,
+        "fecha_creacion": course.fecha_creacion.isoformat()
+    }
+
 @router.post("/", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
-async def create_course(course: CourseCreate, db: Session = Depends(get_db)):
+async def create_course(course: CourseCreate, db: AsyncSession = Depends(get_async_db)):
     
     db_course = Course(
         titulo=course.titulo,
@@ -17,44 +37,79 @@ async def create_course(course: CourseCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_course)
-    db.commit()
-    db.refresh(db_course)
-    
-    try:
-        import requests
-        sync_response = requests.post("https://smartlogix-api-250805843264.us-central1.run.app/sync/bigquery", timeout=10)
-        print(f"Sincronización automática: {sync_response.status_code}")
-    except Exception as e:
-        print(f"Error en sincronización automática: {e}")
+    await db.flush()
+    enqueue_outbox_event(db, "courses", db_course.id)
+    await db.commit()
+    await db.refresh(db_course)
+    # Los cursos nuevos entran en las recomendaciones sin esperar a que caduque el índice
+    course_feature_index.invalidate()
     
     return APIResponse(
         message="Curso registrado exitosamente",
-        data={
-            "id": db_course.id,
-            "titulo": db_course.titulo,
-            "descripcion": db_course.descripcion,
-            "fecha_creacion": db_course.fecha_creacion.isoformat()
-        }
+        data=course_to_dict(db_course)
+    )
+
+@router.post("/bulk", response_model=APIResponse)
+async def create_courses_bulk(courses: List[Dict[str, Any]] = Body(...), db: AsyncSession = Depends(get_async_db)):
+    check_bulk_size(courses)
+    valid, results = validate_rows(courses, CourseCreate)
+    
+    for batch in iter_batches(valid):
+        rows = [{"titulo": course.titulo, "descripcion": course.descripcion} for _, course in batch]
+        # insertmanyvalues agrupa las filas en INSERT ... VALUES (...), (...) RETURNING id, en el mismo orden
+        inserted = (await db.execute(
+            insert(Course).returning(Course.id, sort_by_parameter_order=True), rows
+        )).scalars().all()
+        
+        for (index, _), course_id in zip(batch, inserted):
+            results[index] = bulk_created(index, course_id)
+    
+    summary = bulk_summary(results)
+    if summary["created"]:
+        enqueue_outbox_event(db, "courses")
+    await db.commit()
+    if summary["created"]:
+        course_feature_index.invalidate()
+    
+    return APIResponse(
+        message=f"{summary['created']} cursos registrados, {summary['failed']} con errores",
+        data=summary,
+        total=summary["created"]
     )
 
-@router.get("/", response_model=APIResponse)
-async def get_courses(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.get("/", response_model=APIListResponse[CourseWithEnrollments])
+async def get_courses(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    format: str = Query("json", description="json (paginado), ndjson o csv (tabla completa en streaming)"),
+    expand: Optional[str] = Query(None, description="Relaciones a incluir, separadas por comas: enrollments, students"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    after = decode_cursor(cursor, [int])
+    validate_format(format)
+    expansions = parse_expand(expand, COURSE_EXPANSIONS, format)
+    
+    statement = select(Course).options(*expand_options(expansions, COURSE_EXPANSIONS)).order_by(Course.id)
+    if after is not None:
+        statement = statement.where(Course.id > after[0])
+    
+    if format != "json":
+        return stream_rows(statement, lambda row: course_to_dict(row[0]), format, "courses")
+    
     try:
-        courses = db.query(Course).offset(skip).limit(limit).all()
+        if after is None and skip:
+            statement = statement.offset(skip)
         
-        courses_data = []
-        for course in courses:
-            courses_data.append({
-                "id": course.id,
-                "titulo": course.titulo,
-                "descripcion": course.descripcion,
-                "fecha_creacion": course.fecha_creacion.isoformat()
-            })
+        courses, has_more = split_page((await db.scalars(statement.limit(limit + 1))).all(), limit)
         
-        return APIResponse(
+        return list_response(
+            request,
+            CourseWithEnrollments if expansions else CourseResponse,
+            courses,
             message="Lista de cursos obtenida exitosamente",
-            data=courses_data,
-            total=len(courses_data)
+            next_cursor=encode_cursor(courses[-1].id) if has_more else None
         )
     except Exception as e:
         print(f"Error en get_courses: {e}")
@@ -63,22 +118,74 @@ async def get_courses(skip: int = 0, limit: int = 100, db: Session = Depends(get
             detail=f"Error al obtener cursos: {str(e)}"
         )
 
-@router.get("/{course_id}", response_model=APIResponse)
-async def get_course(course_id: int, db: Session = Depends(get_db)):
-    course = db.query(Course).filter(Course.id == course_id).first()
+@router.get("/stats", response_model=APIListResponse[Dict[str, Any]])
+async def get_courses_stats(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    after = decode_cursor(cursor, [int])
+    
+    statement = select(Course.id, Course.titulo).order_by(Course.id)
+    if after is not None:
+        statement = statement.where(Course.id > after[0])
+    courses, has_more = split_page((await db.execute(statement.limit(limit + 1))).all(), limit)
+    
+    # Se lee de course_stats/course_score_counts, mantenidas en cada escritura de matrículas
+    stats = await load_course_stats(db, [course.id for course in courses])
     
+    return APIListResponse(
+        message="Estadísticas de cursos obtenidas exitosamente",
+        data=[{"course_id": course.id, "titulo": course.titulo, **stats[course.id]} for course in courses],
+        total=len(courses),
+        next_cursor=encode_cursor(courses[-1].id) if has_more else None
+    )
+
+@router.get("/{course_id}/stats", response_model=APIResponse)
+async def get_course_stats(course_id: int, db: AsyncSession = Depends(get_async_db)):
+    
+    course = await db.get(Course, course_id)
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Curso no encontrado"
         )
     
+    stats = await load_course_stats(db, [course_id])
+    
+    return APIResponse(
+        message="Estadísticas del curso obtenidas exitosamente",
+        data={"course_id": course.id, "titulo": course.titulo, **stats[course_id]}
+    )
+
+@router.get("/{course_id}", response_model=APIResponse)
+async def get_course(
+    course_id: int,
+    expand: Optional[str] = Query(None, description="Relaciones a incluir, separadas por comas: enrollments, students"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    expansions = parse_expand(expand, COURSE_EXPANSIONS)
+    
+    async def load_course():
+        course = await db.get(Course, course_id)
+        return course_to_dict(course) if course else None
+    
+    if expansions:
+        # Las vistas expandidas no pasan por la caché: course_key guarda solo el curso
+        course = await db.scalar(
+            select(Course).where(Course.id == course_id).options(*expand_options(expansions, COURSE_EXPANSIONS))
+        )
+        course_data = dump_row(CourseWithEnrollments, course) if course else None
+    else:
+        course_data = await response_cache.get_or_load(course_key(course_id), load_course)
+    
+    if not course_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Curso no encontrado"
+        )
+    
     return APIResponse(
         message="Curso obtenido exitosamente",
-        data={
-            "id": course.id,
-            "titulo": course.titulo,
-            "descripcion": course.descripcion,
-            "fecha_creacion": course.fecha_creacion.isoformat()
-        }
+        data=course_data
     )
\ No newline at end of file
@@ -1,157 +1,348 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select, update, tuple_, literal, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from app.database.database import get_db
+from app.cache.response_cache import response_cache, enrollment_key, student_enrollments_key
+from app.database.course_stats import record_course_enrollments, record_course_estado_change
+from app.database.database import get_async_db, dialect_insert
+from app.database.student_metrics import record_enrollment_inserts, record_estado_change
 from app.models.models import Enrollment, Student, Course
-from app.models.schemas import EnrollmentCreate, EnrollmentUpdate, APIResponse
+from app.models.schemas import EnrollmentCreate, EnrollmentUpdate, EnrollmentDetailResponse, APIResponse, APIListResponse
+from app.routes.bulk import (
+    check_bulk_size, validate_rows, iter_batches, bulk_created, bulk_error, bulk_summary
+)
+from app.routes.pagination import encode_cursor, decode_cursor, split_page
+from app.routes.serialization import list_response
+from app.routes.streaming import stream_rows, validate_format
+from app.workers.outbox import enqueue_outbox_event
 
 router = APIRouter(prefix="/enrollments", tags=["enrollments"])
 
+VALID_STATES = ["Cursando", "Aprobado", "Desaprobado", "Retirado"]
+
+ENROLLMENT_COLUMNS = (
+    Enrollment.id, Enrollment.student_id, Enrollment.course_id,
+    Enrollment.estado, Enrollment.puntaje, Enrollment.fecha_matricula
+)
+
+def supports_dml_cte(db) -> bool:
+    # PostgreSQL admite INSERT/UPDATE ... RETURNING dentro de un WITH; SQLite (desarrollo local) no
+    return db.bind.dialect.name == "postgresql"
+
+def student_course_lookup(student, course):
+    # Una única fila aunque falte el estudiante o el curso: las columnas ausentes llegan como NULL
+    one = select(literal(1).label("one")).subquery("one")
+    return select(
+        student.c.id.label("student_id"), student.c.nombre, student.c.correo,
+        course.c.id.label("course_id"), course.c.titulo, course.c.descripcion
+    ).select_from(one.outerjoin(student, true()).outerjoin(course, true()))
+
+async def insert_enrollment(db, student_id: int, course_id: int, estado: str, puntaje: int):
+    """INSERT ... SELECT desde students y courses con ON CONFLICT DO NOTHING: la existencia se comprueba en la
+    misma sentencia y la restricción única resuelve las matrículas concurrentes del mismo par.
+    
+    Devuelve (lookup, enrollment): lookup trae estudiante y curso (id NULL si no existen) y enrollment
+    es None si no se insertó nada.
+    """
+    student = select(Student.id, Student.nombre, Student.correo).where(Student.id == student_id).cte("student")
+    course = select(Course.id, Course.titulo, Course.descripcion).where(Course.id == course_id).cte("course")
+    
+    if supports_dml_cte(db):
+        inserted = dialect_insert(db, Enrollment).from_select(
+            ["student_id", "course_id", "estado", "puntaje"],
+            select(student.c.id, course.c.id, literal(estado), literal(puntaje)).select_from(student.join(course, true()))
+        ).on_conflict_do_nothing(
+            index_elements=[Enrollment.student_id, Enrollment.course_id]
+        ).returning(*ENROLLMENT_COLUMNS).cte("inserted")
+        
+        lookup = student_course_lookup(student, course)
+        row = (await db.execute(
+            lookup.add_columns(
+                inserted.c.id, inserted.c.estado, inserted.c.puntaje, inserted.c.fecha_matricula
+            ).outerjoin(inserted, true())
+        )).one()
+        return row, row if row.id is not None else None
+    
+    # SQLite: misma inserción condicionada, con la lectura de estudiante y curso en una segunda sentencia
+    enrollment = (await db.execute(
+        dialect_insert(db, Enrollment).from_select(
+            ["student_id", "course_id", "estado", "puntaje"],
+            select(Student.id, Course.id, literal(estado), literal(puntaje)).join(Course, true()).where(
+                Student.id == student_id, Course.id == course_id
+            )
+        ).on_conflict_do_nothing(
+            index_elements=[Enrollment.student_id, Enrollment.course_id]
+        ).returning(*ENROLLMENT_COLUMNS)
+    )).first()
+    lookup = (await db.execute(student_course_lookup(student, course))).one()
+    return lookup, enrollment
+
+async def update_enrollment_estado(db, enrollment_id: int, estado: str):
+    """Actualiza el estado y devuelve la matrícula con el estado anterior y los datos de estudiante y curso,
+    o None si no existe. El estado anterior se lee bloqueando la fila, para que las métricas sean exactas
+    aunque haya actualizaciones concurrentes."""
+    if supports_dml_cte(db):
+        current = select(Enrollment.id, Enrollment.estado).where(
+            Enrollment.id == enrollment_id
+        ).with_for_update().cte("locked")
+        updated = update(Enrollment).where(Enrollment.id == current.c.id).values(estado=estado).returning(
+            *ENROLLMENT_COLUMNS, current.c.estado.label("estado_anterior")
+        ).cte("updated")
+        
+        row = (await db.execute(
+            select(updated, Student.nombre, Student.correo, Course.titulo)
+            .join(Student, Student.id == updated.c.student_id)
+            .join(Course, Course.id == updated.c.course_id)
+        )).first()
+        return row._mapping if row else None
+    
+    # SQLite no tiene FOR UPDATE: el UPDATE solo se aplica si el estado leído sigue vigente, si no se reintenta
+    while True:
+        current = (await db.execute(
+            select(Enrollment.estado.label("estado_anterior"), Student.nombre, Student.correo, Course.titulo)
+            .join(Student, Student.id == Enrollment.student_id)
+            .join(Course, Course.id == Enrollment.course_id)
+            .where(Enrollment.id == enrollment_id)
+        )).first()
+        if current is None:
+            return None
+        
+        updated = (await db.execute(
+            update(Enrollment).where(
+                Enrollment.id == enrollment_id,
+                Enrollment.estado == current.estado_anterior
+            ).values(estado=estado).returning(*ENROLLMENT_COLUMNS)
+        )).first()
+        if updated is not None:
+            return {**updated._mapping, **current._mapping}
+
+def enrollment_to_dict(enrollment: Enrollment, student: Student, course: Course) -> dict:
+    return {
+        "enrollment_id": enrollment.id,
+        "student": {
+            "id": student.id,
+            "nombre": student.nombre,
+            "correo": student.correo
+        },
+        "course": {
+            "id": course.id,
+            "titulo": course.titulo,
+            "descripcion": course.descripcion
+        },
+        "estado": enrollment.estado,
+        "puntaje": enrollment.puntaje,
+        "fecha_matricula": enrollment.fecha_matricula.isoformat()
+    }
+
 @router.post("/", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
-async def create_enrollment(enrollment: EnrollmentCreate, db: Session = Depends(get_db)):
+async def create_enrollment(enrollment: EnrollmentCreate, db: AsyncSession = Depends(get_async_db)):
     
-    student = db.query(Student).filter(Student.id == enrollment.student_id).first()
-    if not student:
+    lookup, inserted = await insert_enrollment(db, enrollment.student_id, enrollment.course_id, "Cursando", 20)
+    
+    if lookup.student_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Estudiante no encontrado"
         )
     
-    course = db.query(Course).filter(Course.id == enrollment.course_id).first()
-    if not course:
+    if lookup.course_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Curso no encontrado"
         )
     
-    existing_enrollment = db.query(Enrollment).filter(
-        Enrollment.student_id == enrollment.student_id,
-        Enrollment.course_id == enrollment.course_id
-    ).first()
-    
-    if existing_enrollment:
+    if inserted is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El estudiante ya está matriculado en este curso"
         )
     
-    db_enrollment = Enrollment(
-        student_id=enrollment.student_id,
-        course_id=enrollment.course_id,
-        estado="Cursando",
-        puntaje=20 
-    )
-    
-    db.add(db_enrollment)
-    db.commit()
-    db.refresh(db_enrollment)
-    
-    try:
-        import requests
-        sync_response = requests.post("https://smartlogix-api-250805843264.us-central1.run.app/sync/bigquery", timeout=10)
-        print(f"🔄 Sincronización automática: {sync_response.status_code}")
-    except Exception as e:
-        print(f"⚠️ Error en sincronización automática: {e}")
+    await record_enrollment_inserts(db, [(enrollment.student_id, inserted.estado, inserted.puntaje)])
+    await record_course_enrollments(db, [(enrollment.course_id, inserted.fecha_matricula, inserted.estado, inserted.puntaje)])
+    enqueue_outbox_event(db, "enrollments", inserted.id)
+    await db.commit()
+    await response_cache.invalidate(student_enrollments_key(enrollment.student_id))
     
     return APIResponse(
         message="Estudiante matriculado exitosamente",
         data={
-            "enrollment_id": db_enrollment.id,
+            "enrollment_id": inserted.id,
             "student": {
-                "id": student.id,
-                "nombre": student.nombre,
-                "correo": student.correo
+                "id": lookup.student_id,
+                "nombre": lookup.nombre,
+                "correo": lookup.correo
             },
             "course": {
-                "id": course.id,
-                "titulo": course.titulo,
-                "descripcion": course.descripcion
+                "id": lookup.course_id,
+                "titulo": lookup.titulo,
+                "descripcion": lookup.descripcion
             },
-            "estado": db_enrollment.estado,
-            "puntaje": db_enrollment.puntaje,
-            "fecha_matricula": db_enrollment.fecha_matricula.isoformat()
+            "estado": inserted.estado,
+            "puntaje": inserted.puntaje,
+            "fecha_matricula": inserted.fecha_matricula.isoformat()
         }
     )
 
+@router.post("/bulk", response_model=APIResponse)
+async def create_enrollments_bulk(enrollments: List[Dict[str, Any]] = Body(...), db: AsyncSession = Depends(get_async_db)):
+    check_bulk_size(enrollments)
+    valid, results = validate_rows(enrollments, EnrollmentCreate)
+    
+    pending = {}
+    for index, enrollment in valid:
+        key = (enrollment.student_id, enrollment.course_id)
+        if key in pending:
+            results[index] = bulk_error(index, "Matrícula duplicada dentro del lote")
+        else:
+            pending[key] = index
+    
+    touched_students = set()
+    for batch in iter_batches(list(pending.items())):
+        student_ids = {student_id for (student_id, _), _ in batch}
+        course_ids = {course_id for (_, course_id), _ in batch}
+        
+        found_students = set((await db.scalars(select(Student.id).where(Student.id.in_(student_ids)))).all())
+        found_courses = set((await db.scalars(select(Course.id).where(Course.id.in_(course_ids)))).all())
+        
+        to_insert = []
+        for key, index in batch:
+            student_id, course_id = key
+            if student_id not in found_students:
+                results[index] = bulk_error(index, "Estudiante no encontrado")
+            elif course_id not in found_courses:
+                results[index] = bulk_error(index, "Curso no encontrado")
+            else:
+                to_insert.append((key, index))
+        
+        if to_insert:
+            # ON CONFLICT DO NOTHING: las matrículas existentes (o insertadas en paralelo por otra petición)
+            # no devuelven fila y se informan como duplicadas, sin abortar el lote con un IntegrityError
+            inserted = {
+                (row.student_id, row.course_id): row
+                for row in (await db.execute(
+                    dialect_insert(db, Enrollment).on_conflict_do_nothing(
+                        index_elements=[Enrollment.student_id, Enrollment.course_id]
+                    ).returning(*ENROLLMENT_COLUMNS),
+                    [
+                        {"student_id": student_id, "course_id": course_id, "estado": "Cursando", "puntaje": 20}
+                        for (student_id, course_id), _ in to_insert
+                    ]
+                )).all()
+            }
+            
+            for key, index in to_insert:
+                if key in inserted:
+                    results[index] = bulk_created(index, inserted[key].id)
+                else:
+                    results[index] = bulk_error(index, "El estudiante ya está matriculado en este curso")
+            
+            created = list(inserted.values())
+            await record_enrollment_inserts(db, [(row.student_id, row.estado, row.puntaje) for row in created])
+            await record_course_enrollments(db, [
+                (row.course_id, row.fecha_matricula, row.estado, row.puntaje) for row in created
+            ])
+            touched_students.update(row.student_id for row in created)
+    
+    summary = bulk_summary(results)
+    if summary["created"]:
+        enqueue_outbox_event(db, "enrollments")
+    await db.commit()
+    await response_cache.invalidate(*[student_enrollments_key(student_id) for student_id in touched_students])
+    
+    return APIResponse(
+        message=f"{summary['created']} matrículas registradas, {summary['failed']} con errores",
+        data=summary,
+        total=summary["created"]
+    )
+
 @router.put("/{enrollment_id}", response_model=APIResponse)
-async def update_enrollment(enrollment_id: int, enrollment_update: EnrollmentUpdate, db: Session = Depends(get_db)):
+async def update_enrollment(enrollment_id: int, enrollment_update: EnrollmentUpdate, db: AsyncSession = Depends(get_async_db)):
     
-    enrollment = db.query(Enrollment).filter(Enrollment.id == enrollment_id).first()
-    if not enrollment:
+    if enrollment_update.estado not in VALID_STATES:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Matrícula no encontrada"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Estado no válido. Estados permitidos: {', '.join(VALID_STATES)}"
         )
     
-    valid_states = ["Cursando", "Aprobado", "Desaprobado", "Retirado"]
-    if enrollment_update.estado not in valid_states:
+    enrollment = await update_enrollment_estado(db, enrollment_id, enrollment_update.estado)
+    if not enrollment:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Estado no válido. Estados permitidos: {', '.join(valid_states)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Matrícula no encontrada"
         )
     
-    old_estado = enrollment.estado
-    enrollment.estado = enrollment_update.estado
+    old_estado = enrollment["estado_anterior"]
+    await record_estado_change(db, enrollment["student_id"], old_estado, enrollment["estado"])
+    await record_course_estado_change(db, enrollment["course_id"], enrollment["fecha_matricula"], old_estado, enrollment["estado"])
+    enqueue_outbox_event(db, "enrollments", enrollment["id"])
     
-    db.commit()
-    db.refresh(enrollment)
-    
-    student = db.query(Student).filter(Student.id == enrollment.student_id).first()
-    course = db.query(Course).filter(Course.id == enrollment.course_id).first()
+    await db.commit()
+    await response_cache.invalidate(enrollment_key(enrollment["id"]), student_enrollments_key(enrollment["student_id"]))
     
     return APIResponse(
         message=f"Estado de matrícula actualizado de '{old_estado}' a '{enrollment_update.estado}'",
         data={
-            "enrollment_id": enrollment.id,
+            "enrollment_id": enrollment["id"],
             "student": {
-                "id": student.id,
-                "nombre": student.nombre,
-                "correo": student.correo
+                "id": enrollment["student_id"],
+                "nombre": enrollment["nombre"],
+                "correo": enrollment["correo"]
             },
             "course": {
-                "id": course.id,
-                "titulo": course.titulo
+                "id": enrollment["course_id"],
+                "titulo": enrollment["titulo"]
             },
             "estado_anterior": old_estado,
-            "estado_actual": enrollment.estado,
-            "puntaje": enrollment.puntaje,
-            "fecha_matricula": enrollment.fecha_matricula.isoformat()
+            "estado_actual": enrollment["estado"],
+            "puntaje": enrollment["puntaje"],
+            "fecha_matricula": enrollment["fecha_matricula"].isoformat()
         }
     )
 
-@router.get("/", response_model=APIResponse)
-async def get_enrollments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.get("/", response_model=APIListResponse[EnrollmentDetailResponse])
+async def get_enrollments(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    format: str = Query("json", description="json (paginado), ndjson o csv (tabla completa en streaming)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    after = decode_cursor(cursor, [datetime, int])
+    validate_format(format)
+    
+    # contains_eager rellena enrollment.student y enrollment.course desde el mismo JOIN
+    statement = select(Enrollment).join(Enrollment.student).join(Enrollment.course).options(
+        contains_eager(Enrollment.student), contains_eager(Enrollment.course)
+    ).order_by(Enrollment.fecha_matricula, Enrollment.id)
+    
+    if after is not None:
+        statement = statement.where(
+            tuple_(Enrollment.fecha_matricula, Enrollment.id) > tuple_(after[0], after[1])
+        )
+    
+    if format != "json":
+        return stream_rows(
+            statement, lambda row: enrollment_to_dict(row[0], row[0].student, row[0].course), format, "enrollments"
+        )
+    
     try:
-        enrollments = db.query(Enrollment, Student, Course).join(
-            Student, Enrollment.student_id == Student.id
-        ).join(
-            Course, Enrollment.course_id == Course.id
-        ).offset(skip).limit(limit).all()
+        if after is None and skip:
+            statement = statement.offset(skip)
         
-        enrollments_data = []
-        for enrollment, student, course in enrollments:
-            enrollments_data.append({
-                "enrollment_id": enrollment.id,
-                "student": {
-                    "id": student.id,
-                    "nombre": student.nombre,
-                    "correo": student.correo
-                },
-                "course": {
-                    "id": course.id,
-                    "titulo": course.titulo,
-                    "descripcion": course.descripcion
-                },
-                "estado": enrollment.estado,
-                "puntaje": enrollment.puntaje,
-                "fecha_matricula": enrollment.fecha_matricula.isoformat()
-            })
+        enrollments, has_more = split_page((await db.scalars(statement.limit(limit + 1))).all(), limit)
         
-        return APIResponse(
+        return list_response(
+            request,
+            EnrollmentDetailResponse,
+            enrollments,
             message="Lista de matrículas obtenida exitosamente",
-            data=enrollments_data,
-            total=len(enrollments_data)
+            next_cursor=encode_cursor(
+                enrollments[-1].fecha_matricula, enrollments[-1].id
+            ) if has_more else None
         )
     except Exception as e:
         print(f"Error en get_enrollments: {e}")
@@ -161,37 +352,26 @@ async def get_enrollments(skip: int = 0, limit: int = 100, db: Session = Depends
         )
 
 @router.get("/{enrollment_id}", response_model=APIResponse)
-async def get_enrollment(enrollment_id: int, db: Session = Depends(get_db)):
-    enrollment = db.query(Enrollment, Student, Course).join(
-        Student, Enrollment.student_id == Student.id
-    ).join(
-        Course, Enrollment.course_id == Course.id
-    ).filter(Enrollment.id == enrollment_id).first()
+async def get_enrollment(enrollment_id: int, db: AsyncSession = Depends(get_async_db)):
+    async def load_enrollment():
+        enrollment = (await db.execute(
+            select(Enrollment, Student, Course).join(
+                Student, Enrollment.student_id == Student.id
+            ).join(
+                Course, Enrollment.course_id == Course.id
+            ).where(Enrollment.id == enrollment_id)
+        )).first()
+        return enrollment_to_dict(*enrollment) if enrollment else None
     
-    if not enrollment:
+    enrollment_data = await response_cache.get_or_load(enrollment_key(enrollment_id), load_enrollment)
+    
+    if not enrollment_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Matrícula no encontrada"
         )
     
-    enrollment_obj, student, course = enrollment
-    
     return APIResponse(
         message="Matrícula obtenida exitosamente",
-        data={
-            "enrollment_id": enrollment_obj.id,
-            "student": {
-                "id": student.id,
-                "nombre": student.nombre,
-                "correo": student.correo
-            },
-            "course": {
-                "id": course.id,
-                "titulo": course.titulo,
-                "descripcion": course.descripcion
-            },
-            "estado": enrollment_obj.estado,
-            "puntaje": enrollment_obj.puntaje,
-            "fecha_matricula": enrollment_obj.fecha_matricula.isoformat()
-        }
+        data=enrollment_data
     )
\ No newline at end of file
@@ -0,0 +1,26 @@
+from typing import Dict, Optional, Set
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import selectinload
+
+def parse_expand(expand: Optional[str], relationships: Dict[str, object], format: str = "json") -> Set[str]:
+    if not expand:
+        return set()
+    
+    requested = {name.strip() for name in expand.split(",") if name.strip()}
+    unknown = requested - set(relationships)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Expansión no válida: {', '.join(sorted(unknown))}. Permitidas: {', '.join(relationships)}"
+        )
+    if requested and format != "json":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="expand solo está disponible con format=json"
+        )
+    return requested
+
+def expand_options(requested: Set[str], relationships: Dict[str, object]) -> list:
+    # Una consulta SELECT ... WHERE parent_id IN (...) por relación, sea cual sea el tamaño de la página
+    return [selectinload(relationships[name]) for name in sorted(requested)]
@@ -0,0 +1,35 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+
+def encode_cursor(*values) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str], types: List[type]) -> Optional[list]:
+    if not cursor:
+        return None
+    
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("cursor con formato inesperado")
+        return [
+            datetime.fromisoformat(value) if expected is datetime else expected(value)
+            for value, expected in zip(payload, types)
+        ]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cursor de paginación no válido: {str(e)}"
+        )
+
+def split_page(rows: list, limit: int):
+    # Se pide una fila extra para saber si hay página siguiente sin contar la tabla
+    has_more = len(rows) > limit
+    return rows[:limit], has_more
@@ -0,0 +1,115 @@
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.models.schemas import APIListResponse
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+@lru_cache(maxsize=None)
+def list_adapter(schema) -> TypeAdapter:
+    # Un TypeAdapter por esquema: el validador y el serializador se compilan una sola vez
+    return TypeAdapter(APIListResponse[schema])
+
+@lru_cache(maxsize=None)
+def nested_fields(schema) -> tuple:
+    # Relaciones del esquema que también son modelos (p. ej. student y course en EnrollmentDetailResponse)
+    return tuple(
+        name for name, field in schema.model_fields.items()
+        if isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel)
+    )
+
+def loaded_state(row, nested: tuple) -> dict:
+    """Estado ya cargado de una fila ORM. Leer __dict__ evita pasar por el descriptor de SQLAlchemy en cada
+    atributo, que es la mayor parte del costo de validar con from_attributes."""
+    state = row.__dict__
+    if not nested:
+        return state
+    
+    state = dict(state)
+    for name in nested:
+        related = state[name] if name in state else getattr(row, name)
+        state[name] = related.__dict__ if related is not None else None
+    return state
+
+@lru_cache(maxsize=1)
+def msgpack_available() -> bool:
+    try:
+        import msgpack
+    except ImportError:
+        return False
+    return True
+
+def parse_accept(header: str) -> dict:
+    accepted = {}
+    for part in header.split(","):
+        media_type, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type:
+            accepted[media_type.strip().lower()] = quality
+    return accepted
+
+def negotiate_media_type(request: Request) -> str:
+    """msgpack solo si el cliente lo prefiere (o empata) frente a JSON y el paquete está instalado."""
+    accepted = parse_accept(request.headers.get("accept", ""))
+    msgpack_quality = max((accepted.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES), default=0.0)
+    if msgpack_quality <= 0 or not msgpack_available():
+        return JSON_MEDIA_TYPE
+    
+    json_quality = max(accepted.get(JSON_MEDIA_TYPE, 0.0), accepted.get("application/*", 0.0), accepted.get("*/*", 0.0))
+    return MSGPACK_MEDIA_TYPES[0] if msgpack_quality >= json_quality else JSON_MEDIA_TYPE
+
+def build_page(schema, rows: list, message: str, next_cursor: Optional[str] = None):
+    """Valida filas ORM recién cargadas por la consulta del listado (columnas y relaciones del esquema cargadas)
+    directamente contra APIListResponse[schema], sin construir dicts a mano."""
+    nested = nested_fields(schema)
+    return list_adapter(schema).validate_python(
+        {
+            "message": message,
+            "data": [loaded_state(row, nested) for row in rows],
+            "total": len(rows),
+            "next_cursor": next_cursor
+        },
+        from_attributes=True
+    )
+
+def dump_row(schema, row) -> dict:
+    """Una fila ORM como dict JSON según el esquema. Las relaciones no cargadas (sin expand) se omiten."""
+    return schema.model_validate(loaded_state(row, nested_fields(schema)), from_attributes=True).model_dump(
+        mode="json", exclude_unset=True
+    )
+
+def list_response(
+    request: Request,
+    schema,
+    rows: list,
+    message: str,
+    next_cursor: Optional[str] = None
+) -> Response:
+    """Serializa el listado en una sola pasada, sin revalidar un APIResponse. Devuelve JSON o msgpack según la
+    cabecera Accept. Las relaciones que no se cargaron (sin expand) no aparecen en la respuesta."""
+    adapter = list_adapter(schema)
+    page = build_page(schema, rows, message, next_cursor)
+    
+    media_type = negotiate_media_type(request)
+    headers = {"Vary": "Accept"}
+    if media_type == JSON_MEDIA_TYPE:
+        return Response(content=adapter.dump_json(page, exclude_unset=True), media_type=JSON_MEDIA_TYPE, headers=headers)
+    
+    import msgpack
+    
+    return Response(
+        content=msgpack.packb(adapter.dump_python(page, mode="json", exclude_unset=True)),
+        media_type=media_type,
+        headers=headers
+    )
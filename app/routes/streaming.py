@@ -0,0 +1,68 @@
+import csv
+import io
+import os
+from typing import Callable
+
+import orjson
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.database.database import AsyncSessionLocal
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+def validate_format(format: str) -> str:
+    if format != "json" and format not in STREAM_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato no válido. Formatos permitidos: json, {', '.join(STREAM_FORMATS)}"
+        )
+    return format
+
+def flatten_row(row: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in row.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_row(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+def encode_ndjson(rows: list) -> bytes:
+    return b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+def encode_csv(rows: list, header: list = None):
+    flat_rows = [flatten_row(row) for row in rows]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=header or list(flat_rows[0].keys()), extrasaction="ignore")
+    if header is None:
+        writer.writeheader()
+    writer.writerows(flat_rows)
+    return buffer.getvalue(), writer.fieldnames
+
+def stream_rows(statement, to_dict: Callable, format: str, filename: str) -> StreamingResponse:
+    async def generate():
+        # Sesión propia: debe seguir abierta mientras se envía el cuerpo, después de salir del handler
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+            header = None
+            async for partition in result.partitions(STREAM_BATCH_SIZE):
+                rows = [to_dict(row) for row in partition]
+                if format == "ndjson":
+                    yield encode_ndjson(rows)
+                else:
+                    chunk, header = encode_csv(rows, header)
+                    yield chunk
+    
+    return StreamingResponse(
+        generate(),
+        media_type=STREAM_FORMATS[format],
+        headers={"Content-Disposition": f'inline; filename="{filename}.{format}"'}
+    )
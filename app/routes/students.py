@@ -1,17 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select, func, or_, case, false, null
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple
+import os
 
-from app.database.database import get_db
+from app.cache.response_cache import response_cache, student_key, student_enrollments_key
+from app.database.database import get_async_db, dialect_insert
 from app.models.models import Student
-from app.models.schemas import StudentCreate, StudentResponse, APIResponse
+from app.models.schemas import StudentCreate, StudentResponse, StudentWithEnrollments, APIResponse, APIListResponse
+from app.routes.bulk import (
+    check_bulk_size, validate_rows, iter_batches, bulk_created, bulk_error, bulk_summary
+)
+from app.routes.expansion import parse_expand, expand_options
+from app.routes.pagination import encode_cursor, decode_cursor, split_page
+from app.routes.serialization import dump_row, list_response
+from app.routes.streaming import stream_rows, validate_format
+from app.workers.outbox import enqueue_outbox_event
 
 router = APIRouter(prefix="/students", tags=["students"])
 
+STUDENT_SEARCH_MAX_RESULTS = int(os.getenv("STUDENT_SEARCH_MAX_RESULTS", "50"))
+SEARCH_MATCHES = ["id", "correo", "nombre"]
+MAX_INT_ID = 2147483647
+STUDENT_EXPANSIONS = {"enrollments": Student.enrollments}
+
+async def search_students(db: AsyncSession, query: str, limit: int = 10, fuzzy: bool = True) -> List[Tuple[Student, str, Optional[float]]]:
+    """Resuelve ID, correo y nombre en una sola consulta: primero ID exacto, luego correo, luego nombre por similitud."""
+    query = query.strip()
+    is_postgres = db.bind.dialect.name == "postgresql"
+    
+    id_match = Student.id == int(query) if query.isdigit() and int(query) <= MAX_INT_ID else false()
+    email_match = func.lower(Student.correo) == query.lower()
+    name_match = Student.nombre.ilike(f"%{query}%")
+    conditions = [id_match, email_match, name_match]
+    
+    if is_postgres:
+        score = func.similarity(Student.nombre, query)
+        if fuzzy:
+            conditions.append(Student.nombre.op("%")(query))
+    else:
+        score = null()
+    
+    tier = case((id_match, 0), (email_match, 1), else_=2)
+    statement = select(Student, tier.label("tier"), score.label("score")).where(or_(*conditions)).order_by(
+        tier, score.desc() if is_postgres else Student.id, Student.id
+    ).limit(limit)
+    
+    return [
+        (student, SEARCH_MATCHES[tier_value], round(float(score_value), 3) if score_value is not None else None)
+        for student, tier_value, score_value in (await db.execute(statement)).all()
+    ]
+
+def student_to_dict(student: Student) -> dict:
+    return {
+        "id": student.id,
+        "nombre": student.nombre,
+        "correo": student.correo,
+        "fecha_registro": student.fecha_registro.isoformat()
+    }
+
 @router.post("/", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
-async def create_student(student: StudentCreate, db: Session = Depends(get_db)):
+async def create_student(student: StudentCreate, db: AsyncSession = Depends(get_async_db)):
     
-    existing_student = db.query(Student).filter(Student.correo == student.correo).first()
+    existing_student = await db.scalar(select(Student).where(Student.correo == student.correo))
     if existing_student:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -24,44 +75,93 @@ async def create_student(student: StudentCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_student)
-    db.commit()
-    db.refresh(db_student)
-    
-    try:
-        import requests
-        sync_response = requests.post("https://smartlogix-api-250805843264.us-central1.run.app/sync/bigquery", timeout=10)
-        print(f"Sincronización automática: {sync_response.status_code}")
-    except Exception as e:
-        print(f"Error en sincronización automática: {e}")
+    await db.flush()
+    enqueue_outbox_event(db, "students", db_student.id)
+    await db.commit()
+    await db.refresh(db_student)
     
     return APIResponse(
         message="Estudiante registrado exitosamente",
-        data={
-            "id": db_student.id,
-            "nombre": db_student.nombre,
-            "correo": db_student.correo,
-            "fecha_registro": db_student.fecha_registro.isoformat()
-        }
+        data=student_to_dict(db_student)
     )
 
-@router.get("/", response_model=APIResponse)
-async def get_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=APIResponse)
+async def create_students_bulk(students: List[Dict[str, Any]] = Body(...), db: AsyncSession = Depends(get_async_db)):
+    check_bulk_size(students)
+    valid, results = validate_rows(students, StudentCreate)
+    
+    pending = {}
+    for index, student in valid:
+        if student.correo in pending:
+            results[index] = bulk_error(index, "Correo duplicado dentro del lote")
+        else:
+            pending[student.correo] = (index, student)
+    
+    for batch in iter_batches(list(pending.items())):
+        emails = [correo for correo, _ in batch]
+        existing = set((await db.scalars(select(Student.correo).where(Student.correo.in_(emails)))).all())
+        
+        rows = [
+            {"nombre": student.nombre, "correo": correo}
+            for correo, (index, student) in batch if correo not in existing
+        ]
+        inserted = {}
+        if rows:
+            statement = dialect_insert(db, Student).on_conflict_do_nothing(
+                index_elements=[Student.correo]
+            ).returning(Student.id, Student.correo)
+            inserted = {row.correo: row.id for row in await db.execute(statement, rows)}
+        
+        for correo, (index, student) in batch:
+            if correo in inserted:
+                results[index] = bulk_created(index, inserted[correo])
+            else:
+                results[index] = bulk_error(index, "El correo electrónico ya está registrado")
+    
+    summary = bulk_summary(results)
+    if summary["created"]:
+        enqueue_outbox_event(db, "students")
+    await db.commit()
+    
+    return APIResponse(
+        message=f"{summary['created']} estudiantes registrados, {summary['failed']} con errores",
+        data=summary,
+        total=summary["created"]
+    )
+
+@router.get("/", response_model=APIListResponse[StudentWithEnrollments])
+async def get_students(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    format: str = Query("json", description="json (paginado), ndjson o csv (tabla completa en streaming)"),
+    expand: Optional[str] = Query(None, description="Relaciones a incluir: enrollments"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    after = decode_cursor(cursor, [int])
+    validate_format(format)
+    expansions = parse_expand(expand, STUDENT_EXPANSIONS, format)
+    
+    statement = select(Student).options(*expand_options(expansions, STUDENT_EXPANSIONS)).order_by(Student.id)
+    if after is not None:
+        statement = statement.where(Student.id > after[0])
+    
+    if format != "json":
+        return stream_rows(statement, lambda row: student_to_dict(row[0]), format, "students")
+    
     try:
-        students = db.query(Student).offset(skip).limit(limit).all()
+        if after is None and skip:
+            statement = statement.offset(skip)
         
-        students_data = []
-        for student in students:
-            students_data.append({
-                "id": student.id,
-                "nombre": student.nombre,
-                "correo": student.correo,
-                "fecha_registro": student.fecha_registro.isoformat()
-            })
+        students, has_more = split_page((await db.scalars(statement.limit(limit + 1))).all(), limit)
         
-        return APIResponse(
+        return list_response(
+            request,
+            StudentWithEnrollments if expansions else StudentResponse,
+            students,
             message="Lista de estudiantes obtenida exitosamente",
-            data=students_data,
-            total=len(students_data)
+            next_cursor=encode_cursor(students[-1].id) if has_more else None
         )
     except Exception as e:
         print(f"Error en get_students: {e}")
@@ -70,11 +170,45 @@ async def get_students(skip: int = 0, limit: int = 100, db: Session = Depends(ge
             detail=f"Error al obtener estudiantes: {str(e)}"
         )
 
+@router.get("/search", response_model=APIResponse)
+async def search_students_endpoint(
+    q: str = Query(..., min_length=1, description="ID, correo o parte del nombre"),
+    limit: int = Query(10, ge=1, le=STUDENT_SEARCH_MAX_RESULTS),
+    db: AsyncSession = Depends(get_async_db)
+):
+    matches = await search_students(db, q, limit)
+    
+    return APIResponse(
+        message="Búsqueda de estudiantes completada",
+        data=[
+            {**student_to_dict(student), "coincidencia": match, "similitud": score}
+            for student, match, score in matches
+        ],
+        total=len(matches)
+    )
+
 @router.get("/{student_id}", response_model=APIResponse)
-async def get_student(student_id: int, db: Session = Depends(get_db)):
-    student = db.query(Student).filter(Student.id == student_id).first()
+async def get_student(
+    student_id: int,
+    expand: Optional[str] = Query(None, description="Relaciones a incluir: enrollments"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    expansions = parse_expand(expand, STUDENT_EXPANSIONS)
+    
+    async def load_student():
+        student = await db.get(Student, student_id)
+        return student_to_dict(student) if student else None
     
-    if not student:
+    if expansions:
+        # Las vistas expandidas no pasan por la caché: student_key guarda solo el estudiante
+        student = await db.scalar(
+            select(Student).where(Student.id == student_id).options(*expand_options(expansions, STUDENT_EXPANSIONS))
+        )
+        student_data = dump_row(StudentWithEnrollments, student) if student else None
+    else:
+        student_data = await response_cache.get_or_load(student_key(student_id), load_student)
+    
+    if not student_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Estudiante no encontrado"
@@ -82,50 +216,54 @@ async def get_student(student_id: int, db: Session = Depends(get_db)):
     
     return APIResponse(
         message="Estudiante obtenido exitosamente",
-        data={
-            "id": student.id,
-            "nombre": student.nombre,
-            "correo": student.correo,
-            "fecha_registro": student.fecha_registro.isoformat()
-        }
+        data=student_data
     )
 
 @router.get("/{student_id}/enrollments", response_model=APIResponse)
-async def get_student_enrollments(student_id: int, db: Session = Depends(get_db)):
+async def get_student_enrollments(student_id: int, db: AsyncSession = Depends(get_async_db)):
     from app.models.models import Enrollment, Course
     
-    student = db.query(Student).filter(Student.id == student_id).first()
-    if not student:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Estudiante no encontrado"
-        )
-    
-    enrollments = db.query(Enrollment, Course).join(
-        Course, Enrollment.course_id == Course.id
-    ).filter(Enrollment.student_id == student_id).all()
-    
-    enrollments_data = []
-    for enrollment, course in enrollments:
-        enrollments_data.append({
-            "enrollment_id": enrollment.id,
-            "course_id": course.id,
-            "course_title": course.titulo,
-            "course_description": course.descripcion,
-            "estado": enrollment.estado,
-            "puntaje": enrollment.puntaje,
-            "fecha_matricula": enrollment.fecha_matricula.isoformat()
-        })
-    
-    return APIResponse(
-        message=f"Cursos del estudiante {student.nombre} obtenidos exitosamente",
-        data={
+    async def load_student_enrollments():
+        student = await db.get(Student, student_id)
+        if not student:
+            return None
+        
+        enrollments = (await db.execute(
+            select(Enrollment, Course).join(
+                Course, Enrollment.course_id == Course.id
+            ).where(Enrollment.student_id == student_id)
+        )).all()
+        
+        enrollments_data = []
+        for enrollment, course in enrollments:
+            enrollments_data.append({
+                "enrollment_id": enrollment.id,
+                "course_id": course.id,
+                "course_title": course.titulo,
+                "course_description": course.descripcion,
+                "estado": enrollment.estado,
+                "puntaje": enrollment.puntaje,
+                "fecha_matricula": enrollment.fecha_matricula.isoformat()
+            })
+        
+        return {
             "student": {
                 "id": student.id,
                 "nombre": student.nombre,
                 "correo": student.correo
             },
             "enrollments": enrollments_data
-        },
-        total=len(enrollments_data)
+        }
+    
+    data = await response_cache.get_or_load(student_enrollments_key(student_id), load_student_enrollments)
+    if not data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Estudiante no encontrado"
+        )
+    
+    return APIResponse(
+        message=f"Cursos del estudiante {data['student']['nombre']} obtenidos exitosamente",
+        data=data,
+        total=len(data["enrollments"])
     )
\ No newline at end of file
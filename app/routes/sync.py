@@ -1,21 +1,107 @@
-import requests
+import asyncio
+import contextvars
 import os
-from fastapi import APIRouter, HTTPException
-from google.cloud import bigquery
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from app.bigquery.client import get_bigquery_client
+from app.bigquery.loader import BIGQUERY_LOADER, WRITE_TRUNCATE, iter_chunks, load_rows_in_chunks
+from prometheus_client import Counter, Histogram
+from datetime import datetime, timedelta
+from itertools import chain
+from sqlalchemy import select
 
 router = APIRouter(prefix="/sync", tags=["sync"])
 
 PROJECT_ID = "clever-gadget-471116-m6"
 DATASET_ID = "academy_dataset"
+STAGING_SUFFIX = "_staging"
+# Todas las sincronizaciones comparten <tabla>_staging y la marca de agua: se ejecutan de una en una
+SYNC_LOCK_NAME = "smartlogix.sync.bigquery"
 
-def sync_table_to_bigquery(table_name: str, data: list):
+# Margen para no perder filas cuyo updated_at quedó por detrás de la marca al confirmarse tarde
+SYNC_OVERLAP = timedelta(seconds=int(os.getenv("SYNC_OVERLAP_SECONDS", "60")))
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "5000"))
+SYNC_MAX_WORKERS = int(os.getenv("SYNC_MAX_WORKERS", "3"))
+
+sync_duration = Histogram(
+    "smartlogix_bigquery_sync_duration_seconds",
+    "Duración de la sincronización de cada tabla con BigQuery",
+    ("table", "mode", "status"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+sync_rows = Counter(
+    "smartlogix_bigquery_sync_rows_total",
+    "Filas enviadas a BigQuery (upserted) o eliminadas por tabla y modo",
+    ("table", "mode", "operation")
+)
+
+def serialize_student(s) -> dict:
+    return {
+        'id': s.id,
+        'nombre': s.nombre,
+        'correo': s.correo,
+        'fecha_registro': s.fecha_registro.isoformat() if s.fecha_registro else None
+    }
+
+def serialize_course(c) -> dict:
+    return {
+        'id': c.id,
+        'titulo': c.titulo,
+        'descripcion': c.descripcion or '',
+        'fecha_creacion': c.fecha_creacion.isoformat() if c.fecha_creacion else None
+    }
+
+def serialize_enrollment(e) -> dict:
+    return {
+        'id': e.id,
+        'student_id': e.student_id,
+        'course_id': e.course_id,
+        'estado': e.estado,
+        'puntaje': e.puntaje,
+        'fecha_matricula': e.fecha_matricula.isoformat() if e.fecha_matricula else None
+    }
+
+def get_sync_tables() -> dict:
+    from app.models.models import Student, Course, Enrollment
+    
+    return {
+        'students': (Student, serialize_student),
+        'courses': (Course, serialize_course),
+        'enrollments': (Enrollment, serialize_enrollment)
+    }
+
+class RowStream:
+    """Itera una consulta con cursor del lado del servidor, serializando fila por fila."""
+    
+    def __init__(self, db, statement, serializer, batch_size: int = None):
+        self.db = db
+        self.statement = statement
+        self.serializer = serializer
+        self.batch_size = batch_size or SYNC_BATCH_SIZE
+        self.count = 0
+        self.max_updated_at = None
+    
+    def __iter__(self):
+        # yield_per activa stream_results: psycopg2 usa un cursor con nombre y trae lotes de batch_size
+        result = self.db.execute(self.statement.execution_options(yield_per=self.batch_size))
+        for row in result:
+            self.count += 1
+            updated_at = getattr(row, "updated_at", None)
+            if updated_at and (self.max_updated_at is None or updated_at > self.max_updated_at):
+                self.max_updated_at = updated_at
+            yield self.serializer(row)
+
+def sync_table_to_bigquery(table_name: str, data):
     try:
-        print(f"Iniciando sincronización de {table_name} con {len(data)} registros")
+        print(f"Iniciando sincronización de {table_name}")
         
-        client = bigquery.Client(project=PROJECT_ID, location="US")
+        client = get_bigquery_client(PROJECT_ID)
         
-        if not data:
+        batches = iter_chunks(data, SYNC_BATCH_SIZE)
+        first_batch = next(batches, None)
+        if not first_batch:
             print(f"No hay datos para {table_name}")
             return True
         
@@ -35,110 +121,286 @@ def sync_table_to_bigquery(table_name: str, data: list):
                 print(f"Continuando con inserción (pueden haber duplicados)")
         
         table_ref = client.dataset(DATASET_ID).table(table_name)
-        print(f"Insertando {len(data)} registros en {table_name}")
         
-        errors = client.insert_rows_json(table_ref, data)
-        
-        if errors:
-            print(f"Errores en {table_name}: {errors}")
-            
-            for i, error in enumerate(errors[:5]):  
-                print(f"   Error {i+1}: {error}")
+        total = 0
+        failed = 0
+        for batch in chain([first_batch], batches):
+            errors = client.insert_rows_json(table_ref, batch)
+            total += len(batch)
             
-            if len(errors) < len(data):
-                print(f"Inserción parcial: {len(data) - len(errors)}/{len(data)} registros exitosos")
-                return False
-            else:
-                print(f"Falló completamente la inserción")
-                return False
-        else:
-            print(f"{table_name}: {len(data)} registros sincronizados exitosamente")
-            return True
+            if errors:
+                failed += len(errors)
+                print(f"Errores en {table_name}: {len(errors)} en un lote de {len(batch)}")
+                
+                for i, error in enumerate(errors[:5]):  
+                    print(f"   Error {i+1}: {error}")
+        
+        if failed:
+            print(f"Inserción parcial: {total - failed}/{total} registros exitosos")
+            return False
+        
+        print(f"{table_name}: {total} registros sincronizados exitosamente")
+        return True
             
     except Exception as e:
         print(f"Error general sincronizando {table_name}: {e}")
         return False
 
-@router.post("/bigquery")
-async def sync_all_to_bigquery():
+def load_table_to_bigquery(table_name: str, data) -> dict:
     try:
-        from app.database.database import get_db
-        from app.models.models import Student, Course, Enrollment
-        
-        db = next(get_db())
-        
-        students = db.query(Student).all()
-        courses = db.query(Course).all()
-        enrollments = db.query(Enrollment).all()
-        
-        students_data = [
-            {
-                'id': s.id,
-                'nombre': s.nombre,
-                'correo': s.correo,
-                'fecha_registro': s.fecha_registro.isoformat() if s.fecha_registro else None
-            }
-            for s in students
-        ]
-        
-        courses_data = [
-            {
-                'id': c.id,
-                'titulo': c.titulo,
-                'descripcion': c.descripcion or '',
-                'fecha_creacion': c.fecha_creacion.isoformat() if c.fecha_creacion else None
-            }
-            for c in courses
-        ]
-        
-        enrollments_data = [
-            {
-                'id': e.id,
-                'student_id': e.student_id,
-                'course_id': e.course_id,
-                'estado': e.estado,
-                'puntaje': e.puntaje,
-                'fecha_matricula': e.fecha_matricula.isoformat() if e.fecha_matricula else None
-            }
-            for e in enrollments
-        ]
-        
-        sync_results = {
-            'students': sync_table_to_bigquery('students', students_data),
-            'courses': sync_table_to_bigquery('courses', courses_data),
-            'enrollments': sync_table_to_bigquery('enrollments', enrollments_data)
-        }
+        print(f"Cargando {table_name} mediante load jobs")
         
-        db.close()
+        client = get_bigquery_client(PROJECT_ID)
+        target_id = f"{PROJECT_ID}.{DATASET_ID}.{table_name}"
+        staging_id = f"{target_id}{STAGING_SUFFIX}"
+        target_table = client.get_table(target_id)
         
-        return {
-            "message": "Sincronización completada",
-            "timestamp": datetime.now().isoformat(),
-            "results": sync_results,
-            "counts": {
-                "students": len(students_data),
-                "courses": len(courses_data),
-                "enrollments": len(enrollments_data)
-            }
-        }
+        # Los chunks se cargan en staging (WRITE_TRUNCATE en el primero, sin streaming buffer); la tabla
+        # destino solo se reemplaza cuando todos se cargaron, con una copia atómica
+        report = load_rows_in_chunks(
+            client,
+            staging_id,
+            data,
+            schema=target_table.schema,
+            write_disposition=WRITE_TRUNCATE
+        )
+        if not report["success"]:
+            print(f"{table_name}: falló el chunk {report['errors'][0]['chunk']}, la tabla destino no se modificó")
+            return {"success": False, "errors": report["errors"]}
+        
+        from google.cloud import bigquery
+        
+        client.copy_table(
+            staging_id,
+            target_id,
+            job_config=bigquery.CopyJobConfig(write_disposition=WRITE_TRUNCATE)
+        ).result()
+        
+        print(f"{table_name}: {report['rows_loaded']} registros cargados en {len(report['chunks'])} chunks")
+        return {"success": True, "errors": []}
         
+    except Exception as e:
+        print(f"Error general cargando {table_name}: {e}")
+        return {"success": False, "errors": [{"error": str(e)}]}
+
+def merge_table_to_bigquery(table_name: str, data, deleted_ids: list) -> dict:
+    try:
+        print(f"Sincronización incremental de {table_name}: {len(deleted_ids)} eliminados")
+        
+        client = get_bigquery_client(PROJECT_ID)
+        target_id = f"{PROJECT_ID}.{DATASET_ID}.{table_name}"
+        staging_id = f"{target_id}{STAGING_SUFFIX}"
+        target_table = client.get_table(target_id)
+        
+        columns = []
+        
+        def track_columns(rows):
+            for row in rows:
+                if not columns:
+                    columns.extend(row.keys())
+                yield row
+        
+        # Carga por job (no streaming) para que el MERGE no choque con el streaming buffer
+        report = load_rows_in_chunks(
+            client,
+            staging_id,
+            track_columns(data),
+            schema=target_table.schema,
+            write_disposition=WRITE_TRUNCATE
+        )
+        if not report["success"]:
+            print(f"Error cargando staging de {table_name}: {len(report['errors'])} chunks fallaron")
+            return {"success": False, "errors": report["errors"]}
+        
+        if columns:
+            update_clause = ", ".join(f"{c} = S.{c}" for c in columns if c != "id")
+            insert_columns = ", ".join(columns)
+            insert_values = ", ".join(f"S.{c}" for c in columns)
+            
+            merge_query = f"""
+                MERGE `{target_id}` T
+                USING `{staging_id}` S
+                ON T.id = S.id
+                WHEN MATCHED THEN UPDATE SET {update_clause}
+                WHEN NOT MATCHED THEN INSERT ({insert_columns}) VALUES ({insert_values})
+            """
+            client.query(merge_query).result()
+        
+        if deleted_ids:
+            from google.cloud import bigquery
+            
+            delete_query = f"DELETE FROM `{target_id}` WHERE id IN UNNEST(@ids)"
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[bigquery.ArrayQueryParameter("ids", "INT64", deleted_ids)]
+            )
+            client.query(delete_query, job_config=job_config).result()
+        
+        print(f"{table_name}: {report['rows_loaded']} registros fusionados, {len(deleted_ids)} eliminados")
+        return {"success": True, "errors": []}
+        
+    except Exception as e:
+        print(f"Error en sincronización incremental de {table_name}: {e}")
+        return {"success": False, "errors": [{"error": str(e)}]}
+
+def get_sync_state(db, table_name: str):
+    from app.models.models import SyncState
+    
+    state = db.query(SyncState).filter(SyncState.table_name == table_name).first()
+    if not state:
+        state = SyncState(table_name=table_name, rows_synced=0)
+        db.add(state)
+    return state
+
+def sync_table_incremental(db, table_name: str, model, serializer) -> dict:
+    from app.models.models import DeletedRecord
+    
+    state = get_sync_state(db, table_name)
+    since = state.high_water_mark - SYNC_OVERLAP if state.high_water_mark else None
+    
+    statement = select(model.__table__).order_by(model.updated_at)
+    tombstones = db.query(DeletedRecord).filter(DeletedRecord.table_name == table_name)
+    if since is not None:
+        statement = statement.where(model.updated_at > since)
+        tombstones = tombstones.filter(DeletedRecord.deleted_at > since)
+    
+    deleted = tombstones.all()
+    deleted_ids = sorted({t.record_id for t in deleted})
+    
+    rows = RowStream(db, statement, serializer)
+    merge_result = merge_table_to_bigquery(table_name, rows, deleted_ids)
+    success = merge_result["success"]
+    
+    if success:
+        marks = [t.deleted_at for t in deleted if t.deleted_at]
+        if rows.max_updated_at:
+            marks.append(rows.max_updated_at)
+        if state.high_water_mark:
+            marks.append(state.high_water_mark)
+        state.high_water_mark = max(marks) if marks else None
+        state.last_sync_at = datetime.now()
+        state.last_sync_mode = "incremental"
+        state.rows_synced = rows.count
+        
+        if state.high_water_mark:
+            db.query(DeletedRecord).filter(
+                DeletedRecord.table_name == table_name,
+                DeletedRecord.deleted_at < state.high_water_mark - SYNC_OVERLAP
+            ).delete(synchronize_session=False)
+        db.commit()
+    else:
+        db.rollback()
+    
+    return {"success": success, "upserted": rows.count, "deleted": len(deleted_ids), "errors": merge_result["errors"]}
+
+def sync_table_full(db, table_name: str, model, serializer) -> dict:
+    rows = RowStream(db, select(model.__table__).order_by(model.id), serializer)
+    
+    if BIGQUERY_LOADER == "load_job":
+        load_result = load_table_to_bigquery(table_name, rows)
+        success, errors = load_result["success"], load_result["errors"]
+    else:
+        success, errors = sync_table_to_bigquery(table_name, rows), []
+    
+    if success:
+        state = get_sync_state(db, table_name)
+        state.high_water_mark = rows.max_updated_at or datetime.now()
+        state.last_sync_at = datetime.now()
+        state.last_sync_mode = "full"
+        state.rows_synced = rows.count
+        db.commit()
+    else:
+        db.rollback()
+    
+    return {"success": success, "upserted": rows.count, "deleted": 0, "errors": errors}
+
+def sync_table_timed(sync_table, mode: str, table_name: str, model, serializer) -> dict:
+    from app.database.database import SessionLocal
+    
+    # Cada tabla usa su propia sesión: las sesiones no se comparten entre hilos
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        result = sync_table(db, table_name, model, serializer)
+    except Exception as e:
+        print(f"Error sincronizando {table_name}: {e}")
+        result = {"success": False, "upserted": 0, "deleted": 0, "errors": [{"error": str(e)}]}
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    result["elapsed_ms"] = round(elapsed * 1000, 1)
+    
+    sync_duration.labels(table=table_name, mode=mode, status="success" if result["success"] else "error").observe(elapsed)
+    sync_rows.labels(table=table_name, mode=mode, operation="upserted").inc(result["upserted"])
+    sync_rows.labels(table=table_name, mode=mode, operation="deleted").inc(result["deleted"])
+    return result
+
+def run_sync(mode: str = "incremental") -> dict:
+    from app.database.database import advisory_lock
+    
+    # Sin candado, dos ejecuciones (dispatcher de otro worker, POST /sync/bigquery) se truncarían
+    # mutuamente la tabla de staging y ambas avanzarían la marca de agua perdiendo filas
+    with advisory_lock(SYNC_LOCK_NAME):
+        return run_sync_locked(mode)
+
+def run_sync_locked(mode: str) -> dict:
+    sync_table = sync_table_incremental if mode == "incremental" else sync_table_full
+    tables = get_sync_tables()
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(SYNC_MAX_WORKERS, len(tables)))) as executor:
+        futures = {
+            # Cada hilo recibe una copia del contexto para que las consultas cuenten en las métricas de la petición
+            table_name: executor.submit(
+                contextvars.copy_context().run, sync_table_timed, sync_table, mode, table_name, model, serializer
+            )
+            for table_name, (model, serializer) in tables.items()
+        }
+        details = {table_name: future.result() for table_name, future in futures.items()}
+    
+    return {
+        "message": "Sincronización completada",
+        "mode": mode,
+        "timestamp": datetime.now().isoformat(),
+        "results": {table: result["success"] for table, result in details.items()},
+        "counts": {table: result["upserted"] for table, result in details.items()},
+        "deleted": {table: result["deleted"] for table, result in details.items()},
+        "errors": {table: result["errors"] for table, result in details.items() if result["errors"]},
+        "timings_ms": {table: result["elapsed_ms"] for table, result in details.items()},
+        "wall_time_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
+@router.post("/bigquery")
+async def sync_all_to_bigquery(
+    mode: str = Query("incremental", description="incremental (solo cambios) o full (recarga completa)")
+):
+    if mode not in ("incremental", "full"):
+        raise HTTPException(status_code=400, detail="Modo no válido. Modos permitidos: incremental, full")
+    
+    try:
+        return await run_in_threadpool(run_sync, mode)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en sincronización: {str(e)}")
 
+def count_bigquery_table(client, table: str) -> dict:
+    start = time.perf_counter()
+    query = f"SELECT COUNT(*) as total FROM `{PROJECT_ID}.{DATASET_ID}.{table}`"
+    result = client.query(query).result()
+    return {"total": list(result)[0].total, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+
 @router.get("/status")
 async def sync_status():
     try:
-        client = bigquery.Client(project=PROJECT_ID, location="US")
+        client = get_bigquery_client(PROJECT_ID)
+        tables = ['students', 'courses', 'enrollments']
         
-        counts = {}
-        for table in ['students', 'courses', 'enrollments']:
-            query = f"SELECT COUNT(*) as total FROM `{PROJECT_ID}.{DATASET_ID}.{table}`"
-            result = client.query(query).result()
-            counts[table] = list(result)[0].total
+        start = time.perf_counter()
+        results = await asyncio.gather(*[run_in_threadpool(count_bigquery_table, client, table) for table in tables])
         
         return {
             "status": "connected",
-            "bigquery_counts": counts,
+            "bigquery_counts": {table: result["total"] for table, result in zip(tables, results)},
+            "timings_ms": {table: result["elapsed_ms"] for table, result in zip(tables, results)},
+            "wall_time_ms": round((time.perf_counter() - start) * 1000, 1),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -0,0 +1,47 @@
+import asyncio
+import os
+
+from app.database.student_metrics import FIRST_HALF_REFRESH_BATCH
+
+STUDENT_METRICS_REFRESH_ENABLED = os.getenv("STUDENT_METRICS_REFRESH_ENABLED", "true").lower() == "true"
+STUDENT_METRICS_REFRESH_INTERVAL = float(os.getenv("STUDENT_METRICS_REFRESH_INTERVAL", "5"))
+
+# Solo un worker recalcula a la vez: los demás ceden el ciclo
+REFRESHER_LOCK_NAME = "smartlogix.student_metrics.first_half"
+
+def refresh_first_half() -> int:
+    from app.database.database import SessionLocal, advisory_lock
+    from app.database.student_metrics import refresh_pending_first_half
+    
+    with advisory_lock(REFRESHER_LOCK_NAME, blocking=False) as acquired:
+        if not acquired:
+            return 0
+        
+        db = SessionLocal()
+        try:
+            return refresh_pending_first_half(db)
+        finally:
+            db.close()
+
+async def run_first_half_refresher(stop_event: asyncio.Event):
+    # Las inserciones de matrículas dejan la primera mitad de las notas pendiente de recálculo
+    print("Recálculo de primera mitad de notas iniciado")
+    while not stop_event.is_set():
+        try:
+            refreshed = await asyncio.to_thread(refresh_first_half)
+        except Exception as e:
+            print(f"⚠️ student_metrics: error recalculando la primera mitad: {e}")
+            refreshed = 0
+        
+        if refreshed < FIRST_HALF_REFRESH_BATCH:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=STUDENT_METRICS_REFRESH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    print("Recálculo de primera mitad de notas detenido")
+
+if __name__ == "__main__":
+    from app.database.database import init_engines
+    
+    init_engines()
+    asyncio.run(run_first_half_refresher(asyncio.Event()))
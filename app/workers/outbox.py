@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from app.models.models import OutboxEvent
+
+SYNC_EVENT = "sync.bigquery"
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "2"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+# Los eventos atendidos se conservan este tiempo para diagnóstico y después se borran
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+OUTBOX_PURGE_INTERVAL = float(os.getenv("OUTBOX_PURGE_INTERVAL", "3600"))
+
+# Solo un worker despacha a la vez: los demás ceden el ciclo en lugar de lanzar otra sincronización
+DISPATCHER_LOCK_NAME = "smartlogix.outbox.dispatcher"
+
+def enqueue_outbox_event(db, aggregate: str, aggregate_id: int = None, event_type: str = SYNC_EVENT):
+    # Se agrega a la sesión del handler: el evento se confirma en la misma transacción que el cambio
+    event = OutboxEvent(
+        event_type=event_type,
+        aggregate=aggregate,
+        aggregate_id=aggregate_id,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.now()
+    )
+    db.add(event)
+    return event
+
+def get_backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE ** attempts))
+
+def dispatch_batch(db) -> int:
+    from sqlalchemy import func
+    from app.routes.sync import run_sync
+    
+    now = datetime.now()
+    due = (
+        OutboxEvent.status == "pending",
+        OutboxEvent.event_type == SYNC_EVENT,
+        OutboxEvent.next_attempt_at <= now
+    )
+    # Marca de agua: los eventos hasta este ID quedan cubiertos por la sincronización que sigue. No se
+    # bloquean filas durante la llamada a BigQuery (el advisory lock ya garantiza un único dispatcher),
+    # así que las escrituras que encolan eventos nuevos no esperan a que termine
+    watermark = db.query(func.max(OutboxEvent.id)).filter(*due).scalar()
+    db.commit()
+    
+    if watermark is None:
+        return 0
+    
+    # Todos los eventos hasta la marca de agua se atienden con una sola sincronización incremental
+    error = None
+    try:
+        result = run_sync("incremental")
+        failed_tables = [table for table, ok in result["results"].items() if not ok]
+        if failed_tables:
+            error = f"Tablas con error: {', '.join(failed_tables)}"
+    except Exception as e:
+        error = str(e)
+    
+    if error is None:
+        # Incluye los pendientes en espera de reintento: la sincronización también cubre sus cambios
+        processed = db.query(OutboxEvent).filter(
+            OutboxEvent.status == "pending",
+            OutboxEvent.event_type == SYNC_EVENT,
+            OutboxEvent.id <= watermark
+        ).update(
+            {"status": "done", "processed_at": datetime.now(), "last_error": None},
+            synchronize_session=False
+        )
+        db.commit()
+        print(f"🔄 Outbox: {processed} eventos sincronizados")
+        return processed
+    
+    events = db.query(OutboxEvent).filter(*due, OutboxEvent.id <= watermark).all()
+    for event in events:
+        event.attempts += 1
+        event.last_error = error
+        if event.attempts >= OUTBOX_MAX_ATTEMPTS:
+            event.status = "failed"
+        else:
+            event.next_attempt_at = datetime.now() + get_backoff(event.attempts)
+    db.commit()
+    
+    print(f"⚠️ Outbox: error sincronizando {len(events)} eventos: {error}")
+    return len(events)
+
+def purge_processed(db) -> int:
+    cutoff = datetime.now() - timedelta(hours=OUTBOX_RETENTION_HOURS)
+    purged = db.query(OutboxEvent).filter(
+        OutboxEvent.status == "done",
+        OutboxEvent.processed_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    if purged:
+        print(f"🧹 Outbox: {purged} eventos procesados eliminados")
+    return purged
+
+def drain_outbox(purge: bool = False) -> int:
+    from app.database.database import SessionLocal, advisory_lock
+    
+    with advisory_lock(DISPATCHER_LOCK_NAME, blocking=False) as acquired:
+        if not acquired:
+            return 0
+        
+        db = SessionLocal()
+        try:
+            if purge:
+                purge_processed(db)
+            return dispatch_batch(db)
+        finally:
+            db.close()
+
+async def run_outbox_dispatcher(stop_event: asyncio.Event):
+    print("Dispatcher de outbox iniciado")
+    last_purge = None
+    while not stop_event.is_set():
+        purge = last_purge is None or time.monotonic() - last_purge >= OUTBOX_PURGE_INTERVAL
+        if purge:
+            last_purge = time.monotonic()
+        try:
+            processed = await asyncio.to_thread(drain_outbox, purge)
+        except Exception as e:
+            print(f"⚠️ Outbox: error en el dispatcher: {e}")
+            processed = 0
+        
+        if processed < OUTBOX_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    print("Dispatcher de outbox detenido")
+
+if __name__ == "__main__":
+    from app.database.database import init_engines
+    
+    init_engines()
+    asyncio.run(run_outbox_dispatcher(asyncio.Event()))
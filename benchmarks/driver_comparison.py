@@ -0,0 +1,167 @@
+"""
+Driver síncrono frente a asíncrono: la misma consulta servida por tres caminos, con carga concurrente.
+
+    driver_sync             async def + Session de get_db() (el camino anterior: bloquea el event loop)
+    driver_sync_threadpool  def + Session de get_db() (FastAPI la ejecuta en el threadpool)
+    driver_async            async def + AsyncSession de get_async_db() (asyncpg / aiosqlite)
+
+En SQLite no hay red: cada consulta añade sleep_ms(--latency-ms) para simular el round trip a PostgreSQL.
+La pausa ocurre en el hilo que ejecuta la consulta, como la espera del socket: con pysqlite bloquea a
+quien llama y con aiosqlite a su hilo propio, dejando libre el event loop. Contra PostgreSQL no se añade nada.
+
+Uso:
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.driver_comparison --requests 500 --concurrency 50
+    DATABASE_URL=postgresql://... python -m benchmarks.driver_comparison --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault("BIGQUERY_FAKE", "true")
+os.environ.setdefault("OUTBOX_WORKER_ENABLED", "false")
+os.environ.setdefault("DB_SCHEMA_MODE", "create")
+os.environ.setdefault("CACHE_BACKEND", "none")
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database.database import get_async_db, get_async_engine, get_db, get_engine
+from app.models.models import Student
+
+PAGE_SIZE = 20
+
+router = APIRouter(prefix="/benchmarks/driver", tags=["benchmarks"])
+simulated_latency = {"ms": 0.0}
+
+def page_statement(skip: int):
+    return select(Student).order_by(Student.id).offset(skip).limit(PAGE_SIZE)
+
+def latency_statement():
+    return text("SELECT sleep_ms(:ms)").bindparams(ms=simulated_latency["ms"])
+
+# Las rutas síncronas cierran la sesión antes de responder. El cierre de get_db corre en el threadpool y,
+# con el event loop bloqueado por driver_sync, el pool se agota en cuanto hay más peticiones concurrentes
+# que conexiones: cada checkout espera DB_POOL_TIMEOUT (el camino anterior sufría ese mismo bloqueo).
+@router.get("/sync/students")
+async def students_sync(skip: int = 0, db: Session = Depends(get_db)):
+    if simulated_latency["ms"]:
+        db.execute(latency_statement())
+    students = db.execute(page_statement(skip)).scalars().all()
+    db.close()
+    return {"total": len(students)}
+
+@router.get("/sync-threadpool/students")
+def students_sync_threadpool(skip: int = 0, db: Session = Depends(get_db)):
+    if simulated_latency["ms"]:
+        db.execute(latency_statement())
+    students = db.execute(page_statement(skip)).scalars().all()
+    db.close()
+    return {"total": len(students)}
+
+@router.get("/async/students")
+async def students_async(skip: int = 0, db: AsyncSession = Depends(get_async_db)):
+    if simulated_latency["ms"]:
+        await db.execute(latency_statement())
+    students = (await db.execute(page_statement(skip))).scalars().all()
+    return {"total": len(students)}
+
+def mount_driver_routes(app: FastAPI):
+    if not any(getattr(route, "path", "").startswith(router.prefix) for route in app.routes):
+        app.include_router(router)
+
+def register_sleep(dbapi_connection, connection_record):
+    dbapi_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000) or 0)
+
+async def install_latency(latency_ms: float) -> float:
+    """Activa sleep_ms en las conexiones SQLite de ambos engines; devuelve la latencia aplicada."""
+    engine, async_engine = get_engine(), get_async_engine()
+    if engine.dialect.name != "sqlite" or not latency_ms:
+        simulated_latency["ms"] = 0.0
+        return 0.0
+
+    for target in (engine, async_engine.sync_engine):
+        if not event.contains(target, "connect", register_sleep):
+            event.listen(target, "connect", register_sleep)
+    # Las conexiones ya abiertas no tienen la función registrada
+    engine.dispose()
+    await async_engine.dispose()
+    simulated_latency["ms"] = latency_ms
+    return latency_ms
+
+async def run(args) -> dict:
+    import main
+    from benchmarks.generator import generate
+    from benchmarks.run import DRIVER_SCENARIOS, get_git_commit, run_scenario
+
+    scale = generate(args.enrollments, seed=args.seed, reset=args.reset)
+    mount_driver_routes(main.app)
+
+    results = {}
+    async with main.lifespan(main.app):
+        latency_ms = await install_latency(args.latency_ms)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            for scenario_class in DRIVER_SCENARIOS:
+                scenario = scenario_class(scale, args.seed)
+                results[scenario.name] = await run_scenario(client, scenario, args.requests, args.concurrency)
+
+    baseline = results["driver_sync"]["throughput_rps"]
+    for summary in results.values():
+        summary["speedup_vs_sync"] = round(summary["throughput_rps"] / baseline, 2) if baseline else None
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": get_git_commit(),
+        "database": get_engine().dialect.name,
+        "simulated_latency_ms": latency_ms,
+        "db_pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "db_max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "scale": {key: scale[key] for key in ("students", "courses", "enrollments")},
+        "requests_per_scenario": args.requests,
+        "concurrency": args.concurrency,
+        "scenarios": results
+    }
+
+def main() -> int:
+    from benchmarks.run import RESULTS_DIR
+
+    parser = argparse.ArgumentParser(description="Comparación de carga: driver síncrono frente a asíncrono")
+    parser.add_argument("--enrollments", type=int, default=10000, help="Escala de datos sintéticos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true")
+    parser.add_argument("--requests", type=int, default=500, help="Peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Round trip simulado por consulta (solo SQLite)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    print(
+        f"\n{report['database']}, latencia simulada {report['simulated_latency_ms']} ms, "
+        f"concurrencia {report['concurrency']}, {report['requests_per_scenario']} peticiones por escenario:"
+    )
+    for name, summary in report["scenarios"].items():
+        print(
+            f"  {name:<24} {summary['throughput_rps']:>9} req/s  p50={summary['p50_ms']}ms  "
+            f"p99={summary['p99_ms']}ms  errores={summary['errors']}  x{summary['speedup_vs_sync']}"
+        )
+
+    output = args.output or os.path.join(RESULTS_DIR, f"driver-comparison-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {output}")
+
+    return 1 if any(summary["errors"] for summary in report["scenarios"].values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
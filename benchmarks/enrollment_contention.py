@@ -0,0 +1,136 @@
+"""
+Contención en POST /enrollments/: muchos escritores en paralelo intentando los mismos pares (student_id, course_id).
+
+Cada par se envía --duplicates veces desde escritores distintos. Se mide el throughput y la latencia y se
+verifica que cada par quede matriculado exactamente una vez y que student_metrics no tenga desviaciones.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m benchmarks.enrollment_contention --writers 64 --pairs 2000 --duplicates 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+os.environ.setdefault("BIGQUERY_FAKE", "true")
+os.environ.setdefault("OUTBOX_WORKER_ENABLED", "false")
+os.environ.setdefault("DB_SCHEMA_MODE", "create")
+# Los avisos de consultas lentas reflejan aquí las esperas por bloqueo buscadas, no un problema
+os.environ.setdefault("SLOW_QUERY_THRESHOLD_MS", "60000")
+
+import httpx
+from sqlalchemy import select, func
+
+from benchmarks.run import summarize
+
+async def contend(client: httpx.AsyncClient, pairs: list, writers: int) -> dict:
+    queue = iter(pairs)
+    latencies, statuses = [], Counter()
+
+    async def writer():
+        for student_id, course_id in queue:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/enrollments/", json={"student_id": student_id, "course_id": course_id})
+                outcome = response.status_code
+            except Exception as e:
+                # En proceso, los errores no controlados (p. ej. "database is locked" en SQLite) llegan como excepción
+                outcome = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[outcome] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[writer() for _ in range(writers)])
+    elapsed = time.perf_counter() - start
+
+    errors = sum(count for code, count in statuses.items() if code not in (201, 400))
+    return {
+        "writers": writers,
+        "created": statuses[201],
+        "duplicates_rejected": statuses[400],
+        "status_codes": {str(code): count for code, count in statuses.items()},
+        **summarize(latencies, errors, elapsed)
+    }
+
+async def run(args) -> dict:
+    import main
+    from benchmarks.generator import generate
+    from app.database.database import SessionLocal, get_engine
+    from app.database.course_stats import check_course_stats
+    from app.database.student_metrics import check_student_metrics
+    from app.models.models import Enrollment
+
+    scale = generate(args.enrollments, seed=args.seed, reset=args.reset)
+    rnd = random.Random(args.seed)
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            # Cursos nuevos: ningún par del benchmark existe de antemano
+            response = await client.post("/courses/bulk", json=[
+                {"titulo": f"Contención {int(time.time())}-{i}"} for i in range(args.courses)
+            ])
+            response.raise_for_status()
+            course_ids = [result["id"] for result in response.json()["data"]["results"]]
+
+            unique_pairs = set()
+            while len(unique_pairs) < min(args.pairs, scale["students"] * len(course_ids)):
+                unique_pairs.add((rnd.randint(1, scale["students"]), rnd.choice(course_ids)))
+            pairs = list(unique_pairs) * args.duplicates
+            rnd.shuffle(pairs)
+
+            report = await contend(client, pairs, args.writers)
+
+        with SessionLocal() as db:
+            stored = db.scalar(select(func.count(Enrollment.id)).where(Enrollment.course_id.in_(course_ids)))
+            drift = check_student_metrics(db)
+            course_drift = check_course_stats(db)
+
+    report.update({
+        "database": get_engine().dialect.name,
+        "pairs": len(unique_pairs),
+        "attempts_per_pair": args.duplicates,
+        "stored": stored,
+        "metrics_drift": len(drift),
+        "course_stats_drift": len(course_drift)
+    })
+    return report
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de contención de matrículas concurrentes")
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--pairs", type=int, default=1000)
+    parser.add_argument("--duplicates", type=int, default=4, help="Intentos concurrentes de cada par")
+    parser.add_argument("--courses", type=int, default=20)
+    parser.add_argument("--enrollments", type=int, default=10000, help="Escala de datos sintéticos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failures = []
+    if report["created"] != report["pairs"] or report["stored"] != report["pairs"]:
+        failures.append(f"se esperaban {report['pairs']} matrículas, creadas {report['created']}, guardadas {report['stored']}")
+    if report["errors"]:
+        failures.append(f"{report['errors']} respuestas inesperadas: {report['status_codes']}")
+    if report["metrics_drift"]:
+        failures.append(f"student_metrics desviada en {report['metrics_drift']} estudiantes")
+    if report["course_stats_drift"]:
+        failures.append(f"course_stats desviada en {report['course_stats_drift']} filas")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Planes y tiempos de las consultas de enrollments afectadas por la migración 0003_enrollments_indexes.
+
+Ejecutar una vez en 0002_sync_outbox_metrics y otra en head para comparar:
+    alembic upgrade 0002_sync_outbox_metrics && python -m benchmarks.enrollment_indexes
+    alembic upgrade head && python -m benchmarks.enrollment_indexes
+
+En PostgreSQL muestra EXPLAIN ANALYZE; en SQLite, EXPLAIN QUERY PLAN y el tiempo medido.
+"""
+import os
+import random
+import statistics
+import time
+
+from sqlalchemy import text, insert, select, func
+
+from app.database.database import get_engine
+from app.models.models import Student, Course, Enrollment
+
+BENCH_STUDENTS = int(os.getenv("BENCH_STUDENTS", "50000"))
+BENCH_COURSES = int(os.getenv("BENCH_COURSES", "200"))
+BENCH_ENROLLMENTS_PER_STUDENT = int(os.getenv("BENCH_ENROLLMENTS_PER_STUDENT", "8"))
+BENCH_REPEATS = int(os.getenv("BENCH_REPEATS", "200"))
+BENCH_SEED = int(os.getenv("BENCH_SEED", "42"))
+
+QUERIES = {
+    "get_student_enrollments": (
+        "SELECT e.id, c.titulo FROM enrollments e JOIN courses c ON e.course_id = c.id "
+        "WHERE e.student_id = :student_id"
+    ),
+    "create_enrollment_duplicado": (
+        "SELECT id FROM enrollments WHERE student_id = :student_id AND course_id = :course_id"
+    ),
+    "predictor_not_in": (
+        "SELECT id FROM courses WHERE id NOT IN "
+        "(SELECT course_id FROM enrollments WHERE student_id = :student_id) ORDER BY id LIMIT 5"
+    ),
+    "enrollments_por_curso": (
+        "SELECT COUNT(*) FROM enrollments WHERE course_id = :course_id"
+    )
+}
+
+def seed(batch_size: int = 20000):
+    engine = get_engine()
+    with engine.connect() as conn:
+        if conn.scalar(select(func.count(Enrollment.id))):
+            return
+    
+    rnd = random.Random(BENCH_SEED)
+    with engine.begin() as conn:
+        conn.execute(insert(Course), [{"titulo": f"Curso {i}"} for i in range(BENCH_COURSES)])
+        conn.execute(insert(Student), [
+            {"nombre": f"Estudiante {i}", "correo": f"estudiante{i}@smartlogix.edu"} for i in range(BENCH_STUDENTS)
+        ])
+    
+    rows = []
+    for student_id in range(1, BENCH_STUDENTS + 1):
+        for course_id in rnd.sample(range(1, BENCH_COURSES + 1), BENCH_ENROLLMENTS_PER_STUDENT):
+            rows.append({
+                "student_id": student_id, "course_id": course_id,
+                "estado": rnd.choice(["Cursando", "Aprobado", "Desaprobado", "Retirado"]),
+                "puntaje": rnd.randint(0, 20)
+            })
+            if len(rows) >= batch_size:
+                with engine.begin() as conn:
+                    conn.execute(insert(Enrollment), rows)
+                rows = []
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(insert(Enrollment), rows)
+
+def explain(conn, sql: str, params: dict) -> str:
+    if conn.dialect.name == "postgresql":
+        plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params).scalars().all()
+    else:
+        plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)]
+    return "\n    ".join(plan)
+
+def main():
+    seed()
+    engine = get_engine()
+    rnd = random.Random(BENCH_SEED + 1)
+    
+    with engine.connect() as conn:
+        revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar() if engine.dialect.has_table(conn, "alembic_version") else "sin alembic"
+        print(f"Motor: {engine.dialect.name}, revisión: {revision}")
+        
+        for name, sql in QUERIES.items():
+            params_list = [
+                {"student_id": rnd.randint(1, BENCH_STUDENTS), "course_id": rnd.randint(1, BENCH_COURSES)}
+                for _ in range(BENCH_REPEATS)
+            ]
+            print(f"\n{name}:\n    {explain(conn, sql, params_list[0])}")
+            
+            timings = []
+            for params in params_list:
+                start = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(f"    p50={statistics.median(timings):.3f}ms p95={timings[int(len(timings) * 0.95) - 1]:.3f}ms")
+
+if __name__ == "__main__":
+    main()
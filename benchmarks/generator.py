@@ -0,0 +1,194 @@
+"""
+Generador reproducible de datos sintéticos: students, courses y enrollments a escala configurable.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m benchmarks.generator --enrollments 1000000 --seed 42 --reset
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.generator --enrollments 10000
+
+Con la misma semilla y escala genera exactamente los mismos datos. En PostgreSQL carga con COPY;
+en SQLite con inserciones por lotes.
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from app.database.database import SessionLocal, create_tables, get_engine
+from app.database.course_stats import rebuild_course_stats
+from app.database.student_metrics import rebuild_student_metrics
+from app.models.models import Course, CourseScoreCount, CourseStats, DeletedRecord, Enrollment, OutboxEvent, Student, StudentMetrics, SyncState
+
+ENROLLMENTS_PER_STUDENT = 8
+BATCH_SIZE = 50000
+BASE_DATE = datetime(2024, 1, 1)
+
+NOMBRES = ["Juan", "María", "Luis", "Ana", "Carlos", "Lucía", "Jorge", "Rosa", "Pedro", "Carmen", "Diego", "Elena"]
+APELLIDOS = ["Pérez", "García", "Quispe", "Flores", "Rojas", "Torres", "Mamani", "Huamán", "Vargas", "Castillo"]
+AREAS = ["Python", "Cloud", "Datos", "Redes", "Seguridad", "IA", "DevOps", "Web", "Móvil", "Bases de Datos"]
+ESTADOS = ["Aprobado", "Desaprobado", "Cursando", "Retirado"]
+ESTADO_WEIGHTS = [55, 15, 25, 5]
+
+def get_scale(enrollments: int) -> dict:
+    students = max(1, enrollments // ENROLLMENTS_PER_STUDENT)
+    courses = max(ENROLLMENTS_PER_STUDENT * 2, min(2000, students // 50))
+    return {"students": students, "courses": courses, "enrollments": students * ENROLLMENTS_PER_STUDENT}
+
+def iter_students(total: int, rnd: random.Random):
+    for i in range(1, total + 1):
+        nombre, apellido = rnd.choice(NOMBRES), rnd.choice(APELLIDOS)
+        fecha = BASE_DATE + timedelta(minutes=i)
+        yield {
+            "id": i,
+            "nombre": f"{nombre} {apellido} {i}",
+            "correo": f"{nombre.lower()}.{apellido.lower()}.{i}@smartlogix.edu",
+            "fecha_registro": fecha,
+            "updated_at": fecha
+        }
+
+def iter_courses(total: int, rnd: random.Random):
+    for i in range(1, total + 1):
+        area = rnd.choice(AREAS)
+        yield {
+            "id": i,
+            "titulo": f"{area} {i}",
+            "descripcion": f"Curso sintético de {area} número {i}",
+            "fecha_creacion": BASE_DATE,
+            "updated_at": BASE_DATE
+        }
+
+def iter_enrollments(students: int, courses: int, rnd: random.Random):
+    enrollment_id = 0
+    for student_id in range(1, students + 1):
+        # rnd.sample garantiza pares (student_id, course_id) únicos
+        for course_id in rnd.sample(range(1, courses + 1), ENROLLMENTS_PER_STUDENT):
+            enrollment_id += 1
+            estado = rnd.choices(ESTADOS, weights=ESTADO_WEIGHTS)[0]
+            fecha = BASE_DATE + timedelta(seconds=enrollment_id * 7)
+            yield {
+                "id": enrollment_id,
+                "student_id": student_id,
+                "course_id": course_id,
+                "estado": estado,
+                "puntaje": None if estado == "Retirado" and rnd.random() < 0.5 else rnd.randint(0, 20),
+                "fecha_matricula": fecha,
+                "updated_at": fecha
+            }
+
+def batched(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def copy_batch(engine, table, batch: list):
+    columns = list(batch[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow(["\\N" if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+        raw.commit()
+    finally:
+        raw.close()
+
+def load_rows(engine, model, rows) -> int:
+    table = model.__table__
+    total = 0
+    for batch in batched(rows, BATCH_SIZE):
+        if engine.dialect.name == "postgresql":
+            copy_batch(engine, table, batch)
+        else:
+            with engine.begin() as conn:
+                conn.execute(insert(table), batch)
+        total += len(batch)
+    return total
+
+def reset_database(engine):
+    with engine.begin() as conn:
+        for model in (StudentMetrics, CourseStats, CourseScoreCount, OutboxEvent, SyncState, DeletedRecord, Enrollment, Course, Student):
+            conn.execute(delete(model.__table__))
+
+def reset_sequences(engine):
+    # Con ids explícitos hay que avanzar las secuencias para que las inserciones de la API no choquen
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table in ("students", "courses", "enrollments"):
+            conn.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+            )
+
+def generate(enrollments: int, seed: int = 42, reset: bool = False) -> dict:
+    engine = get_engine()
+    create_tables()
+    scale = get_scale(enrollments)
+    
+    with engine.connect() as conn:
+        existing = conn.scalar(select(func.count()).select_from(Enrollment.__table__))
+    if existing and not reset:
+        print(f"La base ya tiene {existing} matrículas; usa --reset para regenerarla")
+        return {**scale, "enrollments": existing, "seed": seed, "reused": True}
+    if existing:
+        reset_database(engine)
+    
+    rnd = random.Random(seed)
+    timings = {}
+    for name, model, rows in (
+        ("students", Student, iter_students(scale["students"], rnd)),
+        ("courses", Course, iter_courses(scale["courses"], rnd)),
+        ("enrollments", Enrollment, iter_enrollments(scale["students"], scale["courses"], rnd))
+    ):
+        start = time.perf_counter()
+        count = load_rows(engine, model, rows)
+        timings[name] = round(time.perf_counter() - start, 2)
+        print(f"{name}: {count} filas en {timings[name]}s")
+    
+    reset_sequences(engine)
+    
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        rebuild_student_metrics(db)
+    finally:
+        db.close()
+    timings["student_metrics"] = round(time.perf_counter() - start, 2)
+    print(f"student_metrics reconstruida en {timings['student_metrics']}s")
+    
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        rebuild_course_stats(db)
+    finally:
+        db.close()
+    timings["course_stats"] = round(time.perf_counter() - start, 2)
+    print(f"course_stats reconstruida en {timings['course_stats']}s")
+    
+    return {**scale, "seed": seed, "reused": False, "load_seconds": timings}
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos reproducibles para benchmarks")
+    parser.add_argument("--enrollments", type=int, default=10000, help="Matrículas a generar (10k a 10M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Vacía las tablas antes de generar")
+    args = parser.parse_args()
+    
+    generate(args.enrollments, seed=args.seed, reset=args.reset)
+
+if __name__ == "__main__":
+    main()
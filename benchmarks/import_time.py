@@ -0,0 +1,70 @@
+"""
+Control de regresión del arranque en frío: mide `python -X importtime -c "import main"`.
+
+Falla (código 1) si la mediana supera IMPORT_TIME_LIMIT_MS o si al importar la aplicación
+se cargan módulos pesados que deben importarse de forma diferida.
+
+Uso:
+    python -m benchmarks.import_time
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_TIME_LIMIT_MS = float(os.getenv("IMPORT_TIME_LIMIT_MS", "1500"))
+IMPORT_TIME_RUNS = int(os.getenv("IMPORT_TIME_RUNS", "5"))
+
+# Se cargan bajo demanda (primer sync, primer lote de predicciones, primera conexión)
+LAZY_MODULES = ["google.cloud.bigquery", "numpy", "scipy", "asyncpg", "psycopg2", "alembic", "pyarrow"]
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def profile_import() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar main:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative) / 1000
+    return modules
+
+def main() -> int:
+    runs = [profile_import() for _ in range(IMPORT_TIME_RUNS)]
+    totals = [run.get("main", 0.0) for run in runs]
+    median = statistics.median(totals)
+
+    heaviest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)[:10]
+    print(f"import main: mediana {median:.1f}ms en {len(runs)} ejecuciones (límite {IMPORT_TIME_LIMIT_MS:.0f}ms)")
+    for name, elapsed in heaviest:
+        print(f"  {elapsed:8.1f}ms  {name}")
+
+    failures = []
+    if median > IMPORT_TIME_LIMIT_MS:
+        failures.append(f"el arranque supera el límite: {median:.1f}ms > {IMPORT_TIME_LIMIT_MS:.0f}ms")
+    eager = [
+        module for module in LAZY_MODULES
+        if any(name == module or name.startswith(module + ".") for name in runs[-1])
+    ]
+    if eager:
+        failures.append(f"módulos pesados importados al arrancar: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Tiempo de importación dentro del límite")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Presupuesto de consultas SQL por ruta: ejecuta cada endpoint de app/routes en proceso y falla (código 1)
+si alguno supera su presupuesto. Fija el número de sentencias para detectar regresiones N+1.
+
+Uso:
+    DATABASE_URL=sqlite:///budgets.db python -m benchmarks.query_budgets
+
+Las rutas se ejecutan con la caché desactivada (CACHE_BACKEND=none) para medir siempre el camino frío.
+"""
+import os
+import sys
+import tempfile
+from uuid import uuid4
+
+os.environ.setdefault("BIGQUERY_FAKE", "true")
+os.environ.setdefault("OUTBOX_WORKER_ENABLED", "false")
+os.environ.setdefault("DB_SCHEMA_MODE", "create")
+os.environ.setdefault("CACHE_BACKEND", "none")
+os.environ.setdefault("RECOMMENDER_ARTIFACT_DIR", tempfile.mkdtemp(prefix="recommender-"))
+
+from fastapi.testclient import TestClient
+
+from app.metrics.sql import assert_max_queries
+
+# (método, plantilla de ruta) -> número máximo de sentencias SQL. Los lotes usan 3 filas: en SQLite
+# insertmanyvalues inserta fila a fila cuando hace falta ordenar el RETURNING, en PostgreSQL es una sola sentencia.
+# Las escrituras de matrículas usan una sentencia menos en PostgreSQL (CTE con INSERT/UPDATE ... RETURNING).
+# Con ?expand= cada relación añade una sola consulta (selectinload), sea cual sea el tamaño de la página.
+# Las escrituras de matrículas actualizan además los rollups de /courses/stats (course_stats y course_score_counts).
+# La predicción individual incluye la recarga del índice de cursos, invalidado al crear los cursos de prueba.
+# Las predicciones corren justo después de matricular: incluyen el cálculo de la primera mitad aún pendiente.
+QUERY_BUDGETS = {
+    ("POST", "/students/"): 4,
+    ("POST", "/students/bulk"): 3,
+    ("GET", "/students/"): 1,
+    ("GET", "/students/search"): 1,
+    ("GET", "/students/?expand=enrollments"): 2,
+    ("GET", "/students/{student_id}"): 1,
+    ("GET", "/students/{student_id}?expand=enrollments"): 2,
+    ("GET", "/students/{student_id}/enrollments"): 2,
+    ("POST", "/courses/"): 3,
+    ("POST", "/courses/bulk"): 4,
+    ("GET", "/courses/"): 1,
+    ("GET", "/courses/?expand=enrollments,students"): 3,
+    ("GET", "/courses/{course_id}"): 1,
+    ("GET", "/courses/{course_id}?expand=enrollments,students"): 3,
+    ("GET", "/courses/stats"): 3,
+    ("GET", "/courses/{course_id}/stats"): 3,
+    ("POST", "/enrollments/"): 6,
+    ("POST", "/enrollments/bulk"): 7,
+    ("PUT", "/enrollments/{enrollment_id}"): 5,
+    ("GET", "/enrollments/"): 1,
+    ("GET", "/enrollments/{enrollment_id}"): 1,
+    ("GET", "/ai/predict-success/{student_identifier}"): 5,
+    ("POST", "/ai/predict-success/batch"): 3,
+    ("GET", "/ai/recommendations/{student_id}"): 0,
+    ("POST", "/sync/bigquery"): 15
+}
+
+def build_requests(client: TestClient) -> list:
+    suffix = uuid4().hex[:8]
+    student = client.post("/students/", json={"nombre": "Presupuesto", "correo": f"budget-{suffix}@smartlogix.edu"}).json()["data"]
+    courses = client.post("/courses/bulk", json=[{"titulo": f"Presupuesto {suffix} {i}"} for i in range(3)]).json()["data"]
+    course_ids = [result["id"] for result in courses["results"]]
+    enrollment = client.post("/enrollments/", json={"student_id": student["id"], "course_id": course_ids[0]}).json()["data"]
+    
+    # Las recomendaciones se responden desde el artefacto en memoria, sin consultas
+    from app.database.database import SessionLocal
+    from app.routes.ai_recommender import build_artifact, recommender_store
+    with SessionLocal() as db:
+        build_artifact(db, recommender_store.root)
+    recommender_store.load()
+
+    return [
+        ("POST", "/students/", {"json": {"nombre": "Presupuesto", "correo": f"budget-{suffix}-2@smartlogix.edu"}}),
+        ("POST", "/students/bulk", {"json": [{"nombre": "Presupuesto", "correo": f"budget-{suffix}-{i}@smartlogix.edu"} for i in range(3, 6)]}),
+        ("GET", "/students/", {"params": {"limit": 20}}),
+        ("GET", "/students/search", {"params": {"q": f"budget-{suffix}@smartlogix.edu"}}),
+        ("GET", "/students/?expand=enrollments", {}),
+        ("GET", f"/students/{student['id']}", {}),
+        ("GET", f"/students/{student['id']}?expand=enrollments", {}),
+        ("GET", f"/students/{student['id']}/enrollments", {}),
+        ("POST", "/courses/", {"json": {"titulo": f"Presupuesto {suffix} extra"}}),
+        ("POST", "/courses/bulk", {"json": [{"titulo": f"Presupuesto {suffix} bulk {i}"} for i in range(3)]}),
+        ("GET", "/courses/", {"params": {"limit": 20}}),
+        ("GET", "/courses/?expand=enrollments,students", {}),
+        ("GET", f"/courses/{course_ids[0]}", {}),
+        ("GET", f"/courses/{course_ids[0]}?expand=enrollments,students", {}),
+        ("GET", "/courses/stats", {"params": {"limit": 20}}),
+        ("GET", f"/courses/{course_ids[0]}/stats", {}),
+        ("POST", "/enrollments/", {"json": {"student_id": student["id"], "course_id": course_ids[1]}}),
+        ("POST", "/enrollments/bulk", {"json": [{"student_id": student["id"], "course_id": course_ids[2]}]}),
+        ("PUT", f"/enrollments/{enrollment['enrollment_id']}", {"json": {"estado": "Aprobado"}}),
+        ("GET", "/enrollments/", {"params": {"limit": 20}}),
+        ("GET", f"/enrollments/{enrollment['enrollment_id']}", {}),
+        ("GET", f"/ai/predict-success/{student['id']}", {}),
+        ("POST", "/ai/predict-success/batch", {"json": {"student_ids": [student["id"]]}}),
+        ("GET", f"/ai/recommendations/{student['id']}", {}),
+        ("POST", "/sync/bigquery", {"params": {"mode": "incremental"}})
+    ]
+
+def route_template(method: str, path: str) -> tuple:
+    path, _, query = path.partition("?")
+    # Las plantillas con menos parámetros van primero: /courses/stats no debe tomarse como /courses/{course_id}
+    for budget_method, template in sorted(QUERY_BUDGETS, key=lambda key: key[1].count("{")):
+        template_path, _, template_query = template.partition("?")
+        parts, candidate = path.split("/"), template_path.split("/")
+        if budget_method == method and query == template_query and len(parts) == len(candidate) and all(
+            c == p or (c.startswith("{") and c.endswith("}")) for c, p in zip(candidate, parts)
+        ):
+            return budget_method, template
+    raise KeyError(f"Ruta sin presupuesto de consultas: {method} {path}{'?' + query if query else ''}")
+
+def main() -> int:
+    import main as api
+
+    failures = []
+    with TestClient(api.app) as client:
+        for method, path, kwargs in build_requests(client):
+            key = route_template(method, path)
+            budget = QUERY_BUDGETS[key]
+            try:
+                with assert_max_queries(budget) as stats:
+                    response = client.request(method, path, **kwargs)
+                status = "✅"
+            except AssertionError as e:
+                failures.append(f"{method} {key[1]}: {e}")
+                status = "❌"
+            if response.status_code >= 400:
+                failures.append(f"{method} {key[1]}: respuesta {response.status_code} {response.text[:200]}")
+                status = "❌"
+            print(f"{status} {method:<5} {key[1]:<52} {stats.queries:>3} / {budget} consultas")
+
+    for failure in failures:
+        print(f"\n❌ {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
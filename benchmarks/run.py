@@ -0,0 +1,310 @@
+"""
+Escenarios de carga contra la API con resultados en JSON (throughput y p50/p95/p99 por escenario).
+
+Uso (en proceso, con el cliente falso de BigQuery):
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.run --enrollments 10000 --requests 500 --concurrency 10
+
+Contra un servidor ya desplegado:
+    python -m benchmarks.run --base-url http://localhost:8000 --scenarios list_students,predict_success
+
+Los resultados se escriben en benchmarks/results/<timestamp>.json (o en --output).
+
+Los escenarios driver_* comparan el driver síncrono con el asíncrono sobre la misma consulta
+(rutas de benchmarks.driver_comparison, montadas solo en proceso).
+"""
+import abc
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault("BIGQUERY_FAKE", "true")
+os.environ.setdefault("OUTBOX_WORKER_ENABLED", "false")
+os.environ.setdefault("DB_SCHEMA_MODE", "create")
+
+import httpx
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0
+    }
+
+class Scenario(abc.ABC):
+    """Un escenario prepara su estado con setup() y define una petición por iteración en request()."""
+
+    name = ""
+    # Las sincronizaciones son pesadas y no se lanzan en paralelo en producción
+    requests_cap = None
+    concurrency_cap = None
+    # Rutas que solo existen en la app en proceso (benchmarks.driver_comparison)
+    in_process_only = False
+
+    def __init__(self, scale: dict, seed: int):
+        self.scale = scale
+        self.rnd = random.Random(seed)
+
+    async def setup(self, client: httpx.AsyncClient):
+        pass
+
+    @abc.abstractmethod
+    async def request(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        """Una petición de la iteración i."""
+
+class ListStudents(Scenario):
+    name = "list_students"
+
+    async def request(self, client, i):
+        return await client.get("/students/", params={"limit": 100, "skip": self.rnd.randrange(max(1, self.scale["students"] - 100))})
+
+class ListStudentsCursor(Scenario):
+    name = "list_students_cursor"
+
+    async def setup(self, client):
+        self.cursor = None
+
+    async def request(self, client, i):
+        response = await client.get("/students/", params={"limit": 100, **({"cursor": self.cursor} if self.cursor else {})})
+        self.cursor = response.json().get("next_cursor") if response.status_code == 200 else None
+        return response
+
+class ListEnrollments(Scenario):
+    name = "list_enrollments"
+
+    async def setup(self, client):
+        self.cursor = None
+
+    async def request(self, client, i):
+        response = await client.get("/enrollments/", params={"limit": 100, **({"cursor": self.cursor} if self.cursor else {})})
+        self.cursor = response.json().get("next_cursor") if response.status_code == 200 else None
+        return response
+
+class ListCourses(Scenario):
+    name = "list_courses"
+
+    async def request(self, client, i):
+        return await client.get("/courses/", params={"limit": 100})
+
+class CreateEnrollment(Scenario):
+    name = "create_enrollment"
+
+    async def setup(self, client):
+        # Cursos nuevos para que cada (student_id, course_id) generado sea inédito
+        response = await client.post("/courses/bulk", json=[
+            {"titulo": f"Curso benchmark {int(time.time())}-{i}", "descripcion": "benchmark"} for i in range(20)
+        ])
+        response.raise_for_status()
+        self.course_ids = [r["id"] for r in response.json()["data"]["results"] if r["status"] == "created"]
+        self.pairs = [
+            (student_id, course_id)
+            for course_id in self.course_ids
+            for student_id in self.rnd.sample(range(1, self.scale["students"] + 1), min(self.scale["students"], 5000))
+        ]
+        self.rnd.shuffle(self.pairs)
+
+    async def request(self, client, i):
+        student_id, course_id = self.pairs[i % len(self.pairs)]
+        return await client.post("/enrollments/", json={"student_id": student_id, "course_id": course_id})
+
+class PredictSuccess(Scenario):
+    name = "predict_success"
+
+    async def request(self, client, i):
+        student_id = self.rnd.randint(1, self.scale["students"])
+        return await client.get(f"/ai/predict-success/{student_id}")
+
+class GetStudent(Scenario):
+    name = "get_student"
+
+    async def request(self, client, i):
+        # Distribución sesgada: pocas claves muy leídas, como el tráfico real
+        student_id = min(self.scale["students"], int(self.rnd.paretovariate(1.2)))
+        return await client.get(f"/students/{student_id}")
+
+class SyncIncremental(Scenario):
+    name = "sync_incremental"
+    requests_cap = 20
+    concurrency_cap = 1
+
+    async def request(self, client, i):
+        return await client.post("/sync/bigquery", params={"mode": "incremental"})
+
+class SyncFull(Scenario):
+    name = "sync_full"
+    requests_cap = 3
+    concurrency_cap = 1
+
+    async def request(self, client, i):
+        return await client.post("/sync/bigquery", params={"mode": "full"})
+
+class DriverScenario(Scenario):
+    in_process_only = True
+    path = ""
+
+    async def request(self, client, i):
+        return await client.get(self.path, params={"skip": self.rnd.randrange(max(1, self.scale["students"] - 20))})
+
+class DriverSync(DriverScenario):
+    name = "driver_sync"
+    path = "/benchmarks/driver/sync/students"
+
+class DriverSyncThreadpool(DriverScenario):
+    name = "driver_sync_threadpool"
+    path = "/benchmarks/driver/sync-threadpool/students"
+
+class DriverAsync(DriverScenario):
+    name = "driver_async"
+    path = "/benchmarks/driver/async/students"
+
+DRIVER_SCENARIOS = (DriverSync, DriverSyncThreadpool, DriverAsync)
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        ListStudents, ListStudentsCursor, ListCourses, ListEnrollments, GetStudent,
+        CreateEnrollment, PredictSuccess, SyncFull, SyncIncremental, *DRIVER_SCENARIOS
+    )
+}
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int) -> dict:
+    await scenario.setup(client)
+    total = min(requests, scenario.requests_cap or requests)
+    concurrency = min(concurrency, scenario.concurrency_cap or concurrency)
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await scenario.request(client, i)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return {"concurrency": concurrency, **summarize(latencies, errors, time.perf_counter() - start)}
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(RESULTS_DIR)
+        ).stdout.strip()
+    except Exception:
+        return "desconocido"
+
+async def run(args) -> dict:
+    from benchmarks.generator import generate, get_scale
+
+    names = list(SCENARIOS) if args.scenarios == "all" else args.scenarios.split(",")
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Escenarios desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(SCENARIOS)}")
+
+    if args.base_url:
+        remote_only = [name for name in names if SCENARIOS[name].in_process_only]
+        if remote_only:
+            raise SystemExit(f"Escenarios solo disponibles en proceso: {', '.join(remote_only)}")
+        scale = get_scale(args.enrollments)
+        lifespan = None
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+        database = "remota"
+    else:
+        import main
+        from app.database.database import get_engine
+        from benchmarks.driver_comparison import install_latency, mount_driver_routes
+
+        scale = generate(args.enrollments, seed=args.seed, reset=args.reset)
+        mount_driver_routes(main.app)
+        lifespan = main.lifespan(main.app)
+        await lifespan.__aenter__()
+        await install_latency(args.driver_latency_ms)
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=args.timeout
+        )
+        database = get_engine().dialect.name
+
+    results = {}
+    try:
+        for name in names:
+            scenario = SCENARIOS[name](scale, args.seed)
+            results[name] = await run_scenario(client, scenario, args.requests, args.concurrency)
+            summary = results[name]
+            print(
+                f"{name}: {summary['requests']} req, {summary['errors']} errores, {summary['throughput_rps']} req/s, "
+                f"p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms p99={summary['p99_ms']}ms"
+            )
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "database": database,
+        "target": args.base_url or "in-process",
+        "seed": args.seed,
+        "scale": {key: scale[key] for key in ("students", "courses", "enrollments")},
+        "requests_per_scenario": args.requests,
+        "concurrency": args.concurrency,
+        "scenarios": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de carga de SmartLogix API")
+    parser.add_argument("--scenarios", default="all", help=f"Lista separada por comas o 'all': {', '.join(SCENARIOS)}")
+    parser.add_argument("--enrollments", type=int, default=10000, help="Escala de datos sintéticos (10k a 10M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Regenera los datos sintéticos")
+    parser.add_argument("--requests", type=int, default=500, help="Peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--base-url", default=None, help="Servidor a medir; por defecto la app en proceso")
+    parser.add_argument(
+        "--driver-latency-ms", type=float, default=5.0,
+        help="Round trip simulado por consulta de los escenarios driver_* (solo SQLite)"
+    )
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {output}")
+
+    return 1 if any(result["errors"] for result in report["scenarios"].values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
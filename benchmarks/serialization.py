@@ -0,0 +1,108 @@
+"""
+Costo de serialización por fila de los listados: dicts a mano + APIResponse (camino anterior) frente a
+TypeAdapter sobre los esquemas Pydantic (app.routes.serialization), en JSON y msgpack.
+
+No usa base de datos: serializa objetos ORM en memoria, como los que devuelve la consulta del listado.
+
+Uso:
+    python -m benchmarks.serialization --rows 1000 --repeats 50
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from app.models.models import Student, Course, Enrollment
+from app.models.schemas import APIResponse, StudentResponse, EnrollmentDetailResponse
+from app.routes.enrollments import enrollment_to_dict
+from app.routes.serialization import build_page, list_adapter, msgpack_available
+from app.routes.students import student_to_dict
+
+api_response_adapter = TypeAdapter(APIResponse)
+
+def build_rows(count: int) -> dict:
+    base = datetime(2024, 1, 1, 8, 30)
+    courses = [Course(id=i, titulo=f"Curso {i}", descripcion="Descripción del curso", fecha_creacion=base) for i in range(1, 21)]
+    students = [
+        Student(id=i, nombre=f"Estudiante {i}", correo=f"estudiante{i}@smartlogix.edu", fecha_registro=base + timedelta(minutes=i))
+        for i in range(1, count + 1)
+    ]
+    enrollments = [
+        Enrollment(
+            id=i, student_id=student.id, course_id=courses[i % len(courses)].id, estado="Cursando", puntaje=15,
+            fecha_matricula=base + timedelta(minutes=i), student=student, course=courses[i % len(courses)]
+        )
+        for i, student in enumerate(students, start=1)
+    ]
+    return {"students": students, "enrollments": enrollments}
+
+def legacy_students(rows: list) -> bytes:
+    response = APIResponse(message="Lista", data=[student_to_dict(student) for student in rows], total=len(rows))
+    # FastAPI vuelve a validar contra response_model=APIResponse antes de serializar
+    return api_response_adapter.dump_json(api_response_adapter.validate_python(response))
+
+def legacy_enrollments(rows: list) -> bytes:
+    response = APIResponse(
+        message="Lista",
+        data=[enrollment_to_dict(enrollment, enrollment.student, enrollment.course) for enrollment in rows],
+        total=len(rows)
+    )
+    return api_response_adapter.dump_json(api_response_adapter.validate_python(response))
+
+def adapter_json(schema):
+    adapter = list_adapter(schema)
+
+    def serialize(rows: list) -> bytes:
+        page = build_page(schema, rows, "Lista")
+        return adapter.dump_json(page, exclude_unset=True)
+    return serialize
+
+def adapter_msgpack(schema):
+    import msgpack
+
+    adapter = list_adapter(schema)
+
+    def serialize(rows: list) -> bytes:
+        page = build_page(schema, rows, "Lista")
+        return msgpack.packb(adapter.dump_python(page, mode="json", exclude_unset=True))
+    return serialize
+
+def measure(serialize, rows: list, repeats: int) -> dict:
+    serialize(rows)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        body = serialize(rows)
+        timings.append(time.perf_counter() - start)
+    # El mínimo es la medida más estable frente al ruido de la máquina
+    return {"us_per_row": min(timings) / len(rows) * 1e6, "bytes": len(body)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de serialización por fila de los listados")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    data = build_rows(args.rows)
+    cases = {
+        "students": (data["students"], legacy_students, StudentResponse),
+        "enrollments": (data["enrollments"], legacy_enrollments, EnrollmentDetailResponse)
+    }
+
+    for name, (rows, legacy, schema) in cases.items():
+        results = {"dicts + APIResponse": measure(legacy, rows, args.repeats)}
+        results["TypeAdapter JSON"] = measure(adapter_json(schema), rows, args.repeats)
+        if msgpack_available():
+            results["TypeAdapter msgpack"] = measure(adapter_msgpack(schema), rows, args.repeats)
+
+        baseline = results["dicts + APIResponse"]["us_per_row"]
+        print(f"\n{name} ({len(rows)} filas, mejor de {args.repeats} repeticiones):")
+        for label, result in results.items():
+            print(
+                f"  {label:<22} {result['us_per_row']:7.2f} µs/fila  {result['bytes']:>8} bytes  "
+                f"x{baseline / result['us_per_row']:.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
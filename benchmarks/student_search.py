@@ -0,0 +1,105 @@
+"""
+Benchmark de búsqueda flexible de estudiantes: tres consultas secuenciales (ilike) frente a
+la consulta única indexada de search_students.
+
+Uso (contra PostgreSQL con pg_trgm):
+    DATABASE_URL=postgresql://... BENCH_STUDENTS=1000000 python -m benchmarks.student_search
+"""
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from sqlalchemy import select, func, insert
+
+from app.database.database import AsyncSessionLocal, get_engine, init_engines, create_tables
+from app.models.models import Student
+from app.routes.students import search_students
+
+BENCH_STUDENTS = int(os.getenv("BENCH_STUDENTS", "1000000"))
+BENCH_LOOKUPS = int(os.getenv("BENCH_LOOKUPS", "300"))
+BENCH_SEED = int(os.getenv("BENCH_SEED", "42"))
+
+NOMBRES = ["Juan", "María", "Luis", "Ana", "Carlos", "Lucía", "Jorge", "Rosa", "Pedro", "Carmen", "Diego", "Elena"]
+APELLIDOS = ["Pérez", "García", "Quispe", "Flores", "Rojas", "Torres", "Mamani", "Huamán", "Vargas", "Castillo"]
+
+def seed_students(total: int, batch_size: int = 10000):
+    create_tables()
+    engine = get_engine()
+    with engine.begin() as conn:
+        existing = conn.scalar(select(func.count(Student.id)))
+    if existing >= total:
+        return existing
+
+    rnd = random.Random(BENCH_SEED)
+    for start in range(existing, total, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, total)):
+            nombre, apellido = rnd.choice(NOMBRES), rnd.choice(APELLIDOS)
+            rows.append({"nombre": f"{nombre} {apellido} {i}", "correo": f"{nombre.lower()}.{i}@smartlogix.edu"})
+        with engine.begin() as conn:
+            conn.execute(insert(Student), rows)
+    return total
+
+def build_identifiers(total: int):
+    rnd = random.Random(BENCH_SEED + 1)
+    sample_ids = rnd.sample(range(1, total + 1), min(BENCH_LOOKUPS, total))
+    with get_engine().connect() as conn:
+        rows = conn.execute(select(Student.id, Student.nombre, Student.correo).where(Student.id.in_(sample_ids))).all()
+
+    identifiers = []
+    for student_id, nombre, correo in rows:
+        kind = rnd.choice(["id", "correo", "nombre"])
+        if kind == "id":
+            identifiers.append(str(student_id))
+        elif kind == "correo":
+            identifiers.append(correo.upper())
+        else:
+            identifiers.append(nombre.split(" ", 1)[1])
+    return identifiers
+
+async def legacy_lookup(db, identifier: str):
+    if identifier.isdigit():
+        student = await db.get(Student, int(identifier))
+        if student:
+            return student
+    student = await db.scalar(select(Student).where(Student.correo.ilike(identifier)).limit(1))
+    if student:
+        return student
+    return await db.scalar(select(Student).where(Student.nombre.ilike(f"%{identifier}%")).limit(1))
+
+async def indexed_lookup(db, identifier: str):
+    matches = await search_students(db, identifier, limit=1, fuzzy=False)
+    return matches[0][0] if matches else None
+
+async def time_lookups(lookup, identifiers):
+    timings = []
+    async with AsyncSessionLocal() as db:
+        for identifier in identifiers:
+            start = time.perf_counter()
+            await lookup(db, identifier)
+            timings.append((time.perf_counter() - start) * 1000)
+            db.expunge_all()
+    return timings
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 3),
+        "max_ms": round(ordered[-1], 3)
+    }
+
+async def main():
+    init_engines()
+    total = seed_students(BENCH_STUDENTS)
+    identifiers = build_identifiers(total)
+    print(f"Estudiantes: {total}, búsquedas: {len(identifiers)}")
+
+    for name, lookup in (("legacy (3 consultas ilike)", legacy_lookup), ("indexada (search_students)", indexed_lookup)):
+        await time_lookups(lookup, identifiers[:20])
+        print(f"{name}: {summarize(await time_lookups(lookup, identifiers))}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
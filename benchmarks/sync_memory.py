@@ -0,0 +1,131 @@
+"""
+Memoria de la extracción de la sincronización con BigQuery: RowStream (yield_per, cursor del lado del
+servidor) frente a materializar la tabla con .all(), para varias escalas de enrollments.
+
+Cada medición corre en un subproceso nuevo para que el pico de RSS (ru_maxrss) sea solo suyo. Las filas
+pasan por iter_chunks + encode_chunk, como en load_rows_in_chunks, y el chunk codificado se descarta:
+el cliente falso de BigQuery guarda todo en memoria y taparía la medición.
+
+Falla (código 1) si el pico de RowStream crece más de --max-growth veces entre la escala menor y la mayor.
+
+Uso:
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.sync_memory --sizes 20000,100000,400000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("BIGQUERY_FAKE", "true")
+os.environ.setdefault("OUTBOX_WORKER_ENABLED", "false")
+
+MODES = ("stream", "materialized")
+
+def extract(mode: str, chunk_size: int) -> dict:
+    from sqlalchemy import select
+
+    from app.bigquery.loader import BIGQUERY_LOAD_FORMAT, encode_chunk, iter_chunks
+    from app.database.database import SessionLocal, get_engine
+    from app.models.models import Enrollment
+    from app.routes.sync import RowStream, serialize_enrollment
+
+    get_engine()
+    statement = select(Enrollment.__table__).order_by(Enrollment.id)
+    rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    db = SessionLocal()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        if mode == "stream":
+            rows = RowStream(db, statement, serialize_enrollment)
+        else:
+            # Camino anterior: toda la tabla en memoria antes de serializar
+            rows = [serialize_enrollment(row) for row in db.execute(statement).all()]
+
+        total = 0
+        for chunk in iter_chunks(rows, chunk_size):
+            encode_chunk(chunk, BIGQUERY_LOAD_FORMAT).close()
+            total += len(chunk)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        db.close()
+
+    return {
+        "rows": total,
+        "seconds": round(elapsed, 2),
+        "tracemalloc_peak_mb": round(peak / 1024 / 1024, 2),
+        "rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before_kb) / 1024, 1)
+    }
+
+def measure_in_subprocess(mode: str, chunk_size: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.sync_memory", "--measure", mode, "--chunk-size", str(chunk_size)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Memoria de la extracción de la sincronización con BigQuery")
+    parser.add_argument("--sizes", default="20000,100000,400000", help="Escalas de enrollments, separadas por comas")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Filas por chunk de carga (BIGQUERY_CHUNK_SIZE)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-growth", type=float, default=1.5, help="Crecimiento máximo admitido del pico de RowStream")
+    parser.add_argument("--measure", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(extract(args.measure, args.chunk_size)))
+        return 0
+
+    from benchmarks.generator import generate
+    from benchmarks.run import RESULTS_DIR, get_git_commit
+
+    results = {}
+    for size in sorted(int(size) for size in args.sizes.split(",")):
+        generate(size, seed=args.seed, reset=True)
+        results[size] = {mode: measure_in_subprocess(mode, args.chunk_size) for mode in MODES}
+
+    print(f"\nExtracción de enrollments en chunks de {args.chunk_size} filas:")
+    print(f"  {'filas':>9}  {'modo':<13} {'pico tracemalloc':>17} {'pico RSS':>10} {'crecimiento RSS':>16} {'tiempo':>8}")
+    for size, modes in results.items():
+        for mode, result in modes.items():
+            print(
+                f"  {result['rows']:>9}  {mode:<13} {result['tracemalloc_peak_mb']:>14} MB {result['rss_peak_mb']:>7} MB "
+                f"{result['rss_growth_mb']:>13} MB {result['seconds']:>7}s"
+            )
+
+    sizes = list(results)
+    smallest, largest = results[sizes[0]]["stream"], results[sizes[-1]]["stream"]
+    growth = largest["tracemalloc_peak_mb"] / smallest["tracemalloc_peak_mb"] if smallest["tracemalloc_peak_mb"] else 0.0
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": get_git_commit(),
+        "chunk_size": args.chunk_size,
+        "stream_peak_growth": round(growth, 2),
+        "results": {str(size): modes for size, modes in results.items()}
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"sync-memory-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {output}")
+
+    if growth > args.max_growth:
+        print(f"❌ El pico de RowStream creció x{growth:.2f} entre {sizes[0]} y {sizes[-1]} filas (máximo x{args.max_growth})")
+        return 1
+    print(f"✅ Pico de RowStream estable: x{growth:.2f} entre {sizes[0]} y {sizes[-1]} filas")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,71 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from datetime import datetime
+import asyncio
 import os
 from app.routes import students, courses, enrollments
-from app.database.database import init_database
+from app.database.database import init_database, init_engines, dispose_engines, get_engine, get_async_engine
+from app.database.pool import get_pool_status
+from app.cache.response_cache import response_cache
+from app.metrics.registry import render as render_metrics, mark_process_dead, reset_multiproc_dir, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.metrics.middleware import MetricsMiddleware
+from app.workers.outbox import run_outbox_dispatcher
+from app.workers.first_half import STUDENT_METRICS_REFRESH_ENABLED, run_first_half_refresher
+from app.routes.ai_recommender import recommender_store
+from app.bigquery.client import close_bigquery_clients
 from app.models.schemas import HealthResponse, APIResponse
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("Iniciando SmartLogix API...")
+    # Los engines se crean aquí y no al importar los módulos, para acortar el arranque en frío
+    init_engines()
+    success = init_database()
+    if success:
+        print("SmartLogix API iniciada correctamente")
+    else:
+        print("SmartLogix API iniciada con advertencias de base de datos")
+    
+    # Cada worker abre el artefacto con mmap al arrancar; sin artefacto el endpoint responde 503
+    try:
+        if not recommender_store.load():
+            print("⚠️ Sin modelo de recomendaciones: python -m app.routes.ai_recommender build")
+    except Exception as e:
+        print(f"⚠️ No se pudo cargar el modelo de recomendaciones: {e}")
+    
+    outbox_task = None
+    if os.environ.get("OUTBOX_WORKER_ENABLED", "true").lower() == "true":
+        app.state.outbox_stop = asyncio.Event()
+        outbox_task = asyncio.create_task(run_outbox_dispatcher(app.state.outbox_stop))
+        app.state.outbox_task = outbox_task
+    
+    # Independiente del outbox: sin él, primera_mitad_suma quedaría pendiente indefinidamente
+    first_half_task = None
+    if STUDENT_METRICS_REFRESH_ENABLED:
+        app.state.first_half_stop = asyncio.Event()
+        first_half_task = asyncio.create_task(run_first_half_refresher(app.state.first_half_stop))
+        app.state.first_half_task = first_half_task
+    
+    yield
+    
+    if outbox_task:
+        app.state.outbox_stop.set()
+        await outbox_task
+    if first_half_task:
+        app.state.first_half_stop.set()
+        await first_half_task
+    close_bigquery_clients()
+    await dispose_engines()
+    mark_process_dead()
+
 app = FastAPI(
     title="SmartLogix API",
     description="API REST para gestión de estudiantes y cursos online - Sistema completo",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -22,6 +76,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(students.router)
 app.include_router(courses.router)
 app.include_router(enrollments.router)
@@ -32,6 +88,9 @@ app.include_router(sync.router)
 from app.routes import ai_success_predictor
 app.include_router(ai_success_predictor.router, prefix="/ai", tags=["🧠 AI Success Predictor - Datos Reales"])
 
+from app.routes import ai_recommender
+app.include_router(ai_recommender.router, prefix="/ai", tags=["🧠 AI Course Recommender"])
+
 @app.get("/", response_model=APIResponse)
 async def root():
     return APIResponse(
@@ -45,6 +104,11 @@ async def root():
                 "courses": "/courses", 
                 "enrollments": "/enrollments",
                 "health": "/health",
+                "pool": "/health/pool",
+                "cache": "/health/cache",
+                "metrics": "/metrics",
+                "recommendations": "/ai/recommendations/{student_id}",
+                "course_stats": "/courses/stats",
                 "docs": "/docs"
             },
             "features": [
@@ -67,6 +131,31 @@ async def health_check():
         version="2.0.0"
     )
 
+@app.get("/health/pool", response_model=APIResponse)
+async def pool_health():
+    return APIResponse(
+        message="Estado del pool de conexiones",
+        data={
+            "timestamp": datetime.now().isoformat(),
+            "sync_engine": get_pool_status(get_engine()),
+            "async_engine": get_pool_status(get_async_engine().sync_engine)
+        }
+    )
+
+@app.get("/health/cache", response_model=APIResponse)
+async def cache_health():
+    return APIResponse(
+        message="Estado de la caché de respuestas",
+        data={
+            "timestamp": datetime.now().isoformat(),
+            **response_cache.status()
+        }
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/test", response_model=APIResponse)
 async def test_endpoint():
     return APIResponse(
@@ -81,19 +170,12 @@ async def test_endpoint():
         }
     )
 
-@app.on_event("startup")
-async def startup_event():
-    print("Iniciando SmartLogix API...")
-    success = init_database()
-    if success:
-        print("SmartLogix API iniciada correctamente")
-    else:
-        print("SmartLogix API iniciada con advertencias de base de datos")
-
 if __name__ == "__main__":
     import uvicorn
     
     port = int(os.environ.get("PORT", 8000))
+    # Antes de arrancar los workers, que escriben sus métricas en PROMETHEUS_MULTIPROC_DIR
+    reset_multiproc_dir()
     
     uvicorn.run(
         "main:app",
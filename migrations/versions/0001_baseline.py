@@ -0,0 +1,53 @@
+"""Esquema inicial: students, courses y enrollments
+
+Bases de datos creadas antes de Alembic con create_all: `alembic stamp 0001_baseline`
+y luego `alembic upgrade head`.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "students",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nombre", sa.String(100), nullable=False),
+        sa.Column("correo", sa.String(150), nullable=False),
+        sa.Column("fecha_registro", sa.DateTime())
+    )
+    op.create_index("ix_students_id", "students", ["id"])
+    op.create_index("ix_students_correo", "students", ["correo"], unique=True)
+    
+    op.create_table(
+        "courses",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("titulo", sa.String(150), nullable=False),
+        sa.Column("descripcion", sa.Text()),
+        sa.Column("fecha_creacion", sa.DateTime())
+    )
+    op.create_index("ix_courses_id", "courses", ["id"])
+    
+    op.create_table(
+        "enrollments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.id"), nullable=False),
+        sa.Column("course_id", sa.Integer(), sa.ForeignKey("courses.id"), nullable=False),
+        sa.Column("estado", sa.String(20)),
+        sa.Column("puntaje", sa.Integer()),
+        sa.Column("fecha_matricula", sa.DateTime())
+    )
+    op.create_index("ix_enrollments_id", "enrollments", ["id"])
+
+def downgrade():
+    op.drop_table("enrollments")
+    op.drop_table("courses")
+    op.drop_table("students")
@@ -0,0 +1,126 @@
+"""updated_at, tablas de sincronización, outbox, métricas e índices de búsqueda
+
+Revision ID: 0002_sync_outbox_metrics
+Revises: 0001_baseline
+Create Date: 2026-10-17 09:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_sync_outbox_metrics"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+    
+    for table in ("students", "courses", "enrollments"):
+        op.add_column(table, sa.Column("updated_at", sa.DateTime()))
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+        op.create_index(f"ix_{table}_updated_at", table, ["updated_at"])
+    
+    op.create_index("ix_enrollments_fecha_matricula_id", "enrollments", ["fecha_matricula", "id"])
+    
+    op.create_index("ix_students_correo_lower", "students", [sa.text("lower(correo)")])
+    if is_postgres:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            "ix_students_nombre_trgm", "students", ["nombre"],
+            postgresql_using="gin", postgresql_ops={"nombre": "gin_trgm_ops"}
+        )
+    else:
+        op.create_index("ix_students_nombre_trgm", "students", ["nombre"])
+    
+    op.create_table(
+        "student_metrics",
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.id"), primary_key=True),
+        sa.Column("total_cursos", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("cursos_aprobados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("cursos_desaprobados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("cursos_en_progreso", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("cursos_retirados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("n_notas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("suma_notas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("suma_cuadrados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("nota_maxima", sa.Integer(), nullable=True),
+        sa.Column("nota_minima", sa.Integer(), nullable=True),
+        sa.Column("primera_mitad_suma", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime())
+    )
+    
+    # Backfill: las escrituras de matrículas solo suman deltas y suponen que todo estudiante con historial ya tiene fila
+    op.execute(
+        "INSERT INTO student_metrics "
+        "(student_id, total_cursos, cursos_aprobados, cursos_desaprobados, cursos_en_progreso, cursos_retirados, "
+        "n_notas, suma_notas, suma_cuadrados, nota_maxima, nota_minima, primera_mitad_suma, updated_at) "
+        "SELECT e.student_id, COUNT(*), "
+        "SUM(CASE WHEN e.estado = 'Aprobado' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN e.estado = 'Desaprobado' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN e.estado = 'Cursando' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN e.estado = 'Retirado' THEN 1 ELSE 0 END), "
+        "COUNT(e.puntaje), COALESCE(SUM(e.puntaje), 0), COALESCE(SUM(e.puntaje * e.puntaje), 0), "
+        "MAX(e.puntaje), MIN(e.puntaje), COALESCE(MAX(m.primera_mitad_suma), 0), CURRENT_TIMESTAMP "
+        "FROM enrollments e LEFT JOIN ("
+        "SELECT student_id, SUM(puntaje) AS primera_mitad_suma FROM ("
+        "SELECT student_id, puntaje, "
+        "ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY id) AS rn, "
+        "COUNT(*) OVER (PARTITION BY student_id) AS cnt "
+        "FROM enrollments WHERE puntaje IS NOT NULL"
+        ") ranked WHERE rn * 2 <= cnt GROUP BY student_id"
+        ") m ON m.student_id = e.student_id "
+        "GROUP BY e.student_id"
+    )
+    
+    op.create_table(
+        "deleted_records",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("table_name", sa.String(50), nullable=False),
+        sa.Column("record_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime())
+    )
+    op.create_index("ix_deleted_records_id", "deleted_records", ["id"])
+    op.create_index("ix_deleted_records_table_name", "deleted_records", ["table_name"])
+    op.create_index("ix_deleted_records_deleted_at", "deleted_records", ["deleted_at"])
+    
+    op.create_table(
+        "sync_state",
+        sa.Column("table_name", sa.String(50), primary_key=True),
+        sa.Column("high_water_mark", sa.DateTime(), nullable=True),
+        sa.Column("last_sync_at", sa.DateTime(), nullable=True),
+        sa.Column("last_sync_mode", sa.String(20), nullable=True),
+        sa.Column("rows_synced", sa.Integer())
+    )
+    
+    op.create_table(
+        "outbox_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event_type", sa.String(50), nullable=False),
+        sa.Column("aggregate", sa.String(50), nullable=False),
+        sa.Column("aggregate_id", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime()),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("processed_at", sa.DateTime(), nullable=True)
+    )
+    op.create_index("ix_outbox_events_id", "outbox_events", ["id"])
+    op.create_index("ix_outbox_events_status", "outbox_events", ["status"])
+    op.create_index("ix_outbox_events_next_attempt_at", "outbox_events", ["next_attempt_at"])
+
+def downgrade():
+    op.drop_table("outbox_events")
+    op.drop_table("sync_state")
+    op.drop_table("deleted_records")
+    op.drop_table("student_metrics")
+    
+    op.drop_index("ix_students_nombre_trgm", table_name="students")
+    op.drop_index("ix_students_correo_lower", table_name="students")
+    op.drop_index("ix_enrollments_fecha_matricula_id", table_name="enrollments")
+    
+    for table in ("enrollments", "courses", "students"):
+        op.drop_index(f"ix_{table}_updated_at", table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("updated_at")
@@ -0,0 +1,39 @@
+"""Índices de enrollments y restricción única (student_id, course_id)
+
+La restricción única también sirve las búsquedas por student_id (es su columna inicial),
+así que no se crea un índice aparte para esa columna.
+
+Revision ID: 0003_enrollments_indexes
+Revises: 0002_sync_outbox_metrics
+Create Date: 2026-10-17 09:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_enrollments_indexes"
+down_revision = "0002_sync_outbox_metrics"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT COUNT(*) FROM ("
+        "SELECT student_id, course_id FROM enrollments "
+        "GROUP BY student_id, course_id HAVING COUNT(*) > 1"
+        ") AS duplicados"
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"Hay {duplicates} pares (student_id, course_id) duplicados en enrollments; "
+            "deben resolverse antes de crear la restricción única"
+        )
+    
+    with op.batch_alter_table("enrollments") as batch:
+        batch.create_unique_constraint("uq_enrollments_student_course", ["student_id", "course_id"])
+    op.create_index("ix_enrollments_course_id", "enrollments", ["course_id"])
+
+def downgrade():
+    op.drop_index("ix_enrollments_course_id", table_name="enrollments")
+    with op.batch_alter_table("enrollments") as batch:
+        batch.drop_constraint("uq_enrollments_student_course", type_="unique")
@@ -0,0 +1,63 @@
+"""Rollups de estadísticas por curso: course_stats (curso y mes de matrícula) y course_score_counts
+
+Las tablas se rellenan a partir de las matrículas existentes; después se mantienen en cada escritura
+de matrículas (app.database.course_stats).
+
+Revision ID: 0004_course_stats
+Revises: 0003_enrollments_indexes
+Create Date: 2026-10-17 09:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_course_stats"
+down_revision = "0003_enrollments_indexes"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+    
+    op.create_table(
+        "course_stats",
+        sa.Column("course_id", sa.Integer(), sa.ForeignKey("courses.id"), primary_key=True),
+        sa.Column("mes", sa.String(7), primary_key=True),
+        sa.Column("matriculas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("cursando", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("aprobados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("desaprobados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("retirados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("n_notas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("suma_notas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime())
+    )
+    
+    op.create_table(
+        "course_score_counts",
+        sa.Column("course_id", sa.Integer(), sa.ForeignKey("courses.id"), primary_key=True),
+        sa.Column("puntaje", sa.Integer(), primary_key=True),
+        sa.Column("cantidad", sa.Integer(), nullable=False, server_default="0")
+    )
+    
+    mes = "to_char(fecha_matricula, 'YYYY-MM')" if is_postgres else "strftime('%Y-%m', fecha_matricula)"
+    op.execute(
+        "INSERT INTO course_stats "
+        "(course_id, mes, matriculas, cursando, aprobados, desaprobados, retirados, n_notas, suma_notas, updated_at) "
+        f"SELECT course_id, {mes}, COUNT(*), "
+        "SUM(CASE WHEN estado = 'Cursando' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN estado = 'Aprobado' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN estado = 'Desaprobado' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN estado = 'Retirado' THEN 1 ELSE 0 END), "
+        "COUNT(puntaje), COALESCE(SUM(puntaje), 0), CURRENT_TIMESTAMP "
+        f"FROM enrollments GROUP BY course_id, {mes}"
+    )
+    op.execute(
+        "INSERT INTO course_score_counts (course_id, puntaje, cantidad) "
+        "SELECT course_id, puntaje, COUNT(*) FROM enrollments "
+        "WHERE puntaje IS NOT NULL GROUP BY course_id, puntaje"
+    )
+
+def downgrade():
+    op.drop_table("course_score_counts")
+    op.drop_table("course_stats")
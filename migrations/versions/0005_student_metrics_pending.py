@@ -0,0 +1,27 @@
+"""student_metrics.primera_mitad_pendiente: la suma de la primera mitad se recalcula fuera de la escritura
+
+Las inserciones de matrículas solo marcan la fila; el dispatcher de outbox (o
+python -m app.database.student_metrics refresh) recalcula primera_mitad_suma.
+
+Revision ID: 0005_student_metrics_pending
+Revises: 0004_course_stats
+Create Date: 2026-10-17 09:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_student_metrics_pending"
+down_revision = "0004_course_stats"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column(
+        "student_metrics",
+        sa.Column("primera_mitad_pendiente", sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+
+def downgrade():
+    with op.batch_alter_table("student_metrics") as batch:
+        batch.drop_column("primera_mitad_pendiente")